@@ -0,0 +1,142 @@
+import ast
+import json
+import threading
+
+from strands.hooks import AfterToolCallEvent, BeforeToolCallEvent, HookProvider, HookRegistry
+
+# Tool → tool che devono essere già terminati con successo nella sessione,
+# sullo stesso file (dipendenze di dati: l'ordine completo della SECTION 4
+# resta nel prompt).
+# Tutto il resto può essere chiamato in parallelo nello stesso turno
+# (es. raw_ingest + detect_file_type, raw_ingest + validate_data).
+REQUIRES = {
+    "convert_semi_tabular": ["detect_file_type"],
+    "analyze_schema": ["detect_file_type"],
+    "validate_data": ["analyze_schema"],
+    "schema_normalizer": ["detect_file_type"],
+    "load_into_iceberg": ["schema_normalizer"],
+    "create_iceberg_table": ["load_into_iceberg"]
+}
+
+# Chiavi in agent.state (ripulite insieme alla conversazione)
+COMPLETED_KEY = "completed_tools"
+NORMALIZED_KEY = "normalized_paths"
+LINEAGE_KEY = "file_lineage"
+
+# Output che continuano la pipeline dello stesso file
+DERIVED_PATHS = ("converted_path", "normalized_path")
+
+
+def tool_output(result):
+    """
+    The dict returned by a tool, from the ToolResult content (a JSON block,
+    or the text form Strands gives to dict results); None if not a dict.
+    """
+    for block in (result or {}).get("content", []):
+        if isinstance(block.get("json"), dict):
+            return block["json"]
+        text = block.get("text")
+        if not text:
+            continue
+        for parse in (json.loads, ast.literal_eval):
+            try:
+                value = parse(text)
+            except (ValueError, SyntaxError):
+                continue
+            if isinstance(value, dict):
+                return value
+    return None
+
+
+def subject(name, tool_input, lineage):
+    """
+    The file a tool call is about: the original file_s3_path its input
+    derives from (converted / normalized paths map back to it), or for
+    create_iceberg_table the file its load_id / table_name was loaded from.
+    """
+    if name == "create_iceberg_table":
+        return lineage.get(f"load:{tool_input.get('load_id')}") or lineage.get(
+            f"table:{tool_input.get('table_name')}"
+        )
+    path = tool_input.get("file_s3_path")
+    return lineage.get(path, path)
+
+
+class ToolDependencyGuard(HookProvider):
+    """
+    Rejects tool calls whose prerequisites (REQUIRES) have not completed
+    successfully earlier in the session for the same file, so tools the
+    model emits together in one turn run concurrently while an unsafe
+    ordering (load before normalize, CTAS before load) is cancelled with
+    an explanation the model can act on. Completed steps are tracked per
+    (tool, file): normalizing one file does not unlock the load of another.
+
+    load_into_iceberg is also rejected unless its file_s3_path is a
+    normalized_path returned by schema_normalizer (SECTION 3C).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def register_hooks(self, registry: HookRegistry, **kwargs):
+        registry.add_callback(BeforeToolCallEvent, self.check)
+        registry.add_callback(AfterToolCallEvent, self.record)
+
+    def check(self, event: BeforeToolCallEvent):
+        name = event.tool_use["name"]
+        tool_input = event.tool_use.get("input") or {}
+        with self._lock:
+            completed = {tuple(step) for step in event.agent.state.get(COMPLETED_KEY) or []}
+            normalized = set(event.agent.state.get(NORMALIZED_KEY) or [])
+            lineage = dict(event.agent.state.get(LINEAGE_KEY) or {})
+
+        file = subject(name, tool_input, lineage)
+        missing = [tool for tool in REQUIRES.get(name, []) if (tool, file) not in completed]
+        if missing:
+            event.cancel_tool = (
+                f"`{name}` rejected: it requires {', '.join(missing)} to complete successfully first "
+                f"on the same file ({file}). "
+                "Tools that depend on each other must be called in separate turns."
+            )
+            return
+
+        if name == "load_into_iceberg":
+            path = tool_input.get("file_s3_path")
+            if path not in normalized:
+                event.cancel_tool = (
+                    f"`load_into_iceberg` rejected: {path} is not a normalized_path returned by "
+                    "schema_normalizer."
+                )
+
+    def record(self, event: AfterToolCallEvent):
+        # le chiamate annullate da check() hanno status "error"
+        if (event.result or {}).get("status") != "success":
+            return
+        output = tool_output(event.result)
+        if output is not None and output.get("status") == "failed":
+            return
+
+        name = event.tool_use["name"]
+        tool_input = event.tool_use.get("input") or {}
+        with self._lock:
+            lineage = dict(event.agent.state.get(LINEAGE_KEY) or {})
+            file = subject(name, tool_input, lineage)
+
+            completed = {tuple(step) for step in event.agent.state.get(COMPLETED_KEY) or []}
+            completed.add((name, file))
+            event.agent.state.set(COMPLETED_KEY, sorted([list(step) for step in completed], key=str))
+
+            # i path derivati (e il load) restano legati al file di origine
+            derived = [output.get(key) for key in DERIVED_PATHS] if output else []
+            if name == "load_into_iceberg":
+                derived += [f"table:{tool_input.get('table_name')}"]
+                if output and output.get("load_id"):
+                    derived.append(f"load:{output['load_id']}")
+            for key in filter(None, derived):
+                lineage[key] = file
+            event.agent.state.set(LINEAGE_KEY, lineage)
+
+            if name == "schema_normalizer" and output and output.get("normalized_path"):
+                normalized = set(event.agent.state.get(NORMALIZED_KEY) or [])
+                normalized.add(output["normalized_path"])
+                event.agent.state.set(NORMALIZED_KEY, sorted(normalized))
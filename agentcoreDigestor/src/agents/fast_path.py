@@ -0,0 +1,218 @@
+import os
+import re
+
+from tools import load_tool
+from tools.progress import emit
+
+ENV = os.environ.get("ENV", "dev")
+
+# "false" → ogni richiesta passa dal modello
+FAST_PATH_ENABLED = os.environ.get("FAST_PATH_ENABLED", "true").lower() == "true"
+
+# Formati che la pipeline di ingestion gestisce senza decisioni del modello
+# (SECTION 4 del system prompt)
+FAST_PATH_EXTENSIONS = {"csv", "tsv", "txt", "xlsx", "xls"}
+
+# Step della pipeline completa (convert_semi_tabular solo per i non-CSV)
+PIPELINE_STEPS = 8
+
+# detect_file_type.file_type → convert_semi_tabular.file_type
+CONVERT_TYPES = {"csv": "csv", "delimited_text": "txt", "excel": "excel"}
+
+WRITE_MODES = {"append", "overwrite", "overwrite_partitions", "merge"}
+
+# "ingest s3://bucket/sales_orders_2024.csv [into [table] sales_orders]"
+INGEST_PROMPT = re.compile(
+    r"^\s*(?:please\s+)?(?:ingest|load|import)\s+(?:the\s+file\s+)?(s3://[^\s]+?)"
+    r"(?:\s+into\s+(?:table\s+)?([A-Za-z_]\w*))?\s*[.!]?\s*$",
+    re.IGNORECASE
+)
+
+
+# ------------------------------------------------------------
+# Recognition
+# ------------------------------------------------------------
+def name_parts(file_s3_path):
+    """
+    (domain, dataset, extension) from <domain>_<dataset>_<optional>.<ext>;
+    domain/dataset are None when the name does not follow the convention.
+    """
+    filename = file_s3_path.split("/")[-1]
+    base, _, extension = filename.rpartition(".")
+    parts = base.split("_")
+    if not base or len(parts) < 2 or not parts[0] or not parts[1]:
+        return None, None, extension.lower()
+    return parts[0], parts[1], extension.lower()
+
+
+def parse_request(payload):
+    """
+    Ingestion request that can run without the model, or None.
+
+    Structured payload:
+        {"action": "ingest", "file_s3_path": "s3://...",
+         "table_name": ..., "mode": ..., "key_columns": [...],
+         "partition_columns": [...]}
+
+    or a prompt such as "ingest s3://bucket/sales_orders_2024.csv".
+    Files outside FAST_PATH_EXTENSIONS or without <domain>_<dataset> in
+    the name (where the model has to ask the user) are left to the agent.
+    """
+    if not FAST_PATH_ENABLED or payload.get("fast_path") is False:
+        return None
+
+    if payload.get("action") == "ingest" and payload.get("file_s3_path"):
+        request = {
+            "file_s3_path": payload["file_s3_path"],
+            "table_name": payload.get("table_name"),
+            "mode": payload.get("mode", "append"),
+            "key_columns": payload.get("key_columns") or [],
+            "partition_columns": payload.get("partition_columns") or []
+        }
+    else:
+        match = INGEST_PROMPT.match(payload.get("prompt") or payload.get("input") or "")
+        if not match:
+            return None
+        request = {
+            "file_s3_path": match.group(1),
+            "table_name": match.group(2),
+            "mode": "append",
+            "key_columns": [],
+            "partition_columns": []
+        }
+
+    domain, dataset, extension = name_parts(request["file_s3_path"])
+    if extension not in FAST_PATH_EXTENSIONS or not domain:
+        return None
+    if request["mode"] not in WRITE_MODES:
+        return None
+    if request["mode"] == "merge" and not request["key_columns"]:
+        return None
+    if request["mode"] == "overwrite_partitions" and not request["partition_columns"]:
+        return None
+
+    return request
+
+
+def default_table_name(file_s3_path):
+    """
+    Table of a file when the request names none: the same
+    icg_<domain>_<dataset>_<env> that lambda_core derives.
+    """
+    domain, dataset, _ = name_parts(file_s3_path)
+    return f"icg_{domain}_{dataset}_{ENV}"
+
+
+# ------------------------------------------------------------
+# Pipeline (same order as SECTION 4 of the system prompt)
+# ------------------------------------------------------------
+async def run_ingestion(request):
+    """
+    Runs the ingestion tools in code and streams one line per step, then
+    the summary as a {"type": "result", ...} event; stops at the first
+    failed step like the agent. Each completed step also sends a
+    "progress" event with the percentage of the pipeline done.
+    """
+    steps = {}
+    total = PIPELINE_STEPS
+    table_name = request["table_name"] or default_table_name(request["file_s3_path"])
+
+    async def step(name, **kwargs):
+        # i tool sono async (I/O bloccante sull'executor dei tool)
+        result = await load_tool(name)(**kwargs)
+        steps[name] = result
+        emit("progress", step=name, completed=len(steps), total=total,
+             percent=round(100 * len(steps) / total))
+        return result
+
+    def line(name):
+        result = steps[name]
+        status = result.get("status", "unknown")
+        error = f" - {result['error']}" if result.get("error") else ""
+        return f"{name}: {status}{error}\n"
+
+    def summary(status, error=None):
+        out = {
+            "type": "result",
+            "status": status,
+            "fast_path": True,
+            "file_s3_path": request["file_s3_path"],
+            "table_name": table_name,
+            "steps": {name: result.get("status") for name, result in steps.items()}
+        }
+        if error:
+            out["error"] = error
+        return out
+
+    path = request["file_s3_path"]
+
+    detected = await step("detect_file_type", file_s3_path=path)
+    yield line("detect_file_type")
+    file_type = detected.get("file_type")
+    if detected.get("status") != "success" or file_type not in CONVERT_TYPES:
+        yield summary("failed", f"Unsupported or unreadable file (file_type={file_type})")
+        return
+
+    # i CSV saltano la conversione
+    if file_type == "csv":
+        total -= 1
+
+    await step("raw_ingest", file_s3_path=path)
+    yield line("raw_ingest")
+
+    if file_type != "csv":
+        converted = await step(
+            "convert_semi_tabular",
+            file_s3_path=path, file_type=CONVERT_TYPES[file_type]
+        )
+        yield line("convert_semi_tabular")
+        if converted.get("status") != "success":
+            yield summary("failed", "Conversion failed")
+            return
+        path = converted["converted_path"]
+
+    schema = await step("analyze_schema", file_s3_path=path, file_format="csv")
+    yield line("analyze_schema")
+    if schema.get("status") != "success":
+        yield summary("failed", "Schema analysis failed")
+        return
+
+    validation = await step("validate_data", file_s3_path=path, schema=schema["schema"])
+    yield line("validate_data")
+    if validation.get("status") == "failed":
+        yield summary("failed", "Validation failed")
+        return
+
+    normalized = await step("schema_normalizer", file_s3_path=path)
+    yield line("schema_normalizer")
+    if normalized.get("status") != "success":
+        yield summary("failed", "Normalization failed")
+        return
+
+    loaded = await step(
+        "load_into_iceberg",
+        file_s3_path=normalized["normalized_path"],
+        table_name=table_name,
+        schema=[{"name": n, "type": t} for n, t in normalized["schema_normalized"].items()]
+    )
+    yield line("load_into_iceberg")
+    if loaded.get("status") != "success":
+        yield summary("failed", "Load failed")
+        return
+
+    table = await step(
+        "create_iceberg_table",
+        table_name=table_name,
+        schema=normalized["schema_normalized"],
+        mode=request["mode"],
+        key_columns=request["key_columns"],
+        partition_columns=request["partition_columns"],
+        files=loaded.get("files_written"),
+        load_id=loaded.get("load_id")
+    )
+    yield line("create_iceberg_table")
+    if table.get("status") != "success":
+        yield summary("failed", "Iceberg commit failed")
+        return
+
+    yield summary("success")
@@ -0,0 +1,97 @@
+import os
+import threading
+from collections import OrderedDict
+
+from strands import Agent
+from strands.agent.conversation_manager import SlidingWindowConversationManager
+from strands.agent.state import AgentState
+from strands.tools.executors import ConcurrentToolExecutor
+from strands.telemetry.metrics import EventLoopMetrics
+
+from agents.dependencies import ToolDependencyGuard
+from model.load import load_model
+
+# Agent pronti (prompt + tool già registrati) tenuti in caldo per processo
+AGENT_POOL_SIZE = int(os.environ.get("AGENT_POOL_SIZE", "4"))
+
+# Sessioni AgentCore di cui si conserva la conversazione tra invocazioni
+MAX_SESSIONS = int(os.environ.get("AGENT_MAX_SESSIONS", "32"))
+
+
+class AgentPool:
+    """
+    Process-level pool of Strands agents built from one template (system
+    prompt + tools) on the pooled model clients.
+
+    - acquire(session_id) returns the agent parked for that session, so
+      the conversation continues, or an idle pre-built agent with an empty
+      conversation (a new one only when none is idle);
+    - release(session_id, agent) parks it for the session; the least
+      recently used sessions beyond MAX_SESSIONS are reset and returned to
+      the idle agents.
+
+    An agent is used by one request at a time: a second concurrent request
+    on the same session gets its own agent.
+    """
+
+    def __init__(self, system_prompt, tools, size=AGENT_POOL_SIZE, max_sessions=MAX_SESSIONS):
+        self.system_prompt = system_prompt
+        self.tools = tools
+        self.size = size
+        self.max_sessions = max_sessions
+        self._idle = []
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def build(self):
+        # più tool call nello stesso turno in parallelo, con le regole di
+        # dipendenza di agents.dependencies
+        return Agent(
+            model=load_model(),
+            system_prompt=self.system_prompt,
+            tools=self.tools,
+            tool_executor=ConcurrentToolExecutor(),
+            hooks=[ToolDependencyGuard()]
+        )
+
+    def warm(self):
+        """
+        Builds the idle agents ahead of the first request.
+        """
+        agents = [self.build() for _ in range(self.size)]
+        with self._lock:
+            self._idle.extend(agents)
+
+    @staticmethod
+    def reset(agent):
+        """
+        Clears the per-session state of an agent, keeping model, prompt and
+        tool registry.
+        """
+        agent.messages = []
+        agent.state = AgentState()
+        agent.conversation_manager = SlidingWindowConversationManager()
+        agent.event_loop_metrics = EventLoopMetrics()
+        return agent
+
+    def acquire(self, session_id=None):
+        with self._lock:
+            if session_id and session_id in self._sessions:
+                return self._sessions.pop(session_id)
+            if self._idle:
+                return self._idle.pop()
+        return self.build()
+
+    def release(self, session_id, agent):
+        with self._lock:
+            if not session_id:
+                if len(self._idle) < self.size:
+                    self._idle.append(self.reset(agent))
+                return
+
+            self._sessions[session_id] = agent
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                if len(self._idle) < self.size:
+                    self._idle.append(self.reset(evicted))
@@ -1,44 +1,28 @@
+import asyncio
 import json
+import os
+import threading
 from bedrock_agentcore.runtime import BedrockAgentCoreApp
-from strands import Agent
-from model.load import load_model
 
-# --------- TOOLS IMPORTATI (solo quelli realmente utilizzati) ----------
-from tools.analyze_schema import analyze_schema
-from tools.validate_data import validate_data
-from tools.schema_normalizer import schema_normalizer
-from tools.load_into_iceberg import load_into_iceberg
-from tools.create_iceberg_table import create_iceberg_table
-from tools.raw_ingest import raw_ingest
-from tools.detect_file_type import detect_file_type  
-from tools.convert_semi_tabular import convert_semi_tabular
+# Solo il riconoscimento delle richieste: i tool (strands, boto3,
+# OpenTelemetry) sono importati da runtime()
+from agents.fast_path import parse_request, run_ingestion
 
+# "false": tool e agent pool preparati alla prima richiesta invece che in
+# background all'avvio
+AGENT_WARM_ON_START = os.environ.get("AGENT_WARM_ON_START", "true").lower() == "true"
 
-app = BedrockAgentCoreApp()
-log = app.logger
-
-
-@app.entrypoint
-async def invoke(payload, context):
-    """
-    AgentCore entrypoint (async generator).
-    Runs Strands agent pipeline and streams output.
-    """
+# Eventi di avanzamento strutturati nello stream (disattivabili per
+# richiesta con {"progress": false})
+PROGRESS_EVENTS = os.environ.get("PROGRESS_EVENTS", "true").lower() == "true"
 
-    user_message = payload.get("prompt") or payload.get("input")
 
-    if not user_message:
-        yield json.dumps({
-            "status": "failed",
-            "error": "No prompt provided."
-        })
-        return
+app = BedrockAgentCoreApp()
+log = app.logger
 
-    # Load the foundation model
-    model = load_model()
 
-    # ---------------- SYSTEM PROMPT NUOVO E RIPULITO ----------------
-    system_prompt = """
+# ---------------- SYSTEM PROMPT NUOVO E RIPULITO ----------------
+SYSTEM_PROMPT = """
 You are the AgentCore Digestor Agent.
 
 Your role is to perform HIGH-QUALITY, TOOL-DRIVEN ingestion and analysis of
@@ -178,7 +162,8 @@ When ingestion is requested, ALWAYS follow this exact order:
 2. `validate_data`
 3. `schema_normalizer`
 4. `load_into_iceberg(file_s3_path = normalized_path, schema = normalized_schema_list)`
-5. `create_iceberg_table`
+5. `create_iceberg_table(..., files = files_written, load_id = load_id)`
+   using `files_written` and `load_id` returned by `load_into_iceberg`
 
 Rules:
 - NEVER skip steps.
@@ -186,6 +171,14 @@ Rules:
 - ALWAYS use only the normalized schema.
 - NEVER use Pandas dtypes (int64/object/etc.) for CTAS.
 
+Write modes for `create_iceberg_table` (default "append"):
+- "append" → add the new rows
+- "overwrite" → replace the whole table
+- "overwrite_partitions" → replace only the partitions present in the new
+  data (requires `partition_columns`)
+- "merge" → upsert on `key_columns` (requires `key_columns`)
+Use a mode other than "append" ONLY if the user explicitly asks for it.
+
 ──────────────────────────────────────────────────────────────────────────────
 SECTION 5 — NON-TABULAR FILES (NO INGESTION PIPELINE)
 ──────────────────────────────────────────────────────────────────────────────
@@ -219,28 +212,171 @@ SECTION 7 — GENERAL RULES
 - ALWAYS follow the pipeline exactly.
 - AFTER normalization, ALWAYS ingest using `normalized_path` only.
 
+──────────────────────────────────────────────────────────────────────────────
+SECTION 8 — PARALLEL TOOL CALLS
+──────────────────────────────────────────────────────────────────────────────
+
+Independent tools SHOULD be requested together in the same turn; they run
+concurrently. For example:
+- `raw_ingest` together with `detect_file_type`
+- `raw_ingest` together with `validate_data` or `analyze_schema`
+
+A tool that needs the output of another one MUST wait for it in a later
+turn. These calls are rejected if their prerequisite has not completed
+successfully:
+- `convert_semi_tabular`, `analyze_schema`, `schema_normalizer` → after `detect_file_type`
+- `validate_data` → after `analyze_schema`
+- `load_into_iceberg` → after `schema_normalizer`, on its `normalized_path`
+- `create_iceberg_table` → after `load_into_iceberg`
+
+If a call is rejected, run the missing step first; do not retry blindly.
+
+──────────────────────────────────────────────────────────────────────────────
+SECTION 9 — COMPACTED TOOL RESPONSES
+──────────────────────────────────────────────────────────────────────────────
+
+Large fields of tool responses (column lists, per-column reports, sample
+rows, previews) are replaced by summaries. Such responses carry a
+`detail_handle` and the list of summarized fields in `detail_paths`.
+
+- Call `get_tool_detail(handle, path)` ONLY when the user asks for those
+  details or a decision depends on them (e.g. `path = "columns.amount"`).
+- NEVER pass summaries to other tools as if they were the full values.
+
 """
 
-    # Create Strands Agent
-    agent = Agent(
-        model=model,
-        system_prompt=system_prompt,
-        tools=[
-            detect_file_type,
-            raw_ingest,
-            convert_semi_tabular,
-            analyze_schema,
-            validate_data,
-            schema_normalizer,
-            load_into_iceberg,
-            create_iceberg_table
-        ]
-    )
-
-    # Stream output
-    stream = agent.stream_async(user_message)
-
-    async for event in stream:
-        if isinstance(event.get("data"), str):
-            yield event["data"]
+_agent_pool = None
+_runtime_lock = threading.Lock()
+_tracing_ready = False
+_tracing_lock = threading.Lock()
+
+
+def tracing_runtime():
+    """
+    Span export, configured once per process. The fast path only needs
+    this (its tools are imported on first use), not the agent pool.
+    """
+    global _tracing_ready
+    with _tracing_lock:
+        if not _tracing_ready:
+            from tools.tracing import setup_tracing
+
+            # Export degli span (file locale / collector OTLP), se configurato
+            setup_tracing()
+            _tracing_ready = True
+
+
+def runtime():
+    """
+    Tracing, tools and the agent pool (model client + prompt + tools),
+    imported and built once per process. Started in a background thread at
+    import (AGENT_WARM_ON_START), so the entrypoint module loads without
+    the heavy dependencies and the first request only waits for what is
+    still missing.
+    """
+    global _agent_pool
+    tracing_runtime()
+    with _runtime_lock:
+        if _agent_pool is None:
+            from agents.pool import AgentPool
+            from tools import load_tools
+
+            pool = AgentPool(SYSTEM_PROMPT, load_tools())
+            pool.warm()
+            _agent_pool = pool
+        return _agent_pool
+
+
+if AGENT_WARM_ON_START:
+    threading.Thread(target=runtime, name="digestor-warmup", daemon=True).start()
+
+
+async def agent_stream(agent_pool, agent, session_id, user_message):
+    """
+    Text chunks of the agent's answer; the agent goes back to the pool at
+    the end of the stream. The token usage of the invocation (prompt cache
+    reads/writes included) is logged and sent as a "usage" event.
+    """
+    from model.usage import usage_since, usage_snapshot
+    from tools.progress import emit
+
+    before = usage_snapshot(agent)
+    try:
+        stream = agent.stream_async(user_message)
+
+        async for event in stream:
+            if isinstance(event.get("data"), str):
+                yield event["data"]
+    except BaseException:
+        # conversazione interrotta a metà: l'agent torna nel pool ripulito
+        agent_pool.release(None, agent)
+        raise
+
+    usage = usage_since(agent, before)
+    agent_pool.release(session_id, agent)
+
+    log.info("Model usage: %s", json.dumps(usage))
+    emit("usage", **usage)
+
+
+@app.entrypoint
+async def invoke(payload, context):
+    """
+    AgentCore entrypoint (async generator).
+    Runs Strands agent pipeline and streams output.
+
+    The agent comes from the process-level pool: the conversation of an
+    AgentCore session continues across invocations.
+
+    Explicit ingestion requests ({"action": "ingest", ...} or a prompt like
+    "ingest s3://bucket/<domain>_<dataset>.csv") run the tool pipeline
+    directly, without model calls (agents.fast_path).
+
+    With progress events (PROGRESS_EVENTS / payload "progress") the text
+    is interleaved with typed events (tools.progress): step_started,
+    step_finished (rows, bytes, elapsed), progress (percent of the fast
+    path pipeline, per step; none on the agent path), usage (model tokens and prompt cache reads/writes of
+    the invocation), heartbeat and a final result.
+    """
+
+    # Il fast path non aspetta il pool (modello, prompt) in costruzione
+    fast_request = parse_request(payload)
+    if fast_request:
+        await asyncio.to_thread(tracing_runtime)
+    else:
+        agent_pool = await asyncio.to_thread(runtime)
+
+    from tools.memo import set_session
+    from tools.progress import with_progress
+
+    session_id = getattr(context, "session_id", None)
+
+    # scope dei risultati memoizzati dei tool (tools.memo)
+    set_session(session_id)
+
+    if fast_request:
+        log.info("Fast path ingestion: %s", fast_request["file_s3_path"])
+        source = run_ingestion(fast_request)
+    else:
+        user_message = payload.get("prompt") or payload.get("input")
+
+        if not user_message:
+            yield json.dumps({
+                "status": "failed",
+                "error": "No prompt provided."
+            })
+            return
+
+        agent = agent_pool.acquire(session_id)
+        source = agent_stream(agent_pool, agent, session_id, user_message)
+
+    progress_on = PROGRESS_EVENTS if payload.get("progress") is None else bool(payload["progress"])
+    if progress_on:
+        source = with_progress(source)
+
+    # Stream output: testo così com'è, eventi come oggetti JSON
+    async for item in source:
+        if isinstance(item, dict) and not progress_on:
+            item = json.dumps(item)
+        yield item
     return
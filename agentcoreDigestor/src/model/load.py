@@ -1,12 +1,65 @@
+import itertools
+import os
+import threading
+
 from strands.models import BedrockModel
 
+from tools.backend import client_config
+
 # Uses global inference profile for Claude Sonnet 4.5
 # https://docs.aws.amazon.com/bedrock/latest/userguide/inference-profiles-support.html
 MODEL_ID = "global.anthropic.claude-sonnet-4-5-20250929-v1:0"
 
+# "bedrock" (default) o "stub": modello offline di model.stub, senza
+# chiamate a Bedrock (test del runtime, verifica del prompt caching)
+MODEL_PROVIDER = os.environ.get("MODEL_PROVIDER", "bedrock")
+
+# Client Bedrock inizializzati una volta per processo e usati a rotazione
+# (ogni client ha il proprio pool di connessioni HTTP)
+MODEL_POOL_SIZE = int(os.environ.get("MODEL_POOL_SIZE", "2"))
+
+# Tipo di cache point Bedrock dopo system prompt e definizioni dei tool
+# ("default"; "none" disattiva il prompt caching). Il prefisso resta in
+# cache solo se identico: system prompt statico, tool sempre nello stesso
+# ordine (tools.TOOL_NAMES)
+PROMPT_CACHE = os.environ.get("PROMPT_CACHE", "default")
+
+_pool = []
+_next = None
+_lock = threading.Lock()
+
+
+def cache_config() -> dict:
+    if PROMPT_CACHE.lower() in ("", "none", "false"):
+        return {}
+    return {"cache_prompt": PROMPT_CACHE, "cache_tools": PROMPT_CACHE}
+
+
+def build_model():
+    if MODEL_PROVIDER == "stub":
+        from model.stub import StubModel
+        return StubModel(**cache_config())
+
+    return BedrockModel(
+        model_id=MODEL_ID,
+        boto_client_config=client_config("bedrock-runtime"),
+        **cache_config()
+    )
+
+
 def load_model() -> BedrockModel:
     """
     Get Bedrock model client.
     Uses IAM authentication via the execution role.
+
+    The clients are created on first use and reused by every later
+    request; concurrent requests are spread over MODEL_POOL_SIZE clients.
+    System prompt and tool specs are sent with cache points (PROMPT_CACHE),
+    so turns after the first read them from the Bedrock prompt cache.
     """
-    return BedrockModel(model_id=MODEL_ID)
\ No newline at end of file
+    global _next
+    with _lock:
+        if not _pool:
+            _pool.extend(build_model() for _ in range(max(MODEL_POOL_SIZE, 1)))
+            _next = itertools.cycle(_pool)
+        return next(_next)
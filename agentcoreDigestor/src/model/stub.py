@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from strands.models import Model
+
+from tools.shaping import estimate_tokens
+
+# Testo restituito a ogni turno
+STUB_MODEL_RESPONSE = os.environ.get("STUB_MODEL_RESPONSE", "Stub response.")
+
+# JSON validato contro l'output_model di structured_output
+STUB_STRUCTURED_OUTPUT = os.environ.get("STUB_STRUCTURED_OUTPUT", "{}")
+
+# Come Bedrock: prefissi sotto la soglia non vengono messi in cache, le voci
+# scadono dopo il TTL dall'ultimo uso
+STUB_CACHE_MIN_TOKENS = int(os.environ.get("STUB_CACHE_MIN_TOKENS", "1024"))
+STUB_CACHE_TTL_SECONDS = float(os.environ.get("STUB_CACHE_TTL_SECONDS", "300"))
+
+_cache = {}   # hash del prefisso → ultimo uso
+_lock = threading.Lock()
+
+
+class StubModel(Model):
+    """
+    Offline stand-in for BedrockModel (MODEL_PROVIDER=stub): answers every
+    turn with STUB_MODEL_RESPONSE and reports Bedrock-shaped usage,
+    including prompt caching.
+
+    With `cache_prompt` / `cache_tools` set (the BedrockModel options), the
+    system prompt and tool specs form the cached prefix: the first turn
+    reports it as cacheWriteInputTokens, later turns within the TTL as
+    cacheReadInputTokens, in any session of the process. Without them, the
+    prefix is counted in inputTokens on every turn.
+    """
+
+    def __init__(self, **model_config):
+        self.config = {"model_id": "stub", **model_config}
+
+    def update_config(self, **model_config):
+        self.config.update(model_config)
+
+    def get_config(self):
+        return self.config
+
+    def usage(self, messages, tool_specs, system_prompt):
+        prompt_tokens = estimate_tokens(system_prompt or "")
+        tool_tokens = estimate_tokens(tool_specs or [])
+        message_tokens = estimate_tokens(messages)
+
+        # Il cache point dei tool copre anche il system prompt che lo precede
+        if self.config.get("cache_tools"):
+            prefix, prefix_tokens = [system_prompt, tool_specs], prompt_tokens + tool_tokens
+        elif self.config.get("cache_prompt"):
+            prefix, prefix_tokens = [system_prompt], prompt_tokens
+        else:
+            prefix, prefix_tokens = None, 0
+
+        read = write = 0
+        if prefix is not None and prefix_tokens >= STUB_CACHE_MIN_TOKENS:
+            key = hashlib.sha256(json.dumps(prefix, sort_keys=True, default=str).encode()).hexdigest()
+            now = time.monotonic()
+            with _lock:
+                last_used = _cache.get(key)
+                if last_used is not None and now - last_used < STUB_CACHE_TTL_SECONDS:
+                    read = prefix_tokens
+                else:
+                    write = prefix_tokens
+                _cache[key] = now
+
+        input_tokens = prompt_tokens + tool_tokens + message_tokens - read - write
+        output_tokens = estimate_tokens(STUB_MODEL_RESPONSE)
+        return {
+            "inputTokens": input_tokens,
+            "outputTokens": output_tokens,
+            "totalTokens": input_tokens + read + write + output_tokens,
+            "cacheReadInputTokens": read,
+            "cacheWriteInputTokens": write
+        }
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        # versioni di Strands che passano il prompt come blocchi di contenuto
+        if system_prompt is None and kwargs.get("system_prompt_content"):
+            system_prompt = "".join(b.get("text", "") for b in kwargs["system_prompt_content"])
+
+        usage = self.usage(messages, tool_specs, system_prompt)
+
+        yield {"messageStart": {"role": "assistant"}}
+        yield {"contentBlockStart": {"start": {}}}
+        yield {"contentBlockDelta": {"delta": {"text": STUB_MODEL_RESPONSE}}}
+        yield {"contentBlockStop": {}}
+        yield {"messageStop": {"stopReason": "end_turn"}}
+        yield {"metadata": {"usage": usage, "metrics": {"latencyMs": 0}}}
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        """
+        STUB_STRUCTURED_OUTPUT validated against `output_model` (pydantic
+        ValidationError when it lacks required fields).
+        """
+        yield {"output": output_model.model_validate_json(STUB_STRUCTURED_OUTPUT)}
@@ -0,0 +1,28 @@
+# Campi Usage di Strands/Bedrock → nomi nel report
+USAGE_FIELDS = {
+    "inputTokens": "input_tokens",
+    "outputTokens": "output_tokens",
+    "totalTokens": "total_tokens",
+    "cacheReadInputTokens": "cache_read_tokens",
+    "cacheWriteInputTokens": "cache_write_tokens"
+}
+
+
+def usage_snapshot(agent) -> dict:
+    """
+    Token usage accumulated by the agent so far (all its turns).
+    """
+    return dict(agent.event_loop_metrics.accumulated_usage)
+
+
+def usage_since(agent, before: dict) -> dict:
+    """
+    Token usage of the agent since `before` (one invocation), with the
+    share of prompt tokens read from the prompt cache.
+    """
+    after = usage_snapshot(agent)
+    usage = {name: after.get(field, 0) - before.get(field, 0) for field, name in USAGE_FIELDS.items()}
+
+    prompt_tokens = usage["input_tokens"] + usage["cache_read_tokens"] + usage["cache_write_tokens"]
+    usage["cache_hit_ratio"] = round(usage["cache_read_tokens"] / prompt_tokens, 3) if prompt_tokens else 0.0
+    return usage
@@ -0,0 +1,26 @@
+import importlib
+
+# Tool dell'agent: ogni modulo tools.<nome> definisce la funzione @tool <nome>
+TOOL_NAMES = [
+    "detect_file_type",
+    "raw_ingest",
+    "convert_semi_tabular",
+    "analyze_schema",
+    "validate_data",
+    "schema_normalizer",
+    "load_into_iceberg",
+    "create_iceberg_table",
+    "get_tool_detail"
+]
+
+
+def load_tool(name):
+    return getattr(importlib.import_module(f"tools.{name}"), name)
+
+
+def load_tools():
+    """
+    Imports the tool modules (strands, boto3, OpenTelemetry) on first use
+    instead of at import of the entrypoint.
+    """
+    return [load_tool(name) for name in TOOL_NAMES]
@@ -1,11 +1,17 @@
-import json
-import boto3
 from strands import tool
 
-lambda_client = boto3.client("lambda")
+from .executor import async_tool
+from .memo import memoized
+from .progress import reported
+from .shaping import shaped
+from .tracing import traced_invoke
 
 
 @tool
+@async_tool
+@shaped("analyze_schema")
+@reported("analyze_schema")
+@memoized("analyze_schema")
 def analyze_schema(file_s3_path: str, file_format: str, max_rows: int = 50) -> dict:
     """
     Delegates schema analysis to the analyze_schema Lambda.
@@ -17,10 +23,4 @@ def analyze_schema(file_s3_path: str, file_format: str, max_rows: int = 50) -> d
         "max_rows": max_rows
     }
 
-    response = lambda_client.invoke(
-        FunctionName="agentcore-digestor-lambda-analyze-schema-dev",
-        InvocationType="RequestResponse",
-        Payload=json.dumps(payload)
-    )
-
-    return json.loads(response["Payload"].read().decode("utf-8"))
+    return traced_invoke("analyze-schema", payload)
@@ -0,0 +1,61 @@
+import os
+import sys
+import threading
+
+# "lambda" (default): tool Lambda su AWS
+# "local": handler di tools_sources eseguiti in-process, S3/Glue/Athena locali
+DIGESTOR_BACKEND = os.environ.get("DIGESTOR_BACKEND", "lambda")
+DIGESTOR_LOCAL_ROOT = os.environ.get("DIGESTOR_LOCAL_ROOT", "./.digestor-local")
+DIGESTOR_LOCAL_WORKERS = int(os.environ.get("DIGESTOR_LOCAL_WORKERS", "0"))
+TOOLS_SOURCES_DIR = os.environ.get(
+    "TOOLS_SOURCES_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "tools_sources")
+)
+
+ENV = os.environ.get("ENV", "dev")
+
+# Client AWS condivisi da tutte le sessioni del processo: stessa factory
+# (pool, keep-alive, timeout, retry) delle Lambda, da digestor_common.aws.
+# TOOLS_SOURCES_DIR deve contenere il pacchetto digestor_common anche nel
+# bundle dell'agent.
+if os.path.abspath(TOOLS_SOURCES_DIR) not in sys.path:
+    sys.path.insert(0, os.path.abspath(TOOLS_SOURCES_DIR))
+
+from digestor_common.aws import client as aws_client, client_config  # noqa: E402
+
+
+def function_name(component: str) -> str:
+    """
+    agentcore-digestor-lambda-<component>-<env>
+    """
+    return f"agentcore-digestor-lambda-{component}-{ENV}"
+
+
+def _local_client():
+    from digestor_common.local import LocalLambdaClient
+    return LocalLambdaClient(DIGESTOR_LOCAL_ROOT, workers=DIGESTOR_LOCAL_WORKERS)
+
+
+# Creati al primo uso: importare il modulo (es. per client_config) non
+# richiede region né credenziali AWS
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def lambda_client():
+    """
+    Lambda client of the backend (LocalLambdaClient with DIGESTOR_BACKEND=local).
+    """
+    with _clients_lock:
+        if "lambda" not in _clients:
+            _clients["lambda"] = _local_client() if DIGESTOR_BACKEND == "local" else aws_client("lambda")
+        return _clients["lambda"]
+
+
+def s3_client():
+    """
+    S3 client of the backend (the local filesystem stand-in with DIGESTOR_BACKEND=local).
+    """
+    if DIGESTOR_BACKEND == "local":
+        return lambda_client().s3
+    return aws_client("s3")
@@ -1,10 +1,14 @@
-import json
-import boto3
 from strands import tool
 
-lambda_client = boto3.client("lambda")
+from .executor import async_tool
+from .progress import reported
+from .shaping import shaped
+from .tracing import traced_invoke
 
 @tool
+@async_tool
+@shaped("convert_semi_tabular")
+@reported("convert_semi_tabular")
 def convert_semi_tabular(file_s3_path: str, file_type: str, sheet: int = 0) -> dict:
     payload = {
         "file_s3_path": file_s3_path,
@@ -12,10 +16,4 @@ def convert_semi_tabular(file_s3_path: str, file_type: str, sheet: int = 0) -> d
         "sheet": sheet
     }
 
-    resp = lambda_client.invoke(
-        FunctionName="agentcore-digestor-lambda-convert-semi-tabular-dev",
-        InvocationType="RequestResponse",
-        Payload=json.dumps(payload)
-    )
-
-    return json.loads(resp["Payload"].read())
+    return traced_invoke("convert-semi-tabular", payload)
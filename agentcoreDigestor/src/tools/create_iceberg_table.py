@@ -1,8 +1,9 @@
-import json
-import boto3
 from strands import tool
 
-lambda_client = boto3.client("lambda")
+from .executor import async_tool
+from .progress import reported
+from .shaping import shaped
+from .tracing import traced_invoke
 
 # ---------------------------------------------------------
 # Mapping tool-types → Glue types
@@ -31,23 +32,45 @@ def convert_schema_for_glue(schema: dict):
 # Tool: create_iceberg_table
 # ---------------------------------------------------------
 @tool
-def create_iceberg_table(table_name: str, schema: dict) -> dict:
+@async_tool
+@shaped("create_iceberg_table")
+@reported("create_iceberg_table")
+def create_iceberg_table(
+    table_name: str,
+    schema: dict,
+    mode: str = "append",
+    key_columns: list = None,
+    partition_columns: list = None,
+    files: list = None,
+    load_id: str = None
+) -> dict:
     """
     Calls the iceberg_ctas Lambda with schema converted to Glue types.
+
+    If the table does not exist it is created via CTAS. Otherwise the
+    normalized data is applied with `mode`:
+    - "append": insert the new rows
+    - "overwrite": replace the whole table content
+    - "overwrite_partitions": replace only the partitions (values of
+      `partition_columns`) present in the new data
+    - "merge": upsert on `key_columns`
+
+    `files` and `load_id` are the `files_written` and `load_id` returned by
+    load_into_iceberg: only those files are read, and re-applying the same
+    load_id is a no-op.
     """
-    
+
     # 1) convert schema
     glue_schema = convert_schema_for_glue(schema)
 
     payload = {
         "table_name": table_name,
-        "schema": glue_schema
+        "schema": glue_schema,
+        "mode": mode,
+        "key_columns": key_columns or [],
+        "partition_columns": partition_columns or [],
+        "files": files or [],
+        "load_id": load_id
     }
 
-    response = lambda_client.invoke(
-        FunctionName="agentcore-digestor-lambda-iceberg-ctas-dev",
-        InvocationType="RequestResponse",
-        Payload=json.dumps(payload)
-    )
-
-    return json.loads(response["Payload"].read().decode("utf-8"))
+    return traced_invoke("iceberg-ctas", payload)
@@ -1,11 +1,17 @@
-import json
-import boto3
 from strands import tool
 
-lambda_client = boto3.client("lambda")
+from .executor import async_tool
+from .memo import memoized
+from .progress import reported
+from .shaping import shaped
+from .tracing import traced_invoke
 
 
 @tool
+@async_tool
+@shaped("detect_file_type")
+@reported("detect_file_type")
+@memoized("detect_file_type")
 def detect_file_type(file_s3_path: str, sheet: str = None) -> dict:
     """
     Wrapper AgentCore per la Lambda detect_file_type.
@@ -18,10 +24,4 @@ def detect_file_type(file_s3_path: str, sheet: str = None) -> dict:
     if sheet is not None:
         payload["sheet"] = sheet
 
-    response = lambda_client.invoke(
-        FunctionName="agentcore-digestor-lambda-detect-file-type-dev",
-        InvocationType="RequestResponse",
-        Payload=json.dumps(payload)
-    )
-
-    return json.loads(response["Payload"].read().decode("utf-8"))
+    return traced_invoke("detect-file-type", payload)
@@ -0,0 +1,34 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Chiamate bloccanti (invoke Lambda, HEAD/copy S3) in volo per processo,
+# su tutte le sessioni: oltre questo limite restano in coda
+TOOL_MAX_WORKERS = int(os.environ.get("TOOL_MAX_WORKERS", "32"))
+
+executor = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="digestor-tool")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Runs a blocking call on the tool executor, with the caller's context
+    (memoization session, current span) copied into the worker thread.
+    """
+    ctx = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(ctx.run, fn, *args, **kwargs))
+
+
+def async_tool(fn):
+    """
+    Async version of a blocking tool function, for the event loop of the
+    runtime: concurrent sessions and parallel tool calls only wait on the
+    executor, never on each other. Goes directly under @tool.
+    """
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run_blocking(fn, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,24 @@
+from strands import tool
+
+from .shaping import detail, resolve
+
+
+@tool
+def get_tool_detail(handle: str, path: str = "") -> dict:
+    """
+    Returns the full value behind a compacted tool response.
+
+    `handle` is the `detail_handle` of the response; `path` is a dotted
+    path into it (e.g. "columns.amount", "sample_issue_rows.0",
+    "sample_preview"); empty for the whole response.
+    """
+    result = detail(handle)
+    if result is None:
+        return {"status": "failed", "error": f"Unknown or expired handle: {handle}"}
+
+    try:
+        value = resolve(result, path)
+    except (KeyError, IndexError, ValueError, TypeError):
+        return {"status": "failed", "error": f"Path not found: {path}"}
+
+    return {"status": "success", "handle": handle, "path": path, "value": value}
@@ -1,11 +1,15 @@
-import json
-import boto3
 from strands import tool
 
-lambda_client = boto3.client("lambda")
+from .executor import async_tool
+from .progress import reported
+from .shaping import shaped
+from .tracing import traced_invoke
 
 
 @tool
+@async_tool
+@shaped("load_into_iceberg")
+@reported("load_into_iceberg")
 def load_into_iceberg(file_s3_path: str, table_name: str, schema: list) -> dict:
     """
     Tool che inoltra il lavoro alla Lambda dockerizzata 'load_into_iceberg'.
@@ -18,10 +22,4 @@ def load_into_iceberg(file_s3_path: str, table_name: str, schema: list) -> dict:
         "schema": schema  # non obbligatorio, ma utile per future estensioni
     }
 
-    response = lambda_client.invoke(
-        FunctionName="agentcore-digestor-lambda-load-into-iceberg-dev",
-        InvocationType="RequestResponse",
-        Payload=json.dumps(payload)
-    )
-
-    return json.loads(response["Payload"].read().decode("utf-8"))
+    return traced_invoke("load-into-iceberg", payload)
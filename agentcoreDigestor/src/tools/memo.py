@@ -0,0 +1,97 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from .backend import s3_client
+
+# Risultati tenuti per sessione e sessioni tenute per processo (LRU)
+MEMO_MAX_ENTRIES = int(os.environ.get("MEMO_MAX_ENTRIES", "64"))
+MEMO_MAX_SESSIONS = int(os.environ.get("MEMO_MAX_SESSIONS", "32"))
+
+# Sessione AgentCore della richiesta corrente (impostata dall'entrypoint;
+# asyncio.to_thread copia il contesto nel thread del tool)
+_session = contextvars.ContextVar("digestor_session", default=None)
+
+_cache = OrderedDict()   # session_id → OrderedDict(key → result)
+_lock = threading.Lock()
+
+
+def set_session(session_id):
+    """
+    Binds the memoization scope of the current request (None disables
+    memoization).
+    """
+    _session.set(session_id)
+
+
+def object_etag(file_s3_path):
+    path = file_s3_path.replace("s3://", "")
+    bucket, _, key = path.partition("/")
+    return s3_client().head_object(Bucket=bucket, Key=key)["ETag"]
+
+
+def _lookup(session_id, key):
+    with _lock:
+        entries = _cache.get(session_id)
+        if entries is None or key not in entries:
+            return None
+        _cache.move_to_end(session_id)
+        entries.move_to_end(key)
+        return entries[key]
+
+
+def _store(session_id, key, result):
+    with _lock:
+        entries = _cache.setdefault(session_id, OrderedDict())
+        _cache.move_to_end(session_id)
+        entries[key] = result
+        while len(entries) > MEMO_MAX_ENTRIES:
+            entries.popitem(last=False)
+        while len(_cache) > MEMO_MAX_SESSIONS:
+            _cache.popitem(last=False)
+
+
+def memoized(tool_name, path_arg="file_s3_path"):
+    """
+    Memoizes a read-only tool within the current session.
+
+    The key is (tool, arguments, ETag of the object at `path_arg`): the
+    ETag is read with a HEAD, so a file overwritten under the same path is
+    a miss. Only successful results are kept; without a session, or when
+    the HEAD fails, the tool is simply called.
+
+    Goes under @tool, so the tool spec still comes from the wrapped
+    function's signature and docstring.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            session_id = _session.get()
+            if session_id is None:
+                return fn(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            try:
+                etag = object_etag(bound.arguments[path_arg])
+            except Exception:
+                return fn(*args, **kwargs)
+
+            key = (tool_name, json.dumps(bound.arguments, sort_keys=True, default=str), etag)
+            cached = _lookup(session_id, key)
+            if cached is not None:
+                return {**cached, "memoized": True}
+
+            result = fn(*args, **kwargs)
+            if isinstance(result, dict) and result.get("status") != "failed":
+                _store(session_id, key, result)
+            return result
+
+        return wrapper
+    return decorator
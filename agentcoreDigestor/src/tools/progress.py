@@ -0,0 +1,143 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+
+# Secondi senza output dopo cui lo stream invia un heartbeat (tiene viva la
+# connessione mentre una Lambda lavora)
+HEARTBEAT_SECONDS = float(os.environ.get("PROGRESS_HEARTBEAT_SECONDS", "10"))
+
+# Canale della richiesta corrente (copiato nei thread dei tool)
+_channel = contextvars.ContextVar("digestor_progress", default=None)
+
+_END = object()
+
+
+class ProgressChannel:
+    """
+    Queue of progress events of one request, fed from any thread.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.queue = asyncio.Queue()
+
+    def put(self, item):
+        # dal thread del loop subito, per restare in ordine con lo stream
+        if threading.get_ident() == self.loop_thread:
+            self.queue.put_nowait(item)
+        else:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+
+def emit(event_type, **fields):
+    """
+    Sends a progress event to the current request's stream (no-op outside
+    a request with progress enabled).
+    """
+    channel = _channel.get()
+    if channel is not None:
+        channel.put({"type": event_type, "timestamp": round(time.time(), 3), **fields})
+
+
+def reported(tool_name):
+    """
+    step_started / step_finished events around a tool, with the rows,
+    bytes and time of the handler's metrics. Goes under @shaped, which
+    would hide the metrics.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            emit("step_started", step=tool_name)
+            start = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                emit("step_finished", step=tool_name, status="failed", error=str(e),
+                     elapsed_ms=round((time.monotonic() - start) * 1000))
+                raise
+
+            metrics = (result.get("metrics") or {}) if isinstance(result, dict) else {}
+            emit(
+                "step_finished",
+                step=tool_name,
+                status=result.get("status") if isinstance(result, dict) else None,
+                error=result.get("error") if isinstance(result, dict) else None,
+                elapsed_ms=round((time.monotonic() - start) * 1000),
+                rows=metrics.get("rows"),
+                bytes_read=metrics.get("bytes_in"),
+                bytes_written=metrics.get("bytes_out")
+            )
+            return result
+
+        return wrapper
+    return decorator
+
+
+async def with_progress(source):
+    """
+    Merges the text chunks (and dict events) of `source` with the progress
+    events of the tools it calls, in arrival order:
+
+        "text chunk"
+        {"type": "step_started" | "step_finished" | "progress" | "usage"
+                 | "heartbeat" | "result", ...}
+
+    A heartbeat is sent after HEARTBEAT_SECONDS of silence. The stream ends
+    with a "result" event (status and per-step status) unless `source`
+    produced one itself.
+
+    "progress" (percent complete) is per pipeline step and only on the fast
+    path, whose step list is known in advance. There is no percent inside
+    a step: each tool is one synchronous Lambda invoke, which reports its
+    rows and bytes only in step_finished. On the agent path the number of
+    steps depends on the model, so only step events are sent; the
+    heartbeat covers long steps on both paths.
+    """
+    channel = ProgressChannel()
+    _channel.set(channel)
+
+    async def produce():
+        try:
+            async for item in source:
+                channel.queue.put_nowait(item)
+        except Exception as e:
+            # rilanciata dal consumer, nello stream del client
+            channel.queue.put_nowait(e)
+        finally:
+            channel.queue.put_nowait(_END)
+
+    # il task copia il contesto: i tool vedono il canale
+    producer = asyncio.create_task(produce())
+    started = time.monotonic()
+    steps = {}
+    result_sent = False
+
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(channel.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield {"type": "heartbeat", "elapsed_s": round(time.monotonic() - started, 1)}
+                continue
+
+            if item is _END:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            if isinstance(item, dict):
+                if item.get("type") == "step_finished":
+                    steps[item["step"]] = item.get("status")
+                result_sent = result_sent or item.get("type") == "result"
+            yield item
+    finally:
+        if not producer.done():
+            producer.cancel()
+
+    if not result_sent:
+        failed = any(status == "failed" for status in steps.values())
+        yield {"type": "result", "status": "failed" if failed else "completed", "steps": steps}
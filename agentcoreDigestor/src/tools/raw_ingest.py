@@ -1,12 +1,17 @@
-import boto3
 import os
 from datetime import datetime
+from opentelemetry.trace import SpanKind
 from strands import tool
 
-s3 = boto3.client("s3")
+from .backend import s3_client
+from .executor import async_tool
+from .progress import reported
+from .tracing import tracer
 
 
 @tool
+@async_tool
+@reported("raw_ingest")
 def raw_ingest(file_s3_path: str) -> dict:
     """
     Copies the raw source file into the RAW archive bucket.
@@ -48,11 +53,16 @@ def raw_ingest(file_s3_path: str) -> dict:
     # -------------------------------------------------------------
     # Copy file into archive bucket
     # -------------------------------------------------------------
-    s3.copy_object(
-        Bucket=archive_bucket,
-        CopySource={"Bucket": original_bucket, "Key": original_key},
-        Key=archive_key
-    )
+    with tracer.start_as_current_span(
+        "s3.copy_object",
+        kind=SpanKind.CLIENT,
+        attributes={"rpc.system": "aws-api", "rpc.service": "S3", "rpc.method": "CopyObject"}
+    ):
+        s3_client().copy_object(
+            Bucket=archive_bucket,
+            CopySource={"Bucket": original_bucket, "Key": original_key},
+            Key=archive_key
+        )
 
     # -------------------------------------------------------------
     # Return useful structured metadata
@@ -1,20 +1,18 @@
-import json
-import boto3
 from strands import tool
 
-lambda_client = boto3.client("lambda")
+from .executor import async_tool
+from .progress import reported
+from .shaping import shaped
+from .tracing import traced_invoke
 
 
 @tool
+@async_tool
+@shaped("schema_normalizer")
+@reported("schema_normalizer")
 def schema_normalizer(file_s3_path: str, schema: dict = None, mode: str = "drop_invalid") -> dict:
     payload = {
         "file_s3_path": file_s3_path
     }
 
-    response = lambda_client.invoke(
-        FunctionName="agentcore-digestor-lambda-schema-normalizer-dev",
-        InvocationType="RequestResponse",
-        Payload=json.dumps(payload)
-    )
-
-    return json.loads(response["Payload"].read().decode("utf-8"))
+    return traced_invoke("schema-normalizer", payload)
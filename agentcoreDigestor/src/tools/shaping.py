@@ -0,0 +1,150 @@
+import functools
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from opentelemetry import trace
+
+log = logging.getLogger(__name__)
+
+# Risposte complete tenute in memoria per get_tool_detail (LRU per processo)
+DETAIL_MAX_HANDLES = int(os.environ.get("DETAIL_MAX_HANDLES", "256"))
+
+# Elementi mostrati al modello per le liste compattate
+COMPACT_HEAD_ITEMS = int(os.environ.get("COMPACT_HEAD_ITEMS", "10"))
+
+_details = OrderedDict()   # handle → full result
+_lock = threading.Lock()
+
+
+def estimate_tokens(value):
+    """
+    Rough token count of a JSON value (~4 characters per token).
+    """
+    return (len(json.dumps(value, default=str)) + 3) // 4
+
+
+# ------------------------------------------------------------
+# Field summaries
+# ------------------------------------------------------------
+def summarize_list(items):
+    return {"items": len(items), "head": items[:COMPACT_HEAD_ITEMS]}
+
+
+def summarize_count(items):
+    return {"items": len(items)}
+
+
+def summarize_columns_report(report):
+    """
+    validate_data "columns": only the columns with problems, with counts.
+    """
+    problems = {
+        col: {k: info[k] for k in ("present", "null_count", "invalid_count") if k in info}
+        for col, info in report.items()
+        if not info.get("present", True) or info.get("null_count") or info.get("invalid_count")
+    }
+    return {"columns": len(report), "columns_with_issues": problems}
+
+
+def summarize_omitted(_):
+    return "omitted"
+
+
+# Campi voluminosi per tool: il resto della risposta passa invariato
+# (percorsi, schema e id servono al modello per i passi successivi)
+COMPACT_FIELDS = {
+    "detect_file_type": {"columns": summarize_list},
+    "validate_data": {
+        "columns": summarize_columns_report,
+        "sample_issue_rows": summarize_count
+    },
+    "schema_normalizer": {
+        "sample_preview": summarize_count,
+        "column_stats": summarize_omitted
+    }
+}
+
+# Metriche dell'handler: mai utili al modello
+COMMON_FIELDS = {"metrics": summarize_omitted}
+
+
+# ------------------------------------------------------------
+# Handles
+# ------------------------------------------------------------
+def _store(result):
+    handle = f"h_{uuid.uuid4().hex[:12]}"
+    with _lock:
+        _details[handle] = result
+        while len(_details) > DETAIL_MAX_HANDLES:
+            _details.popitem(last=False)
+    return handle
+
+
+def detail(handle):
+    """
+    Full result stored under `handle`, or None if unknown/evicted.
+    """
+    with _lock:
+        return _details.get(handle)
+
+
+def resolve(value, path):
+    """
+    Value at a dotted path ("columns.amount", "sample_issue_rows.0").
+    """
+    for part in [p for p in path.split(".") if p]:
+        if isinstance(value, list):
+            value = value[int(part)]
+        else:
+            value = value[part]
+    return value
+
+
+def compact(tool_name, result):
+    """
+    Compact copy of a tool result for the model: the bulky fields of
+    COMPACT_FIELDS are replaced by summaries, and the full result is kept
+    under an opaque handle for get_tool_detail.
+    """
+    if not isinstance(result, dict):
+        return result
+
+    rules = {**COMMON_FIELDS, **COMPACT_FIELDS.get(tool_name, {})}
+    elided = [field for field in rules if result.get(field) not in (None, [], {})]
+    if not elided:
+        return result
+
+    out = dict(result)
+    for field in elided:
+        out[field] = rules[field](result[field])
+    out["detail_handle"] = _store(result)
+    out["detail_paths"] = elided
+    return out
+
+
+def shaped(tool_name):
+    """
+    Returns compact(tool_name, result) to the model and reports the token
+    estimate of the full and compact output on the current (tool) span.
+    Goes under @tool, like tools.memo.memoized.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            result = fn(*args, **kwargs)
+            out = compact(tool_name, result)
+
+            full_tokens = estimate_tokens(result)
+            compact_tokens = estimate_tokens(out) if out is not result else full_tokens
+            span = trace.get_current_span()
+            span.set_attribute("digestor.output_tokens", full_tokens)
+            span.set_attribute("digestor.output_tokens_compact", compact_tokens)
+            log.info("tool=%s output_tokens=%d compact=%d", tool_name, full_tokens, compact_tokens)
+            return out
+
+        return wrapper
+    return decorator
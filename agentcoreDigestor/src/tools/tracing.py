@@ -0,0 +1,109 @@
+import json
+import os
+
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+
+from .backend import lambda_client, function_name
+
+# Campo del payload con il trace context (letto da digestor_common.tracing)
+TRACE_KEY = "_trace"
+
+tracer = trace.get_tracer("agentcore_digestor")
+
+_propagator = TraceContextTextMapPropagator()
+
+
+def setup_tracing():
+    """
+    Configures span export for the agent.
+
+    Strands already records the agent loop (invoke_agent, one
+    execute_event_loop_cycle per turn, chat spans for the model calls and
+    execute_tool spans); `traced_invoke` adds the Lambda call under each
+    tool and the handler adds its own spans and phases under that.
+
+    - DIGESTOR_TRACES_FILE: spans appended as JSON lines (the tool handlers
+      write to the same file when run by the local backend)
+    - OTEL_EXPORTER_OTLP_ENDPOINT: OTLP export to a collector
+
+    When the runtime already installed an SDK tracer provider (ADOT
+    auto-instrumentation in AgentCore) it is reused and only the file
+    exporter is added.
+    """
+    traces_file = os.environ.get("DIGESTOR_TRACES_FILE")
+    otlp_endpoint = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT")
+    if not traces_file and not otlp_endpoint:
+        return None
+
+    from strands.telemetry import StrandsTelemetry
+
+    current = trace.get_tracer_provider()
+    configured = hasattr(current, "add_span_processor")
+    telemetry = StrandsTelemetry(tracer_provider=current if configured else None)
+
+    if traces_file:
+        telemetry.setup_console_exporter(
+            out=open(traces_file, "a"),
+            formatter=lambda span: span.to_json(indent=None) + os.linesep
+        )
+    if otlp_endpoint and not configured:
+        telemetry.setup_otlp_exporter()
+    return telemetry
+
+
+def traced_invoke(component: str, payload: dict) -> dict:
+    """
+    Synchronous invoke of agentcore-digestor-lambda-<component>-<env> in a
+    CLIENT span, with the trace context propagated in the payload.
+
+    The handler's metrics (wall time, phases, bytes, rows) are copied onto
+    the span, so the Lambda time can be told apart from the handler's own
+    phases even when the handler spans are exported elsewhere.
+    """
+    name = function_name(component)
+
+    with tracer.start_as_current_span(
+        f"lambda.invoke {component}",
+        kind=SpanKind.CLIENT,
+        attributes={
+            "faas.invoked_name": name,
+            "faas.invoked_provider": "aws",
+            "rpc.system": "aws-api",
+            "rpc.service": "Lambda",
+            "rpc.method": "Invoke"
+        }
+    ) as span:
+        carrier = {}
+        _propagator.inject(carrier)
+        if carrier:
+            payload = {**payload, TRACE_KEY: carrier}
+
+        response = lambda_client().invoke(
+            FunctionName=name,
+            InvocationType="RequestResponse",
+            Payload=json.dumps(payload)
+        )
+        result = json.loads(response["Payload"].read().decode("utf-8"))
+
+        if response.get("FunctionError"):
+            span.set_status(Status(StatusCode.ERROR, response["FunctionError"]))
+        elif isinstance(result, dict):
+            record_result(span, result)
+        return result
+
+
+def record_result(span, result):
+    status = result.get("status")
+    if status:
+        span.set_attribute("digestor.status", status)
+    if status == "failed":
+        span.set_status(Status(StatusCode.ERROR, str(result.get("error"))[:500]))
+
+    metrics = result.get("metrics") or {}
+    for key in ("wall_ms", "cpu_ms", "bytes_in", "bytes_out", "rows", "peak_rss_mb", "rss_growth_mb"):
+        if key in metrics:
+            span.set_attribute(f"digestor.handler.{key}", metrics[key])
+    for phase, values in (metrics.get("phases") or {}).items():
+        span.set_attribute(f"digestor.phase.{phase}_ms", values.get("wall_ms", 0))
@@ -1,13 +1,17 @@
-import json
-import boto3
 from strands import tool
 
-lambda_client = boto3.client("lambda")
-
-LAMBDA_NAME = "agentcore-digestor-lambda-validate-data-dev"
+from .executor import async_tool
+from .memo import memoized
+from .progress import reported
+from .shaping import shaped
+from .tracing import traced_invoke
 
 
 @tool
+@async_tool
+@shaped("validate_data")
+@reported("validate_data")
+@memoized("validate_data")
 def validate_data(file_s3_path: str, schema: list) -> dict:
     """
     Diagnostic-only validation:
@@ -20,10 +24,4 @@ def validate_data(file_s3_path: str, schema: list) -> dict:
         "schema": schema,
     }
 
-    response = lambda_client.invoke(
-        FunctionName=LAMBDA_NAME,
-        InvocationType="RequestResponse",
-        Payload=json.dumps(payload),
-    )
-
-    return json.loads(response["Payload"].read().decode("utf-8"))
+    return traced_invoke("validate-data", payload)
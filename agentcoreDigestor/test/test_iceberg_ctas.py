@@ -0,0 +1,227 @@
+import importlib.util
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+TOOLS_SOURCES = Path(__file__).parent.parent.parent / "tools_sources"
+sys.path.insert(0, str(TOOLS_SOURCES))
+
+pytest.importorskip("boto3")
+pytest.importorskip("pandas")
+
+# clients created at import need a region
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+
+from digestor_common.local import LocalCatalog, LocalS3, local_iceberg_ctas  # noqa: E402
+
+spec = importlib.util.spec_from_file_location("iceberg_ctas_main", TOOLS_SOURCES / "iceberg_ctas_src" / "main.py")
+ctas = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(ctas)
+
+BUCKET = "agentcore-digestor-iceberg-bronze-dev"
+SCHEMA = [{"name": "id", "type": "int"}, {"name": "region", "type": "string"}]
+
+
+def data_file(load_id):
+    return f"s3://{BUCKET}/warehouse/orders/data/{load_id}_0a1b.snappy.parquet"
+
+
+@pytest.fixture
+def s3(tmp_path, monkeypatch):
+    local = LocalS3(str(tmp_path / "s3"))
+    monkeypatch.setattr(ctas, "s3", local)
+    return local
+
+
+def mark_applied(load_id, result=None):
+    claims, _, _ = ctas.claim_loads(BUCKET, "orders", [load_id], 60)
+    ctas.update_claims(BUCKET, claims, state="applied", result=result or {"status": "success"})
+
+
+class TestBuilders:
+
+    def test_ctas_partitioned(self):
+        sql = ctas.build_ctas("db.orders", "db.staging", "s3://w/", ["region"], ["id", "region"])
+        assert "partitioning=ARRAY['region']" in sql
+        assert 'SELECT "id", "region" FROM db.staging' in sql
+
+    def test_ctas_unpartitioned(self):
+        sql = ctas.build_ctas("db.orders", "db.staging", "s3://w/", [], ["id"])
+        assert "partitioning" not in sql
+        assert 'SELECT "id" FROM db.staging' in sql
+
+    def test_replace_inserts_only_new_rows(self):
+        for partitions in ((), ("region",)):
+            sql = ctas.build_replace("db.orders", "db.staging", ["id", "region"], partitions)
+            assert "WHEN MATCHED THEN DELETE" in sql
+            # delete rows (_op = 0) that match nothing must not be inserted
+            assert "WHEN NOT MATCHED AND s._op = 1 THEN INSERT" in sql
+
+    def test_replace_partitions(self):
+        sql = ctas.build_replace("db.orders", "db.staging", ["id", "region"], ["region"])
+        assert 'SELECT DISTINCT NULL AS "id", "region", 0 AS _op FROM db.staging' in sql
+        assert 't."region" IS NOT DISTINCT FROM s."region"' in sql
+
+    def test_merge_last_row_wins(self):
+        sql = ctas.build_merge(
+            "db.orders", "db.staging", ["id", "region"], ["id"], ["s3://b/a.parquet", "s3://b/c.parquet"]
+        )
+        assert (
+            "ORDER BY CASE \"$path\" WHEN 's3://b/a.parquet' THEN 0 WHEN 's3://b/c.parquet' THEN 1 END "
+            'DESC NULLS LAST, "_source_row" DESC NULLS LAST'
+        ) in sql
+        assert 'WHEN MATCHED THEN UPDATE SET "region" = s."region"' in sql
+
+    def test_merge_key_only_columns(self):
+        sql = ctas.build_merge("db.orders", "db.staging", ["id"], ["id"], [])
+        assert "WHEN MATCHED" not in sql
+
+
+class TestCommitIds:
+
+    def test_commit_id(self):
+        assert ctas.commit_id(["a"]) == "a"
+        assert ctas.commit_id(["a", "c"]) == ctas.commit_id(["c", "a"])
+        assert ctas.commit_id(["a", "c"]) != ctas.commit_id(["a", "d"])
+
+    def test_load_id_of(self):
+        assert ctas.load_id_of(data_file("3f9c")) == "3f9c"
+
+
+class TestClaims:
+
+    def test_applied_load_is_skipped(self, s3):
+        mark_applied("a")
+        claims, applied, busy = ctas.claim_loads(BUCKET, "orders", ["a", "c"], 60)
+        assert set(claims) == {"c"}
+        assert set(applied) == {"a"}
+        assert busy == []
+
+    def test_pending_claim_is_busy(self, s3):
+        ctas.claim_loads(BUCKET, "orders", ["a"], 60)
+        claims, _, busy = ctas.claim_loads(BUCKET, "orders", ["a"], 60)
+        assert claims == {}
+        assert busy == ["a"]
+
+    def test_expired_or_released_claim_is_taken_over(self, s3):
+        ctas.claim_loads(BUCKET, "orders", ["a"], -1)
+        assert set(ctas.claim_loads(BUCKET, "orders", ["a"], 60)[0]) == {"a"}
+
+        claims, _, _ = ctas.claim_loads(BUCKET, "orders", ["c"], 60)
+        ctas.release_claims(BUCKET, claims)
+        assert set(ctas.claim_loads(BUCKET, "orders", ["c"], 60)[0]) == {"c"}
+
+    def test_pending_claim_with_query(self, s3, monkeypatch):
+        claims, _, _ = ctas.claim_loads(BUCKET, "orders", ["a", "c"], 60)
+        ctas.update_claims(BUCKET, claims, query_id="q-1")
+
+        monkeypatch.setattr(ctas, "query_state", lambda query_id: "RUNNING")
+        assert ctas.claim_loads(BUCKET, "orders", ["a"], 60)[2] == ["a"]
+
+        # the DML of the previous attempt committed: no second run
+        monkeypatch.setattr(ctas, "query_state", lambda query_id: "SUCCEEDED")
+        claims, applied, busy = ctas.claim_loads(BUCKET, "orders", ["a", "c"], 60)
+        assert claims == {}
+        assert set(applied) == {"a", "c"}
+
+    def test_legacy_marker(self, s3):
+        s3.put_object(
+            Bucket=BUCKET, Key=ctas.applied_marker_key("orders", "a"),
+            Body=json.dumps({"status": "success", "mode": "append"})
+        )
+        _, applied, _ = ctas.claim_loads(BUCKET, "orders", ["a"], 60)
+        assert applied["a"]["mode"] == "append"
+
+
+class TestHandler:
+
+    @pytest.fixture
+    def commits(self, s3, monkeypatch):
+        calls = []
+
+        def apply_commit(db_name, table_name, schema, mode, key_columns, partition_columns,
+                         files, exists, env, context, bucket, claims):
+            calls.append({"files": files, "loads": sorted(claims)})
+            return {"status": "success", "table_name": table_name, "mode": mode,
+                    "files_applied": len(files), "queries": []}
+
+        monkeypatch.setattr(ctas, "apply_commit", apply_commit)
+        monkeypatch.setattr(ctas, "table_exists", lambda db_name, table_name: True)
+        return calls
+
+    def test_batch_skips_applied_load(self, commits):
+        first = ctas.handler(
+            {"table_name": "orders", "schema": SCHEMA, "load_id": "a", "files": [data_file("a")]}, None
+        )
+        assert first["deduplicated"] is False
+
+        batch = ctas.handler(
+            {"table_name": "orders", "schema": SCHEMA, "load_ids": ["a", "c"],
+             "files": [data_file("a"), data_file("c")]},
+            None
+        )
+        assert batch["status"] == "success"
+        assert batch["loads_skipped"] == ["a"]
+        assert commits[-1] == {"files": [data_file("c")], "loads": ["c"]}
+
+    def test_retry_is_deduplicated(self, commits):
+        event = {"table_name": "orders", "schema": SCHEMA, "load_ids": ["a", "c"],
+                 "files": [data_file("a"), data_file("c")]}
+        ctas.handler(event, None)
+        again = ctas.handler(event, None)
+
+        assert again["deduplicated"] is True
+        assert len(commits) == 1
+
+    def test_failed_commit_releases_claims(self, commits, monkeypatch):
+        monkeypatch.setattr(
+            ctas, "apply_commit", lambda *args: {"status": "failed", "error": "boom"}
+        )
+        event = {"table_name": "orders", "schema": SCHEMA, "load_id": "a", "files": [data_file("a")]}
+        assert ctas.handler(event, None)["status"] == "failed"
+
+        marker, _ = ctas.read_marker(BUCKET, ctas.applied_marker_key("orders", "a"))
+        assert marker == {"state": "released"}
+
+    def test_busy_load_is_retryable(self, commits):
+        ctas.claim_loads(BUCKET, "orders", ["c"], 60)
+        result = ctas.handler(
+            {"table_name": "orders", "schema": SCHEMA, "load_ids": ["a", "c"],
+             "files": [data_file("a"), data_file("c")]},
+            None
+        )
+        assert result["status"] == "failed"
+        assert result["retryable"] is True
+        # the claim taken on "a" is given back
+        marker, _ = ctas.read_marker(BUCKET, ctas.applied_marker_key("orders", "a"))
+        assert marker["state"] == "released"
+
+
+class TestLocalCommit:
+
+    def test_batch_skips_applied_load(self, tmp_path):
+        pd = pytest.importorskip("pandas")
+        pytest.importorskip("pyarrow")
+
+        s3 = LocalS3(str(tmp_path / "s3"))
+        catalog = LocalCatalog(str(tmp_path), s3)
+        handler = local_iceberg_ctas(catalog)
+
+        for load_id, ids in (("a", [1, 2]), ("c", [3])):
+            path = Path(s3.local_path(data_file(load_id)))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            pd.DataFrame({"id": ids, "region": ["EU"] * len(ids)}).to_parquet(path, index=False)
+
+        handler({"table_name": "orders", "schema": SCHEMA, "load_id": "a", "files": [data_file("a")]}, None)
+        batch = handler(
+            {"table_name": "orders", "schema": SCHEMA, "load_ids": ["a", "c"],
+             "files": [data_file("a"), data_file("c")]},
+            None
+        )
+
+        assert batch["loads_skipped"] == ["a"]
+        rows = catalog.query('SELECT id FROM "orders" ORDER BY id')
+        assert rows["id"].tolist() == [1, 2, 3]
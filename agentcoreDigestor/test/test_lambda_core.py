@@ -0,0 +1,172 @@
+import importlib.util
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+TOOLS_SOURCES = Path(__file__).parent.parent.parent / "tools_sources"
+sys.path.insert(0, str(TOOLS_SOURCES))
+sys.path.insert(0, str(TOOLS_SOURCES / "lambda_core_src"))
+
+pytest.importorskip("boto3")
+
+# clients created at import need a region
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+
+spec = importlib.util.spec_from_file_location("lambda_core_main", TOOLS_SOURCES / "lambda_core_src" / "main.py")
+core = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(core)
+
+
+def step(deps, output=None, delay=0.0, log=None, name=None):
+    def run(outputs):
+        assert all(d in outputs for d in deps)
+        if log is not None:
+            log.append(name)
+        time.sleep(delay)
+        return output or {"status": "success"}
+    return {"deps": deps, "run": run}
+
+
+class TestRunDag:
+
+    def test_dependencies_and_parallelism(self):
+        log = []
+        steps = {
+            "a": step([], log=log, name="a"),
+            "b": step(["a"], delay=0.1, log=log, name="b"),
+            "c": step(["a"], delay=0.1, log=log, name="c"),
+            "d": step(["b", "c"], log=log, name="d")
+        }
+        outputs, timings, skipped = core.run_dag(steps)
+
+        assert set(outputs) == {"a", "b", "c", "d"}
+        assert skipped == []
+        assert log[0] == "a" and log[-1] == "d"
+        # b and c are independent: they overlap
+        assert abs(timings["b"]["started_ms"] - timings["c"]["started_ms"]) < 80
+
+    def test_failure_stops_dependents(self):
+        steps = {
+            "a": step([], output={"status": "failed", "error": "boom"}),
+            "b": step(["a"])
+        }
+        outputs, _, skipped = core.run_dag(steps)
+        assert outputs["a"]["status"] == "failed"
+        assert skipped == ["b"]
+
+    def test_exception_is_a_failed_step(self):
+        def broken(outputs):
+            raise RuntimeError("boom")
+
+        outputs, _, _ = core.run_dag({"a": {"deps": [], "run": broken}})
+        assert outputs["a"]["status"] == "failed"
+        assert outputs["a"]["error"] == "boom"
+
+    def test_completed_steps_are_not_rerun(self):
+        def unexpected(outputs):
+            raise AssertionError("completed step re-run")
+
+        seen = []
+        outputs, _, _ = core.run_dag(
+            {"a": {"deps": [], "run": unexpected}, "b": step(["a"])},
+            completed={"a": {"status": "success"}},
+            on_step=lambda name, output: seen.append(name)
+        )
+        assert outputs["b"]["status"] == "success"
+        assert seen == ["b"]
+
+
+class TestCtasPayload:
+
+    def test_single_load(self):
+        load = {"load_id": "a", "files_written": ["s3://b/a_1.parquet"], "column_stats": {"id": {}}}
+        payload = core.ctas_payload("orders", {"id": "int", "name": "string"}, "append", [], [], [load])
+
+        assert payload["schema"] == [{"name": "id", "type": "int"}, {"name": "name", "type": "string"}]
+        assert payload["load_id"] == "a"
+        assert payload["files"] == ["s3://b/a_1.parquet"]
+        assert "load_ids" not in payload
+
+    def test_batch(self):
+        loads = [{"load_id": "a", "files_written": ["s3://b/a_1.parquet"]},
+                 {"load_id": "c", "files_written": ["s3://b/c_1.parquet"]}]
+        payload = core.ctas_payload("orders", {"id": "int"}, "append", [], [], loads)
+
+        assert payload["load_ids"] == ["a", "c"]
+        assert payload["files"] == ["s3://b/a_1.parquet", "s3://b/c_1.parquet"]
+        assert "column_stats" not in payload
+
+
+class TestRunBatch:
+
+    @pytest.fixture
+    def commits(self, monkeypatch):
+        def run_pipeline(body, env, store, commit=True):
+            load_id = body["file_s3_path"].rsplit("/", 1)[-1].split(".")[0]
+            return {
+                "status": "success",
+                "steps": {
+                    "schema_normalizer": {"schema_normalized": body.get("schema", {"id": "int"})},
+                    "load": {"load_id": load_id, "files_written": [f"s3://b/{load_id}_1.parquet"]}
+                },
+                "errors": [],
+                "records_loaded": 1,
+                "timings": {"total_ms": 1},
+                "metadata": {"run_id": load_id, "table_name": body["table_name"]}
+            }
+
+        calls = []
+        active = {}
+        lock = threading.Lock()
+
+        def invoke_tool(function_name, payload, retries=0):
+            table = payload["table_name"]
+            with lock:
+                active[table] = active.get(table, 0) + 1
+                calls.append({"payload": payload, "concurrent": active[table]})
+            time.sleep(0.05)
+            with lock:
+                active[table] -= 1
+            return {"status": "success", "table_name": table}
+
+        monkeypatch.setattr(core, "run_pipeline", run_pipeline)
+        monkeypatch.setattr(core, "invoke_tool", invoke_tool)
+        return calls
+
+    def test_one_commit_per_table(self, commits):
+        result = core.run_batch(
+            {"files": ["s3://raw/a.csv", "s3://raw/c.csv", "s3://raw/e.csv"], "table_name": "orders"},
+            "dev", None
+        )
+
+        assert result["status"] == "success"
+        assert len(commits) == 1
+        assert commits[0]["payload"]["load_ids"] == ["a", "c", "e"]
+        assert [f["commit"] for f in result["files"]] == [0, 0, 0]
+
+    def test_groups_of_one_table_commit_sequentially(self, commits):
+        files = [
+            {"file_s3_path": "s3://raw/a.csv", "table_name": "orders"},
+            {"file_s3_path": "s3://raw/c.csv", "table_name": "orders", "mode": "merge", "key_columns": ["id"]},
+            {"file_s3_path": "s3://raw/e.csv", "table_name": "orders", "schema": {"id": "int", "x": "float"}},
+            {"file_s3_path": "s3://raw/g.csv", "table_name": "customers"}
+        ]
+        result = core.run_batch({"files": files}, "dev", None)
+
+        assert len(result["commits"]) == 4
+        assert {c["table_name"] for c in result["commits"]} == {"orders", "customers"}
+        # three groups of "orders" (schema / mode differ), never two at once
+        assert max(c["concurrent"] for c in commits if c["payload"]["table_name"] == "orders") == 1
+
+    def test_failed_commit_fails_its_files(self, commits, monkeypatch):
+        monkeypatch.setattr(
+            core, "invoke_tool", lambda function_name, payload, retries=0: {"status": "failed", "error": "boom"}
+        )
+        result = core.run_batch({"files": ["s3://raw/a.csv"], "table_name": "orders"}, "dev", None)
+
+        assert result["status"] == "failed"
+        assert result["files"][0]["errors"][-1]["iceberg_ctas"]["error"] == "boom"
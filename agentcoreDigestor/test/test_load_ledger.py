@@ -0,0 +1,107 @@
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+TOOLS_SOURCES = Path(__file__).parent.parent.parent / "tools_sources"
+sys.path.insert(0, str(TOOLS_SOURCES))
+
+pytest.importorskip("boto3")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+# clients created at import need a region
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+
+from digestor_common.local import LocalS3, LocalWrangler  # noqa: E402
+
+spec = importlib.util.spec_from_file_location(
+    "load_into_iceberg_main", TOOLS_SOURCES / "load_data_into_iceberg_src" / "main.py"
+)
+load = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(load)
+
+BUCKET = "agentcore-digestor-iceberg-bronze-dev"
+SCHEMA = [{"name": "id", "type": "int"}, {"name": "region", "type": "string"}]
+
+
+@pytest.fixture
+def s3(tmp_path, monkeypatch):
+    local = LocalS3(str(tmp_path / "s3"))
+    monkeypatch.setattr(load, "s3", local)
+    monkeypatch.setattr(load, "wr", LocalWrangler(local))
+    return local
+
+
+def run_load(build_df, etag="etag-1", lease_seconds=60):
+    return load.load_with_ledger(
+        "orders", "s3://raw/sales_orders.csv", etag, SCHEMA, None, build_df,
+        lease_seconds=lease_seconds
+    )
+
+
+def orders():
+    return pd.DataFrame({"id": [1, 2], "region": ["EU", "US"]})
+
+
+def ledger_entry(etag="etag-1"):
+    _, key = load.ledger_entry_key("orders", etag)
+    return load.read_ledger_entry(BUCKET, key)[0]
+
+
+class TestLedger:
+
+    def test_load_once(self, s3):
+        first = run_load(orders)
+        assert first["status"] == "success"
+        assert first["deduplicated"] is False
+        assert all(
+            p.rsplit("/", 1)[-1].startswith(f"{first['load_id']}_") for p in first["files_written"]
+        )
+        assert ledger_entry()["state"] == "committed"
+
+        def unexpected():
+            raise AssertionError("a committed load must not read its source again")
+
+        again = run_load(unexpected)
+        assert again["deduplicated"] is True
+        assert again["files_written"] == first["files_written"]
+
+    def test_claim_in_progress(self, s3):
+        _, key = load.ledger_entry_key("orders", "etag-1")
+        load.write_ledger_entry(BUCKET, key, {"state": "pending", "claimed_at": 0, "lease_until": 2e9})
+
+        result = run_load(orders)
+        assert result["status"] == "failed"
+        assert result["retryable"] is True
+
+    def test_expired_claim_is_taken_over(self, s3):
+        _, key = load.ledger_entry_key("orders", "etag-1")
+        load.write_ledger_entry(BUCKET, key, {"state": "pending", "claimed_at": 0, "lease_until": 1})
+
+        assert run_load(orders)["status"] == "success"
+
+    def test_empty_load_releases_claim(self, s3):
+        result = run_load(lambda: pd.DataFrame())
+        assert result == {"status": "failed", "error": "No rows to load"}
+
+        # released, not deleted: a retry takes it over
+        assert ledger_entry()["state"] == "failed"
+        assert run_load(orders)["status"] == "success"
+
+    def test_failed_load_releases_claim(self, s3):
+        def broken():
+            raise ValueError("unreadable source")
+
+        with pytest.raises(ValueError):
+            run_load(broken)
+        assert ledger_entry()["state"] == "failed"
+        assert run_load(orders)["status"] == "success"
+
+    def test_different_content_is_a_new_load(self, s3):
+        first = run_load(orders, etag="etag-1")
+        second = run_load(orders, etag="etag-2")
+        assert second["deduplicated"] is False
+        assert second["load_id"] != first["load_id"]
@@ -0,0 +1,74 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# digestor_common lives with the tool handlers
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "tools_sources"))
+
+from digestor_common.metrics import MemorySink, current_metrics, instrumented, set_sink
+
+
+@pytest.fixture
+def sink():
+    memory = MemorySink()
+    previous = set_sink(memory)
+    yield memory
+    set_sink(previous)
+
+
+@instrumented("sample_step")
+def sample_handler(event, context):
+    """Sample handler."""
+    metrics = current_metrics()
+    with metrics.phase("download"):
+        raw = b"a,b\n1,2\n3,4\n"
+    metrics.bytes_in += len(raw)
+
+    with metrics.phase("parse"):
+        rows = raw.decode("utf-8").strip().split("\n")[1:]
+    metrics.rows = len(rows)
+
+    with metrics.phase("write"):
+        metrics.bytes_out += 7
+
+    return {"status": event.get("status", "success")}
+
+
+class TestInstrumented:
+
+    def test_emf_record(self, sink):
+        result = sample_handler({}, None)
+
+        assert len(sink.records) == 1
+        record = sink.records[0]
+
+        assert record["Step"] == "sample_step"
+        assert record["Status"] == "success"
+        assert record["Rows"] == 2
+        assert record["BytesIn"] == 12
+        assert record["BytesOut"] == 7
+        for phase in ("download", "parse", "write"):
+            assert f"Phase_{phase}_Ms" in record
+
+        definition = record["_aws"]["CloudWatchMetrics"][0]
+        names = {m["Name"] for m in definition["Metrics"]}
+        assert {"DurationMs", "Rows", "BytesIn", "BytesOut", "RssGrowthMb", "Phase_parse_Ms"} <= names
+        assert definition["Dimensions"] == [["Step"], ["Step", "Status"]]
+
+        # the same figures are attached to the response
+        assert result["metrics"]["rows"] == 2
+        assert set(result["metrics"]["phases"]) == {"download", "parse", "write"}
+        # process high-water mark and its growth during this invocation
+        assert result["metrics"]["rss_growth_mb"] >= 0
+        assert result["metrics"]["peak_rss_mb"] >= result["metrics"]["rss_growth_mb"]
+
+    def test_status_dimension(self, sink):
+        sample_handler({"status": "failed"}, None)
+        assert sink.records[0]["Status"] == "failed"
+
+    def test_wraps_handler(self):
+        assert sample_handler.__name__ == "sample_handler"
+        assert sample_handler.__doc__ == "Sample handler."
+        # undecorated handler: no metrics block
+        assert sample_handler.__wrapped__({}, None) == {"status": "success"}
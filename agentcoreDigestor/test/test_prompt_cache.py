@@ -0,0 +1,85 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+strands = pytest.importorskip("strands")
+
+from strands import Agent, tool
+
+from model import load, stub
+from model.usage import usage_since, usage_snapshot
+
+# Static prefix above the stub's minimum cacheable size (STUB_CACHE_MIN_TOKENS)
+SYSTEM_PROMPT = "You are the AgentCore Digestor Agent. Always use the tools.\n" * 120
+
+
+@tool
+def echo(text: str) -> str:
+    """Returns the text unchanged."""
+    return text
+
+
+@pytest.fixture
+def stub_model(monkeypatch):
+    """
+    Builds the model through load.build_model() with MODEL_PROVIDER=stub and
+    an empty prompt cache.
+    """
+    monkeypatch.setattr(load, "MODEL_PROVIDER", "stub")
+    monkeypatch.setattr(stub, "_cache", {})
+
+    def build(prompt_cache="default"):
+        monkeypatch.setattr(load, "PROMPT_CACHE", prompt_cache)
+        return load.build_model()
+
+    return build
+
+
+def run_turn(agent, message):
+    before = usage_snapshot(agent)
+    agent(message)
+    return usage_since(agent, before)
+
+
+class TestPromptCache:
+
+    def test_cache_write_then_read(self, stub_model):
+        model = stub_model()
+        assert isinstance(model, stub.StubModel)
+        assert model.get_config()["cache_prompt"] == "default"
+        assert model.get_config()["cache_tools"] == "default"
+
+        agent = Agent(model=model, system_prompt=SYSTEM_PROMPT, tools=[echo])
+
+        first = run_turn(agent, "ingest s3://bucket/sales_orders.json")
+        assert first["cache_write_tokens"] > 0
+        assert first["cache_read_tokens"] == 0
+
+        second = run_turn(agent, "and now validate it")
+        assert second["cache_read_tokens"] > 0
+        assert second["cache_write_tokens"] == 0
+        assert second["cache_hit_ratio"] > 0
+
+    def test_cache_shared_across_agents(self, stub_model):
+        model = stub_model()
+
+        run_turn(Agent(model=model, system_prompt=SYSTEM_PROMPT, tools=[echo]), "first session")
+        other = run_turn(Agent(model=model, system_prompt=SYSTEM_PROMPT, tools=[echo]), "second session")
+
+        assert other["cache_read_tokens"] > 0
+
+    def test_cache_disabled(self, stub_model):
+        model = stub_model("none")
+        assert "cache_prompt" not in model.get_config()
+
+        agent = Agent(model=model, system_prompt=SYSTEM_PROMPT, tools=[echo])
+
+        for message in ("first turn", "second turn"):
+            usage = run_turn(agent, message)
+            assert usage["cache_write_tokens"] == 0
+            assert usage["cache_read_tokens"] == 0
+            assert usage["input_tokens"] > 0
@@ -0,0 +1,3 @@
+"""
+Pipeline benchmarks on synthetic data (see benchmarks/run.py).
+"""
@@ -0,0 +1,201 @@
+"""
+Cold-start report: import time of every entrypoint, measured in a fresh
+interpreter with -X importtime, against a budget per entrypoint.
+
+For each entrypoint (the agent's main.py and each tool handler's main.py)
+the report has:
+
+- import_ms        wall time to import the entrypoint module
+- top_packages     self import time summed per top-level package
+                   (pandas, strands, botocore, ...), largest first
+- budget_ms / over_budget
+
+    python -m benchmarks.coldstart
+    python -m benchmarks.coldstart --entrypoints detect_file_type,agent --repeat 5
+    python -m benchmarks.coldstart --budgets budgets.json --output coldstart.json
+
+The run exits with status 1 when an entrypoint exceeds its budget (the
+median over --repeat runs), so it can gate a build. Entrypoints whose
+dependencies are not installed are reported with their import error.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOOLS_SOURCES = os.path.join(REPO_ROOT, "tools_sources")
+AGENT_SRC = os.path.join(REPO_ROOT, "agentcoreDigestor", "src")
+
+# entrypoint → (file, cartelle da mettere in sys.path)
+ENTRYPOINTS = {
+    "agent": (os.path.join(AGENT_SRC, "main.py"), [AGENT_SRC]),
+    **{
+        name: (os.path.join(TOOLS_SOURCES, name, "main.py"), [TOOLS_SOURCES, os.path.join(TOOLS_SOURCES, name)])
+        for name in [
+            "detect_file_type",
+            "convert_semi_tabular",
+            "analyze_schema",
+            "validate_data",
+            "schema_normalizer",
+            "load_data_into_iceberg_src",
+            "fused_ingest_src",
+            "iceberg_ctas_src",
+            "iceberg_maintenance_src",
+            "lambda_core_src",
+            "event_ingest_src"
+        ]
+    }
+}
+
+# Budget (ms) dell'import a freddo: handler Zip leggeri, handler con
+# pandas/awswrangler, agent (strands + bedrock_agentcore)
+DEFAULT_BUDGETS_MS = {
+    "agent": 2500,
+    "detect_file_type": 600,
+    "convert_semi_tabular": 600,
+    "analyze_schema": 1500,
+    "validate_data": 1500,
+    "schema_normalizer": 1500,
+    "load_data_into_iceberg_src": 600,
+    "fused_ingest_src": 2500,
+    "iceberg_ctas_src": 600,
+    "iceberg_maintenance_src": 600,
+    "lambda_core_src": 600,
+    "event_ingest_src": 600
+}
+
+# Eseguito nel processo misurato: importa l'entrypoint come modulo "main"
+# e stampa il tempo su stdout (stderr è l'output di -X importtime)
+BOOTSTRAP = """
+import importlib.util, json, sys, time
+path, extra = sys.argv[1], json.loads(sys.argv[2])
+sys.path[:0] = extra
+start = time.perf_counter()
+try:
+    spec = importlib.util.spec_from_file_location("main", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["main"] = module
+    spec.loader.exec_module(module)
+    error = None
+except BaseException as e:
+    error = f"{type(e).__name__}: {e}"
+print(json.dumps({"import_ms": round((time.perf_counter() - start) * 1000, 1), "error": error}))
+"""
+
+
+# ------------------------------------------------------------
+# -X importtime parsing
+# ------------------------------------------------------------
+def parse_importtime(stderr):
+    """
+    [(module, self_us, cumulative_us)] from -X importtime output.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        fields = line.split(":", 1)[1].split("|")
+        if len(fields) != 3:
+            continue
+        try:
+            entries.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+        except ValueError:
+            continue
+    return entries
+
+
+def top_packages(entries, limit):
+    totals = {}
+    for module, self_us, _ in entries:
+        package = module.split(".")[0]
+        totals[package] = totals.get(package, 0) + self_us
+    ranked = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+    return [{"package": package, "self_ms": round(us / 1000, 1)} for package, us in ranked]
+
+
+def measure(name, limit):
+    path, extra = ENTRYPOINTS[name]
+    env = {**os.environ, "AWS_DEFAULT_REGION": os.environ.get("AWS_DEFAULT_REGION", "eu-central-1"),
+           "AGENT_WARM_ON_START": "false"}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", BOOTSTRAP, path, json.dumps(extra)],
+        capture_output=True, text=True, env=env, cwd=REPO_ROOT
+    )
+    try:
+        outcome = json.loads(proc.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        outcome = {"import_ms": None, "error": proc.stderr.strip().splitlines()[-1:] or "no output"}
+
+    entries = parse_importtime(proc.stderr)
+    return {
+        "import_ms": outcome["import_ms"],
+        "error": outcome["error"],
+        "modules": len(entries),
+        "top_packages": top_packages(entries, limit)
+    }
+
+
+# ------------------------------------------------------------
+# Report
+# ------------------------------------------------------------
+def report(names, budgets, repeat, limit):
+    results = []
+    for name in names:
+        runs = [measure(name, limit) for _ in range(repeat)]
+        times = [r["import_ms"] for r in runs if r["import_ms"] is not None and not r["error"]]
+        median = round(statistics.median(times), 1) if times else None
+        budget = budgets.get(name)
+        results.append({
+            "entrypoint": name,
+            "import_ms": median,
+            "runs_ms": [r["import_ms"] for r in runs],
+            "budget_ms": budget,
+            "over_budget": bool(median is not None and budget is not None and median > budget),
+            "error": runs[-1]["error"],
+            "modules": runs[-1]["modules"],
+            "top_packages": runs[-1]["top_packages"]
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entrypoint import-time / cold-start report")
+    parser.add_argument("--entrypoints", default=",".join(ENTRYPOINTS),
+                        help="comma separated, from: " + ", ".join(ENTRYPOINTS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="packages listed per entrypoint")
+    parser.add_argument("--budgets", help="JSON {entrypoint: ms} overriding the default budgets")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    names = [n for n in args.entrypoints.split(",") if n]
+    unknown = [n for n in names if n not in ENTRYPOINTS]
+    if unknown:
+        parser.error(f"unknown entrypoints: {unknown}")
+
+    budgets = dict(DEFAULT_BUDGETS_MS)
+    if args.budgets:
+        with open(args.budgets) as f:
+            budgets.update(json.load(f))
+
+    results = report(names, budgets, args.repeat, args.top)
+    for r in results:
+        status = "ERROR" if r["error"] else ("OVER" if r["over_budget"] else "ok")
+        print(f"{r['entrypoint']:<28} {str(r['import_ms']):>8} ms  budget {r['budget_ms']} ms  {status}",
+              file=sys.stderr)
+
+    output = json.dumps({"python": sys.version.split()[0], "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    return 1 if any(r["over_budget"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Synthetic datasets modeled on the demo files in documents/:
+
+- sample.csv            id, name, amount
+- sample_dirty_*.csv    missing values, non numeric amounts, outliers (9999),
+                        quoted zero-padded ids, unexpected columns
+- sales_orders_txtdemo  same content as a .txt
+- sales_orders_demo     the same table as .xlsx
+
+Every generator is deterministic for a given seed.
+"""
+import io
+import json
+import random
+import datetime
+
+import pandas as pd
+
+NAMES = ["Alice", "Bob", "Charlie", "Dave", "Eve", "Frank", "Grace", "Heidi", "Ivan", "Judy"]
+
+# Colonne di base (come i sample), poi colonne extra a rotazione di tipo
+BASE_COLUMNS = [("id", "int"), ("name", "string"), ("amount", "float"), ("date", "datetime")]
+EXTRA_TYPES = ["int", "float", "string", "datetime"]
+
+# Valori "sporchi" per tipo (come in sample_dirty_1 / txtdemo)
+DIRTY_VALUES = {
+    "int": ["", "n/a", "9999"],
+    "float": ["", "not_a_number", "9999"],
+    "string": [""],
+    "datetime": ["", "not_a_date"]
+}
+
+
+def column_spec(columns, datetime_density):
+    """
+    [(name, type)] for `columns` columns: the sample columns first, then
+    extra ones. datetime_density is the fraction of extra columns that are
+    datetimes (the rest cycle through int/float/string).
+    """
+    spec = BASE_COLUMNS[:columns]
+    extra = columns - len(spec)
+    n_datetime = round(extra * datetime_density)
+    others = [t for t in EXTRA_TYPES if t != "datetime"]
+    for i in range(extra):
+        dtype = "datetime" if i < n_datetime else others[i % len(others)]
+        spec.append((f"col_{i + 1}_{dtype}", dtype))
+    return spec
+
+
+def clean_value(rng, dtype, row):
+    if dtype == "int":
+        return row + 1 if rng.random() < 0.5 else rng.randint(0, 1_000_000)
+    if dtype == "float":
+        return round(rng.uniform(0, 1000), 2)
+    if dtype == "datetime":
+        day = datetime.date(2024, 1, 1) + datetime.timedelta(days=rng.randint(0, 730))
+        return day.isoformat()
+    return rng.choice(NAMES)
+
+
+def generate_rows(rows, columns=4, dirtiness=0.0, datetime_density=0.25, nesting=0, seed=42):
+    """
+    List of dict rows.
+
+    dirtiness: probability that a cell is replaced by a dirty value; the id
+    column of a dirty dataset also gets quoted zero-padded ids ("001").
+    nesting: depth of nested objects added under "attributes" (JSON only;
+    0 = flat).
+    """
+    rng = random.Random(seed)
+    spec = column_spec(columns, datetime_density)
+
+    data = []
+    for row in range(rows):
+        record = {}
+        for name, dtype in spec:
+            if name == "id":
+                value = row + 1
+                if dirtiness and rng.random() < dirtiness:
+                    value = f"{row + 1:03d}"
+            else:
+                value = clean_value(rng, dtype, row)
+                if dirtiness and rng.random() < dirtiness:
+                    value = rng.choice(DIRTY_VALUES[dtype])
+            record[name] = value
+
+        if nesting:
+            nested = {"level": nesting, "tag": rng.choice(NAMES)}
+            for level in range(nesting - 1, 0, -1):
+                nested = {"level": level, "tag": rng.choice(NAMES), "child": nested}
+            record["attributes"] = nested
+
+        data.append(record)
+    return data
+
+
+# ------------------------------------------------------------
+# Writers
+# ------------------------------------------------------------
+def to_csv_bytes(data):
+    flat = [{k: v for k, v in r.items() if k != "attributes"} for r in data]
+    buf = io.StringIO()
+    pd.DataFrame(flat).to_csv(buf, index=False)
+    return buf.getvalue().encode("utf-8")
+
+
+def to_xlsx_bytes(data):
+    flat = [{k: v for k, v in r.items() if k != "attributes"} for r in data]
+    buf = io.BytesIO()
+    pd.DataFrame(flat).to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+def to_json_array_bytes(data):
+    return json.dumps(data).encode("utf-8")
+
+
+WRITERS = {
+    "csv": to_csv_bytes,
+    "txt": to_csv_bytes,      # come sales_orders_txtdemo.txt
+    "xlsx": to_xlsx_bytes,
+    "json": to_json_array_bytes
+}
+
+
+def generate_file(file_format, rows, columns=4, dirtiness=0.0, datetime_density=0.25, nesting=0, seed=42):
+    """
+    Bytes of a synthetic file in the given format ("csv", "txt", "xlsx", "json").
+    """
+    data = generate_rows(rows, columns, dirtiness, datetime_density, nesting if file_format == "json" else 0, seed)
+    return WRITERS[file_format](data)
@@ -0,0 +1,294 @@
+"""
+Pipeline benchmark: runs the tool handlers (detect, convert, analyze,
+validate, normalize, load) on synthetic datasets with the local backend
+(digestor_common.local) and measures, per handler call:
+
+- wall_ms / cpu_ms and rows_per_sec
+- peak_rss_mb (process high-water mark) and rss_delta_mb (over the
+  baseline measured after the handler module is imported)
+- bytes_read / bytes_written on the S3 stand-in
+
+Each call runs in a fresh worker process, so memory figures are not
+polluted by the previous steps.
+
+    python -m benchmarks.run --rows 1000,100000 --columns 4,20 \\
+        --dirtiness 0,0.1 --formats csv,xlsx,json --output bench.json
+
+    python -m benchmarks.run ... --baseline previous.json --max-regression 0.2
+
+With --baseline the run exits with status 1 when the rows/sec of any
+(scenario, step) drops by more than --max-regression.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from benchmarks.generators import generate_file
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "tools_sources"))
+
+from digestor_common.local import LocalLambdaClient, LocalS3  # noqa: E402
+
+ENV = "dev"
+UPLOAD_BUCKET = f"agentcore-digestor-upload-raw-{ENV}"
+
+# formato del file → file_type atteso da convert_semi_tabular
+CONVERT_TYPES = {"csv": "csv", "txt": "txt", "xlsx": "excel", "json": "json_array"}
+
+STEPS = ["detect", "convert", "analyze", "validate", "normalize", "load"]
+
+# validate / normalize / load lavorano solo su CSV
+CSV_ONLY_STEPS = {"validate", "normalize", "load"}
+
+
+# ------------------------------------------------------------
+# Measurement (runs in the worker process)
+# ------------------------------------------------------------
+class CountingS3(LocalS3):
+    """
+    LocalS3 that counts the bytes returned by get_object and stored by
+    put_object.
+    """
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def get_object(self, *args, **kwargs):
+        obj = super().get_object(*args, **kwargs)
+        self.bytes_read += obj["ContentLength"]
+        return obj
+
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        elif hasattr(Body, "read"):
+            Body = Body.read()
+        self.bytes_written += len(Body)
+        return super().put_object(Bucket=Bucket, Key=Key, Body=Body, **kwargs)
+
+
+def rss_mb():
+    # ru_maxrss: KB su Linux, byte su macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(root, component, payload):
+    client = LocalLambdaClient(root)
+    client.s3 = CountingS3(os.path.join(client.root, "s3"))
+    client.catalog.s3 = client.s3
+
+    handler = client.handler_for(component)   # import fuori dalla misura
+    baseline = rss_mb()
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    result = handler(payload, None)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    peak = rss_mb()
+    return result, {
+        "wall_ms": round(wall * 1000, 2),
+        "cpu_ms": round(cpu * 1000, 2),
+        "peak_rss_mb": round(peak, 1),
+        "rss_delta_mb": round(peak - baseline, 1),
+        "bytes_read": client.s3.bytes_read,
+        "bytes_written": client.s3.bytes_written
+    }
+
+
+def measure_isolated(root, component, payload):
+    with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+        return pool.apply(measure, (root, component, payload))
+
+
+# ------------------------------------------------------------
+# Scenario: one synthetic file through the whole chain
+# ------------------------------------------------------------
+def run_scenario(root, file_format, rows, columns, dirtiness, datetime_density, nesting, seed):
+    scenario = {
+        "format": file_format,
+        "rows": rows,
+        "columns": columns,
+        "dirtiness": dirtiness,
+        "datetime_density": datetime_density,
+        "nesting": nesting
+    }
+
+    data = generate_file(file_format, rows, columns, dirtiness, datetime_density, nesting, seed)
+    key = f"bench_synthetic_{uuid.uuid4().hex[:8]}.{file_format}"
+    LocalS3(os.path.join(root, "s3")).put_object(Bucket=UPLOAD_BUCKET, Key=key, Body=data)
+    source = f"s3://{UPLOAD_BUCKET}/{key}"
+
+    results = []
+    outputs = {}
+
+    def record(step, component, payload):
+        output, metrics = measure_isolated(root, component, payload)
+        outputs[step] = output
+        wall_s = metrics["wall_ms"] / 1000
+        results.append({
+            **scenario,
+            "step": step,
+            "status": output.get("status"),
+            "error": output.get("error"),
+            "input_bytes": len(data),
+            "rows_per_sec": round(rows / wall_s, 1) if wall_s else None,
+            **metrics
+        })
+        return output
+
+    def skip(step, reason):
+        results.append({**scenario, "step": step, "status": "skipped", "error": reason})
+
+    record("detect", "detect-file-type", {"file_s3_path": source})
+
+    converted = record("convert", "convert-semi-tabular", {
+        "file_s3_path": source,
+        "file_type": CONVERT_TYPES[file_format]
+    })
+    converted_path = converted.get("converted_path", source)
+    analyze_format = converted.get("converted_format", "csv")
+
+    analyzed = record("analyze", "analyze-schema", {
+        "file_s3_path": converted_path,
+        "file_format": analyze_format
+    })
+
+    if analyze_format != "csv":
+        for step in STEPS[3:]:
+            skip(step, f"{step} supports CSV only")
+        return results
+
+    record("validate", "validate-data", {
+        "file_s3_path": converted_path,
+        "schema": analyzed.get("schema") or []
+    })
+
+    normalized = record("normalize", "schema-normalizer", {"file_s3_path": converted_path})
+    if normalized.get("status") != "success":
+        skip("load", "normalization failed")
+        return results
+
+    record("load", "load-into-iceberg", {
+        "file_s3_path": normalized["normalized_path"],
+        "table_name": f"bench_{uuid.uuid4().hex[:8]}",
+        "schema": [{"name": n, "type": t} for n, t in normalized["schema_normalized"].items()],
+        "column_stats": normalized.get("column_stats")
+    })
+
+    return results
+
+
+# ------------------------------------------------------------
+# Regression check
+# ------------------------------------------------------------
+def scenario_key(r):
+    return (r["format"], r["rows"], r["columns"], r["dirtiness"], r["datetime_density"], r["nesting"], r["step"])
+
+
+def regressions(current, baseline, max_regression):
+    previous = {scenario_key(r): r for r in baseline["results"] if r.get("rows_per_sec")}
+    found = []
+    for r in current["results"]:
+        old = previous.get(scenario_key(r))
+        if not old or not r.get("rows_per_sec"):
+            continue
+        change = r["rows_per_sec"] / old["rows_per_sec"] - 1
+        if change < -max_regression:
+            found.append({
+                "scenario": dict(zip(
+                    ["format", "rows", "columns", "dirtiness", "datetime_density", "nesting", "step"],
+                    scenario_key(r)
+                )),
+                "rows_per_sec": r["rows_per_sec"],
+                "baseline_rows_per_sec": old["rows_per_sec"],
+                "change": round(change, 3)
+            })
+    return found
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    }
+
+
+def parse_list(cast):
+    return lambda value: [cast(v) for v in value.split(",") if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Digestor pipeline benchmark")
+    parser.add_argument("--formats", type=parse_list(str), default=["csv", "txt", "xlsx", "json"])
+    parser.add_argument("--rows", type=parse_list(int), default=[1000, 50000])
+    parser.add_argument("--columns", type=parse_list(int), default=[4, 20])
+    parser.add_argument("--dirtiness", type=parse_list(float), default=[0.0, 0.05])
+    parser.add_argument("--datetime-density", type=parse_list(float), default=[0.25])
+    parser.add_argument("--nesting", type=parse_list(int), default=[0, 3])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--root", help="local backend root (default: a temporary directory)")
+    parser.add_argument("--output", help="write the JSON results here (default: stdout)")
+    parser.add_argument("--baseline", help="previous results to compare rows/sec against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    root = args.root or tempfile.mkdtemp(prefix="digestor-bench-")
+    results = []
+    try:
+        for file_format, rows, columns, dirtiness, density, nesting in itertools.product(
+            args.formats, args.rows, args.columns, args.dirtiness, args.datetime_density, args.nesting
+        ):
+            if nesting and file_format != "json":
+                continue   # l'annidamento esiste solo nel JSON
+            results += run_scenario(root, file_format, rows, columns, dirtiness, density, nesting, args.seed)
+            print(f"done {file_format} rows={rows} columns={columns} dirtiness={dirtiness} nesting={nesting}",
+                  file=sys.stderr)
+    finally:
+        if not args.root:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report = {"environment": environment(), "results": results}
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = regressions(report, json.load(f), args.max_regression)
+        exit_code = 1 if report["regressions"] else 0
+
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
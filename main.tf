@@ -57,3 +57,21 @@ module "agentcore_lambda_functions" {
 }
 
 
+
+module "agentcore_scheduled_jobs" {
+  source = "./modules/scheduled_jobs"
+  env    = var.env
+
+  lambda_arns = module.agentcore_lambda_functions.lambda_arns
+  jobs        = var.scheduled_jobs
+}
+
+module "agentcore_event_ingestion" {
+  source = "./modules/event_ingestion"
+  env    = var.env
+
+  lambda_arns = module.agentcore_lambda_functions.lambda_arns
+  sources     = var.event_ingestion
+
+  depends_on = [module.agentcore_s3_buckets]
+}
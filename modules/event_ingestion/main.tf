@@ -0,0 +1,83 @@
+#################################
+# S3 → SQS → Lambda (micro-batch ingestion)
+#################################
+resource "aws_sqs_queue" "dlq" {
+  for_each = var.sources
+
+  name                      = "agentcore-digestor-sqs-${replace(each.key, "_", "-")}-dlq-${var.env}"
+  message_retention_seconds = 1209600
+
+  tags = {
+    Project     = "agentcore"
+    Module      = "digestor"
+    Environment = var.env
+  }
+}
+
+resource "aws_sqs_queue" "queue" {
+  for_each = var.sources
+
+  name = "agentcore-digestor-sqs-${replace(each.key, "_", "-")}-${var.env}"
+
+  # Deve superare il timeout della lambda consumer
+  visibility_timeout_seconds = each.value.visibility_timeout_seconds
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.dlq[each.key].arn
+    maxReceiveCount     = each.value.max_receive_count
+  })
+
+  tags = {
+    Project     = "agentcore"
+    Module      = "digestor"
+    Environment = var.env
+  }
+}
+
+resource "aws_sqs_queue_policy" "queue" {
+  for_each = var.sources
+
+  queue_url = aws_sqs_queue.queue[each.key].id
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect    = "Allow"
+        Principal = { Service = "s3.amazonaws.com" }
+        Action    = "sqs:SendMessage"
+        Resource  = aws_sqs_queue.queue[each.key].arn
+        Condition = {
+          ArnEquals = { "aws:SourceArn" = "arn:aws:s3:::${each.value.bucket}" }
+        }
+      }
+    ]
+  })
+}
+
+resource "aws_s3_bucket_notification" "notification" {
+  for_each = var.sources
+
+  bucket = each.value.bucket
+
+  queue {
+    queue_arn     = aws_sqs_queue.queue[each.key].arn
+    events        = ["s3:ObjectCreated:*"]
+    filter_prefix = each.value.filter_prefix
+    filter_suffix = each.value.filter_suffix
+  }
+
+  depends_on = [aws_sqs_queue_policy.queue]
+}
+
+resource "aws_lambda_event_source_mapping" "consumer" {
+  for_each = var.sources
+
+  event_source_arn = aws_sqs_queue.queue[each.key].arn
+  function_name    = var.lambda_arns[each.value.lambda_key]
+
+  # Buffer della micro-batch: numero di eventi / finestra temporale
+  batch_size                         = each.value.batch_size
+  maximum_batching_window_in_seconds = each.value.batching_window_seconds
+
+  function_response_types = ["ReportBatchItemFailures"]
+}
@@ -0,0 +1,9 @@
+output "queue_arns" {
+  description = "ARNs of the ingestion queues"
+  value       = { for k, q in aws_sqs_queue.queue : k => q.arn }
+}
+
+output "dlq_arns" {
+  description = "ARNs of the dead-letter queues"
+  value       = { for k, q in aws_sqs_queue.dlq : k => q.arn }
+}
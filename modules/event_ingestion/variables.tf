@@ -0,0 +1,23 @@
+variable "env" {
+  type = string
+}
+
+variable "lambda_arns" {
+  description = "ARNs of the lambdas that can consume the queues (by lambda key)"
+  type        = map(string)
+}
+
+variable "sources" {
+  description = "S3 buckets whose object-created events are ingested in micro-batches"
+
+  type = map(object({
+    bucket                     = string
+    lambda_key                 = string
+    filter_prefix              = optional(string)
+    filter_suffix              = optional(string)
+    batch_size                 = optional(number, 100)   # max eventi per invocazione
+    batching_window_seconds    = optional(number, 60)    # max attesa per riempire la batch
+    visibility_timeout_seconds = optional(number, 960)
+    max_receive_count          = optional(number, 5)
+  }))
+}
@@ -4,6 +4,7 @@ resource "aws_lambda_function" "lambda" {
   function_name = each.value.function_name
   role          = each.value.role_arn
   timeout       = each.value.timeout
+  memory_size   = each.value.memory_size
   package_type  = each.value.package_type
 
   tags = merge(
@@ -8,6 +8,7 @@ variable "lambdas" {
   type = map(object({
     function_name = string
     timeout       = number
+    memory_size   = optional(number, 128)
     env_vars      = map(string)
     tags          = map(string)
     role_arn      = string
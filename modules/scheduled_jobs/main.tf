@@ -0,0 +1,30 @@
+resource "aws_cloudwatch_event_rule" "job" {
+  for_each = var.jobs
+
+  name                = "agentcore-digestor-schedule-${replace(each.key, "_", "-")}-${var.env}"
+  schedule_expression = each.value.schedule_expression
+
+  tags = {
+    Project     = "agentcore"
+    Module      = "digestor"
+    Environment = var.env
+  }
+}
+
+resource "aws_cloudwatch_event_target" "job" {
+  for_each = var.jobs
+
+  rule  = aws_cloudwatch_event_rule.job[each.key].name
+  arn   = var.lambda_arns[each.value.lambda_key]
+  input = each.value.input
+}
+
+resource "aws_lambda_permission" "job" {
+  for_each = var.jobs
+
+  statement_id  = "AllowEventBridge-${each.key}"
+  action        = "lambda:InvokeFunction"
+  function_name = var.lambda_arns[each.value.lambda_key]
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.job[each.key].arn
+}
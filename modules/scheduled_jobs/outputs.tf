@@ -0,0 +1,4 @@
+output "rule_arns" {
+  description = "ARNs of the EventBridge schedule rules"
+  value       = { for k, r in aws_cloudwatch_event_rule.job : k => r.arn }
+}
@@ -0,0 +1,18 @@
+variable "env" {
+  type = string
+}
+
+variable "lambda_arns" {
+  description = "ARNs of the lambdas that can be scheduled (by lambda key)"
+  type        = map(string)
+}
+
+variable "jobs" {
+  description = "Map of scheduled lambda invocations"
+
+  type = map(object({
+    lambda_key          = string
+    schedule_expression = string          # cron(...) or rate(...)
+    input               = string          # JSON event passed to the lambda
+  }))
+}
@@ -1,9 +1,11 @@
-import boto3
 import pandas as pd
 import json
 import io
 
-s3 = boto3.client("s3")
+from digestor_common.aws import client
+from digestor_common.metrics import instrumented, current_metrics
+
+s3 = client("s3")
 
 SUPPORTED_FORMATS = {"csv", "tsv", "txt", "ndjson"}
 
@@ -18,30 +20,16 @@ def infer_dtype(series: pd.Series):
     return "string"
 
 
-def handler(event, context):
-    try:
-        file_s3_path = event["file_s3_path"]
-        file_format = event["file_format"]
-        max_rows = event.get("max_rows", 50)
-
-        if file_format not in SUPPORTED_FORMATS:
-            return {
-                "status": "failed",
-                "error": f"Unsupported format for schema analysis: {file_format}"
-            }
+# --------------------------------------------------
+# Analysis on already-downloaded bytes (also used by fused_ingest)
+# --------------------------------------------------
+def analyze_bytes(raw_bytes: bytes, file_format: str, max_rows: int = 50):
+    metrics = current_metrics()
 
-        # --------------------------------------------------
-        # Load file from S3
-        # --------------------------------------------------
-        bucket = file_s3_path.replace("s3://", "").split("/")[0]
-        key = "/".join(file_s3_path.replace("s3://", "").split("/")[1:])
-
-        obj = s3.get_object(Bucket=bucket, Key=key)
-        raw_bytes = obj["Body"].read()
-
-        # --------------------------------------------------
-        # Parse into DataFrame
-        # --------------------------------------------------
+    # --------------------------------------------------
+    # Parse into DataFrame
+    # --------------------------------------------------
+    with metrics.phase("parse"):
         if file_format == "ndjson":
             lines = raw_bytes.decode("utf-8").splitlines()
             records = [json.loads(l) for l in lines[:max_rows]]
@@ -53,9 +41,10 @@ def handler(event, context):
                 nrows=max_rows
             )
 
-        # --------------------------------------------------
-        # Infer schema
-        # --------------------------------------------------
+    # --------------------------------------------------
+    # Infer schema
+    # --------------------------------------------------
+    with metrics.phase("infer"):
         schema = []
         for col in df.columns:
             dtype = infer_dtype(df[col])
@@ -63,13 +52,42 @@ def handler(event, context):
                 "name": col,
                 "type": dtype
             })
+    metrics.rows = len(df)
 
-        return {
-            "status": "success",
-            "rows_analyzed": len(df),
-            "columns": len(schema),
-            "schema": schema
-        }
+    return {
+        "status": "success",
+        "rows_analyzed": len(df),
+        "columns": len(schema),
+        "schema": schema
+    }
+
+
+@instrumented("analyze_schema")
+def handler(event, context):
+    metrics = current_metrics()
+    try:
+        file_s3_path = event["file_s3_path"]
+        file_format = event["file_format"]
+        max_rows = event.get("max_rows", 50)
+
+        if file_format not in SUPPORTED_FORMATS:
+            return {
+                "status": "failed",
+                "error": f"Unsupported format for schema analysis: {file_format}"
+            }
+
+        # --------------------------------------------------
+        # Load file from S3
+        # --------------------------------------------------
+        bucket = file_s3_path.replace("s3://", "").split("/")[0]
+        key = "/".join(file_s3_path.replace("s3://", "").split("/")[1:])
+
+        with metrics.phase("download"):
+            obj = s3.get_object(Bucket=bucket, Key=key)
+            raw_bytes = obj["Body"].read()
+        metrics.bytes_in += len(raw_bytes)
+
+        return analyze_bytes(raw_bytes, file_format, max_rows)
 
     except Exception as e:
         return {
@@ -1,10 +1,15 @@
-import boto3
 import json
-import pandas as pd
 import io
 import csv
 
-s3 = boto3.client("s3")
+from digestor_common.aws import client
+from digestor_common.lazy import lazy_import
+from digestor_common.metrics import instrumented, current_metrics
+
+s3 = client("s3")
+
+# Non serve per i passthrough CSV/TSV/NDJSON e per JSON → NDJSON
+pd = lazy_import("pandas")
 
 CONVERTED_BUCKET = "agentcore-digestor-upload-raw-dev"
 CONVERTED_PREFIX = "converted"
@@ -17,14 +22,18 @@ def parse_s3_path(path: str):
     return bucket, key
 
 
+@instrumented("convert_semi_tabular")
 def handler(event, context):
+    metrics = current_metrics()
     try:
         file_s3_path = event["file_s3_path"]
         file_type = event["file_type"]
         sheet = event.get("sheet", 0)
 
         src_bucket, src_key = parse_s3_path(file_s3_path)
-        raw_bytes = s3.get_object(Bucket=src_bucket, Key=src_key)["Body"].read()
+        with metrics.phase("download"):
+            raw_bytes = s3.get_object(Bucket=src_bucket, Key=src_key)["Body"].read()
+        metrics.bytes_in += len(raw_bytes)
 
         filename = src_key.split("/")[-1]
         base = filename.rsplit(".", 1)[0]
@@ -44,16 +53,20 @@ def handler(event, context):
         # JSON ARRAY → NDJSON
         # --------------------------------------------------
         if file_type == "json_array":
-            arr = json.loads(raw_bytes.decode("utf-8"))
+            with metrics.phase("parse"):
+                arr = json.loads(raw_bytes.decode("utf-8"))
 
-            if not isinstance(arr, list):
-                raise ValueError("JSON is not an array")
+                if not isinstance(arr, list):
+                    raise ValueError("JSON is not an array")
 
-            lines = [json.dumps(obj) for obj in arr if isinstance(obj, dict)]
-            ndjson_bytes = "\n".join(lines).encode("utf-8")
+                lines = [json.dumps(obj) for obj in arr if isinstance(obj, dict)]
+                ndjson_bytes = "\n".join(lines).encode("utf-8")
+            metrics.rows = len(lines)
 
             out_key = f"{CONVERTED_PREFIX}/{base}.ndjson"
-            s3.put_object(Bucket=CONVERTED_BUCKET, Key=out_key, Body=ndjson_bytes)
+            with metrics.phase("write"):
+                s3.put_object(Bucket=CONVERTED_BUCKET, Key=out_key, Body=ndjson_bytes)
+            metrics.bytes_out += len(ndjson_bytes)
 
             return {
                 "status": "success",
@@ -66,14 +79,18 @@ def handler(event, context):
         # EXCEL → CSV
         # --------------------------------------------------
         if file_type == "excel":
-            df = pd.read_excel(io.BytesIO(raw_bytes), sheet_name=sheet)
+            with metrics.phase("parse"):
+                df = pd.read_excel(io.BytesIO(raw_bytes), sheet_name=sheet)
+            metrics.rows = len(df)
 
-            buf = io.StringIO()
-            df.to_csv(buf, index=False)
-            csv_bytes = buf.getvalue().encode("utf-8")
+            with metrics.phase("write"):
+                buf = io.StringIO()
+                df.to_csv(buf, index=False)
+                csv_bytes = buf.getvalue().encode("utf-8")
 
-            out_key = f"{CONVERTED_PREFIX}/{base}.csv"
-            s3.put_object(Bucket=CONVERTED_BUCKET, Key=out_key, Body=csv_bytes)
+                out_key = f"{CONVERTED_PREFIX}/{base}.csv"
+                s3.put_object(Bucket=CONVERTED_BUCKET, Key=out_key, Body=csv_bytes)
+            metrics.bytes_out += len(csv_bytes)
 
             return {
                 "status": "success",
@@ -94,14 +111,18 @@ def handler(event, context):
             except Exception:
                 delimiter = ","
 
-            df = pd.read_csv(io.StringIO(text), delimiter=delimiter)
+            with metrics.phase("parse"):
+                df = pd.read_csv(io.StringIO(text), delimiter=delimiter)
+            metrics.rows = len(df)
 
-            buf = io.StringIO()
-            df.to_csv(buf, index=False)
-            csv_bytes = buf.getvalue().encode("utf-8")
+            with metrics.phase("write"):
+                buf = io.StringIO()
+                df.to_csv(buf, index=False)
+                csv_bytes = buf.getvalue().encode("utf-8")
 
-            out_key = f"{CONVERTED_PREFIX}/{base}.csv"
-            s3.put_object(Bucket=CONVERTED_BUCKET, Key=out_key, Body=csv_bytes)
+                out_key = f"{CONVERTED_PREFIX}/{base}.csv"
+                s3.put_object(Bucket=CONVERTED_BUCKET, Key=out_key, Body=csv_bytes)
+            metrics.bytes_out += len(csv_bytes)
 
             return {
                 "status": "success",
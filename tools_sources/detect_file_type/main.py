@@ -1,10 +1,15 @@
 import json
-import pandas as pd
-import boto3
 import io
 from datetime import datetime
 
-s3 = boto3.client("s3")
+from digestor_common.aws import client
+from digestor_common.lazy import lazy_import
+from digestor_common.metrics import instrumented, current_metrics
+
+s3 = client("s3")
+
+# Non serve per JSON / file non supportati
+pd = lazy_import("pandas")
 
 
 # -------------------------------------------------------
@@ -45,10 +50,25 @@ def extract_name_parts(filename: str):
 # -------------------------------------------------------
 # Utility: Summaries
 # -------------------------------------------------------
-def summarize_tabular(df: pd.DataFrame):
+def summarize_tabular(df: "pd.DataFrame"):
     return f"File tabellare con {len(df.columns)} colonne."
 
 
+def flat_column_count(record: dict) -> int:
+    """
+    Columns of a JSON record once nested objects are flattened
+    (a.b, a.c, ...), as pd.json_normalize would produce, without pandas.
+    """
+    return sum(
+        flat_column_count(value) if isinstance(value, dict) and value else 1
+        for value in record.values()
+    )
+
+
+def summarize_record(record: dict):
+    return f"File tabellare con {flat_column_count(record)} colonne."
+
+
 def summarize_json(obj):
     if isinstance(obj, dict):
         return f"JSON con {len(obj.keys())} campi principali."
@@ -61,163 +81,176 @@ def summarize_json(obj):
 
 
 # -------------------------------------------------------
-# Lambda handler
+# Detection on already-downloaded bytes (also used by fused_ingest)
 # -------------------------------------------------------
-def handler(event, context):
-    try:
-        file_s3_path = event["file_s3_path"]
-        sheet = event.get("sheet")
-
-        bucket, key = parse_s3_path(file_s3_path)
-        filename = key.split("/")[-1]
-        extension = filename.lower().split(".")[-1]
+def detect_from_bytes(filename: str, raw_bytes: bytes, sheet=None):
+    extension = filename.lower().split(".")[-1]
+    text_sample = raw_bytes[:5000].decode("utf-8", errors="ignore")
 
-        obj = s3.get_object(Bucket=bucket, Key=key)
-        raw_bytes = obj["Body"].read()
-        text_sample = raw_bytes[:5000].decode("utf-8", errors="ignore")
+    domain, dataset, optional = extract_name_parts(filename)
 
-        domain, dataset, optional = extract_name_parts(filename)
-
-        # -------------------------------------------------------
-        # CSV / TSV / TXT
-        # -------------------------------------------------------
-        if extension in ["csv", "tsv", "txt"]:
-            delimiter = "\t" if extension == "tsv" else detect_delimiter(text_sample)
-
-            try:
-                df = pd.read_csv(io.BytesIO(raw_bytes), delimiter=delimiter, nrows=50)
-            except Exception:
-                return {
-                    "status": "failed",
-                    "file_type": "text_unstructured",
-                    "ready_for_ingestion": False,
-                    "message": "File non tabellare o delimitatore non valido"
-                }
+    # -------------------------------------------------------
+    # CSV / TSV / TXT
+    # -------------------------------------------------------
+    if extension in ["csv", "tsv", "txt"]:
+        delimiter = "\t" if extension == "tsv" else detect_delimiter(text_sample)
 
+        try:
+            df = pd.read_csv(io.BytesIO(raw_bytes), delimiter=delimiter, nrows=50)
+        except Exception:
             return {
-                "status": "success",
-                "file_name": filename,
-                "extension": extension,
-                "file_type": "csv" if delimiter == "," else "delimited_text",
-                "delimiter": delimiter,
-                "domain": domain,
-                "dataset": dataset,
-                "name_optional": optional,
-                "structured": True,
-                "columns": list(df.columns),
-                "content_summary": summarize_tabular(df),
-                "ready_for_ingestion": domain is not None and dataset is not None,
+                "status": "failed",
+                "file_type": "text_unstructured",
+                "ready_for_ingestion": False,
+                "message": "File non tabellare o delimitatore non valido"
             }
 
-        # -------------------------------------------------------
-        # NDJSON
-        # -------------------------------------------------------
-        if extension == "ndjson":
-            lines = text_sample.strip().split("\n")
-            try:
-                first = json.loads(lines[0])
-            except Exception:
-                return {
-                    "status": "failed",
-                    "file_type": "jsonl_invalid",
-                    "ready_for_ingestion": False
-                }
+        return {
+            "status": "success",
+            "file_name": filename,
+            "extension": extension,
+            "file_type": "csv" if delimiter == "," else "delimited_text",
+            "delimiter": delimiter,
+            "domain": domain,
+            "dataset": dataset,
+            "name_optional": optional,
+            "structured": True,
+            "columns": list(df.columns),
+            "content_summary": summarize_tabular(df),
+            "ready_for_ingestion": domain is not None and dataset is not None,
+        }
 
+    # -------------------------------------------------------
+    # NDJSON
+    # -------------------------------------------------------
+    if extension == "ndjson":
+        lines = text_sample.strip().split("\n")
+        try:
+            first = json.loads(lines[0])
+        except Exception:
             return {
-                "status": "success",
-                "file_name": filename,
-                "file_type": "jsonl",
-                "domain": domain,
-                "dataset": dataset,
-                "name_optional": optional,
-                "structured": True,
-                "columns": list(first.keys()),
-                "content_summary": summarize_tabular(pd.json_normalize(first)),
-                "ready_for_ingestion": domain is not None and dataset is not None,
+                "status": "failed",
+                "file_type": "jsonl_invalid",
+                "ready_for_ingestion": False
             }
 
-        # -------------------------------------------------------
-        # JSON
-        # -------------------------------------------------------
-        if extension == "json":
-            try:
-                parsed = json.loads(text_sample)
-            except Exception:
-                return {
-                    "status": "failed",
-                    "file_type": "json_invalid",
-                    "ready_for_ingestion": False
-                }
+        return {
+            "status": "success",
+            "file_name": filename,
+            "file_type": "jsonl",
+            "domain": domain,
+            "dataset": dataset,
+            "name_optional": optional,
+            "structured": True,
+            "columns": list(first.keys()),
+            "content_summary": summarize_record(first),
+            "ready_for_ingestion": domain is not None and dataset is not None,
+        }
 
-            if isinstance(parsed, list):
-                if not parsed:
-                    return {
-                        "status": "warning",
-                        "file_type": "json_array_empty",
-                        "ready_for_ingestion": False
-                    }
-
-                if isinstance(parsed[0], dict):
-                    return {
-                        "status": "warning",
-                        "file_type": "json_array",
-                        "domain": domain,
-                        "dataset": dataset,
-                        "name_optional": optional,
-                        "structured": True,
-                        "columns": list(parsed[0].keys()),
-                        "content_summary": summarize_json(parsed),
-                        "ready_for_ingestion": domain is not None and dataset is not None
-                    }
+    # -------------------------------------------------------
+    # JSON
+    # -------------------------------------------------------
+    if extension == "json":
+        try:
+            parsed = json.loads(text_sample)
+        except Exception:
+            return {
+                "status": "failed",
+                "file_type": "json_invalid",
+                "ready_for_ingestion": False
+            }
 
+        if isinstance(parsed, list):
+            if not parsed:
                 return {
-                    "status": "failed",
-                    "file_type": "json_unstructured_array",
+                    "status": "warning",
+                    "file_type": "json_array_empty",
                     "ready_for_ingestion": False
                 }
 
-            if isinstance(parsed, dict):
+            if isinstance(parsed[0], dict):
                 return {
-                    "status": "success",
-                    "file_name": filename,
-                    "file_type": "json_object",
+                    "status": "warning",
+                    "file_type": "json_array",
                     "domain": domain,
                     "dataset": dataset,
                     "name_optional": optional,
                     "structured": True,
-                    "columns": list(parsed.keys()),
+                    "columns": list(parsed[0].keys()),
                     "content_summary": summarize_json(parsed),
                     "ready_for_ingestion": domain is not None and dataset is not None
                 }
 
-        # -------------------------------------------------------
-        # Excel
-        # -------------------------------------------------------
-        if extension in ["xlsx", "xls"]:
-            excel = pd.ExcelFile(io.BytesIO(raw_bytes))
-            sheet_to_use = sheet or excel.sheet_names[0]
-            df = excel.parse(sheet_to_use, nrows=50)
+            return {
+                "status": "failed",
+                "file_type": "json_unstructured_array",
+                "ready_for_ingestion": False
+            }
 
+        if isinstance(parsed, dict):
             return {
                 "status": "success",
                 "file_name": filename,
-                "file_type": "excel",
+                "file_type": "json_object",
                 "domain": domain,
                 "dataset": dataset,
                 "name_optional": optional,
-                "sheet_used": sheet_to_use,
                 "structured": True,
-                "columns": list(df.columns),
-                "content_summary": summarize_tabular(df),
+                "columns": list(parsed.keys()),
+                "content_summary": summarize_json(parsed),
                 "ready_for_ingestion": domain is not None and dataset is not None
             }
 
+    # -------------------------------------------------------
+    # Excel
+    # -------------------------------------------------------
+    if extension in ["xlsx", "xls"]:
+        excel = pd.ExcelFile(io.BytesIO(raw_bytes))
+        sheet_to_use = sheet or excel.sheet_names[0]
+        df = excel.parse(sheet_to_use, nrows=50)
+
         return {
-            "status": "failed",
-            "file_type": "unsupported",
-            "ready_for_ingestion": False
+            "status": "success",
+            "file_name": filename,
+            "file_type": "excel",
+            "domain": domain,
+            "dataset": dataset,
+            "name_optional": optional,
+            "sheet_used": sheet_to_use,
+            "structured": True,
+            "columns": list(df.columns),
+            "content_summary": summarize_tabular(df),
+            "ready_for_ingestion": domain is not None and dataset is not None
         }
 
+    return {
+        "status": "failed",
+        "file_type": "unsupported",
+        "ready_for_ingestion": False
+    }
+
+
+# -------------------------------------------------------
+# Lambda handler
+# -------------------------------------------------------
+@instrumented("detect_file_type")
+def handler(event, context):
+    metrics = current_metrics()
+    try:
+        file_s3_path = event["file_s3_path"]
+        sheet = event.get("sheet")
+
+        bucket, key = parse_s3_path(file_s3_path)
+        filename = key.split("/")[-1]
+
+        with metrics.phase("download"):
+            obj = s3.get_object(Bucket=bucket, Key=key)
+            raw_bytes = obj["Body"].read()
+        metrics.bytes_in += len(raw_bytes)
+
+        with metrics.phase("detect"):
+            return detect_from_bytes(filename, raw_bytes, sheet)
+
     except Exception as e:
         return {
             "status": "failed",
@@ -0,0 +1,6 @@
+"""
+Shared helpers for the digestor tool Lambdas.
+
+Packaged as the `digestor_common` Lambda layer (zip with the package under
+`python/digestor_common/`).
+"""
@@ -0,0 +1,211 @@
+import time
+
+from digestor_common.aws import client
+from digestor_common.tracing import child_span
+
+athena = client("athena")
+
+TERMINAL_STATES = ("SUCCEEDED", "FAILED", "CANCELLED")
+
+# Polling adattivo: si parte veloce (le query brevi finiscono in < 1s) e si
+# rallenta finché lo stato non cambia.
+INITIAL_POLL_DELAY = 0.2
+MAX_POLL_DELAY = 5.0
+POLL_BACKOFF = 1.5
+
+# batch_get_query_execution accetta al massimo 50 id per chiamata
+BATCH_SIZE = 50
+
+
+# ------------------------------------------------------------
+# Deadline from the Lambda context
+# ------------------------------------------------------------
+def deadline_from_context(context, margin_seconds=15):
+    """
+    Deadline (time.monotonic) for Athena queries: the Lambda remaining time
+    minus a margin, so a stuck query is stopped and reported instead of
+    burning the Lambda until it times out.
+    """
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return None
+    remaining = context.get_remaining_time_in_millis() / 1000
+    return time.monotonic() + max(remaining - margin_seconds, 1)
+
+
+# ------------------------------------------------------------
+# Submission
+# ------------------------------------------------------------
+def start_query(query, output_location, workgroup="primary"):
+    q = athena.start_query_execution(
+        QueryString=query,
+        WorkGroup=workgroup,
+        ResultConfiguration={"OutputLocation": output_location}
+    )
+    return q["QueryExecutionId"]
+
+
+# ------------------------------------------------------------
+# Statistics
+# ------------------------------------------------------------
+def query_stats(execution):
+    """
+    Timings (ms) and bytes scanned from a QueryExecution structure.
+    """
+    stats = execution.get("Statistics", {})
+    return {
+        "queue_ms": stats.get("QueryQueueTimeInMillis", 0),
+        "planning_ms": stats.get("QueryPlanningTimeInMillis", 0),
+        "execution_ms": stats.get("EngineExecutionTimeInMillis", 0),
+        "service_processing_ms": stats.get("ServiceProcessingTimeInMillis", 0),
+        "total_ms": stats.get("TotalExecutionTimeInMillis", 0),
+        "bytes_scanned": stats.get("DataScannedInBytes", 0)
+    }
+
+
+def record_span(span, result):
+    """
+    Athena queue / planning / execution times on the span of the query.
+    """
+    if span is None:
+        return
+    span.set_attribute("db.system", "athena")
+    span.set_attribute("athena.query_id", result["query_id"])
+    span.set_attribute("athena.state", result["state"])
+    for key, value in result["stats"].items():
+        span.set_attribute(f"athena.{key}", value)
+    span.set_status(result["state"] == "SUCCEEDED", result.get("state_reason"))
+
+
+def summarize(execution, timed_out=False):
+    status = execution["Status"]
+    return {
+        "query_id": execution["QueryExecutionId"],
+        "state": status["State"],
+        "state_reason": status.get("StateChangeReason"),
+        "timed_out": timed_out,
+        "stats": query_stats(execution)
+    }
+
+
+# ------------------------------------------------------------
+# Waiting (one or many queries, adaptive backoff, deadline)
+# ------------------------------------------------------------
+def wait_for_queries(query_ids, timeout=None, deadline=None):
+    """
+    Polls the given queries until all are in a terminal state.
+
+    - Poll interval starts at INITIAL_POLL_DELAY and grows by POLL_BACKOFF
+      (up to MAX_POLL_DELAY) while no query changes state.
+    - `timeout` (seconds from now) or `deadline` (time.monotonic() value):
+      queries still running when it expires are stopped with
+      stop_query_execution and reported with timed_out=True.
+
+    Returns a dict query_id -> summary (see `summarize`).
+    """
+    if timeout is not None:
+        timeout_deadline = time.monotonic() + timeout
+        deadline = timeout_deadline if deadline is None else min(deadline, timeout_deadline)
+
+    pending = list(query_ids)
+    results = {}
+    delay = INITIAL_POLL_DELAY
+
+    while pending:
+        changed = False
+
+        for i in range(0, len(pending), BATCH_SIZE):
+            resp = athena.batch_get_query_execution(QueryExecutionIds=pending[i:i + BATCH_SIZE])
+            for execution in resp["QueryExecutions"]:
+                if execution["Status"]["State"] in TERMINAL_STATES:
+                    results[execution["QueryExecutionId"]] = summarize(execution)
+                    changed = True
+
+        pending = [q for q in pending if q not in results]
+        if not pending:
+            break
+
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            for query_id in pending:
+                athena.stop_query_execution(QueryExecutionId=query_id)
+                execution = athena.get_query_execution(QueryExecutionId=query_id)["QueryExecution"]
+                results[query_id] = summarize(execution, timed_out=True)
+            break
+
+        delay = INITIAL_POLL_DELAY if changed else min(delay * POLL_BACKOFF, MAX_POLL_DELAY)
+        time.sleep(delay)
+
+    return results
+
+
+def wait_for_query(query_id, timeout=None, deadline=None):
+    return wait_for_queries([query_id], timeout=timeout, deadline=deadline)[query_id]
+
+
+# ------------------------------------------------------------
+# High level helpers
+# ------------------------------------------------------------
+def run_query(query, output_location, workgroup="primary", timeout=None, deadline=None, fetch=False):
+    """
+    Submits a query and waits for it. With fetch=True the result rows are
+    attached as a list of dicts under "rows" (only if SUCCEEDED).
+    """
+    with child_span("athena.query", {"db.statement": query[:1000]}) as span:
+        query_id = start_query(query, output_location, workgroup)
+        result = wait_for_query(query_id, timeout=timeout, deadline=deadline)
+        record_span(span, result)
+    result["query"] = query
+
+    if fetch:
+        result["rows"] = list(iter_results(query_id)) if result["state"] == "SUCCEEDED" else []
+
+    return result
+
+
+def run_queries(queries, output_location, workgroup="primary", max_concurrency=5,
+                timeout=None, deadline=None, fetch=False):
+    """
+    Runs independent queries concurrently, at most `max_concurrency` at a
+    time (Athena DML concurrency is a per-account quota).
+    Results are returned in the same order as `queries`.
+    """
+    if timeout is not None:
+        timeout_deadline = time.monotonic() + timeout
+        deadline = timeout_deadline if deadline is None else min(deadline, timeout_deadline)
+
+    results = [None] * len(queries)
+
+    for start in range(0, len(queries), max_concurrency):
+        window = list(enumerate(queries))[start:start + max_concurrency]
+        with child_span("athena.queries", {"athena.query_count": len(window)}):
+            ids = {idx: start_query(q, output_location, workgroup) for idx, q in window}
+            done = wait_for_queries(list(ids.values()), deadline=deadline)
+
+        for idx, query in window:
+            result = done[ids[idx]]
+            result["query"] = query
+            if fetch:
+                result["rows"] = (
+                    list(iter_results(ids[idx])) if result["state"] == "SUCCEEDED" else []
+                )
+            results[idx] = result
+
+    return results
+
+
+def iter_results(query_id, page_size=1000):
+    """
+    Yields result rows as dicts, paging get_query_results with the maximum
+    page size. The header row (first row of the first page) is skipped.
+    """
+    header = None
+    paginator = athena.get_paginator("get_query_results")
+    for page in paginator.paginate(
+        QueryExecutionId=query_id,
+        PaginationConfig={"PageSize": page_size}
+    ):
+        rows = page["ResultSet"]["Rows"]
+        if header is None:
+            header = [c["Name"] for c in page["ResultSet"]["ResultSetMetadata"]["ColumnInfo"]]
+            rows = rows[1:]
+        for row in rows:
+            yield dict(zip(header, [c.get("VarCharValue") for c in row["Data"]]))
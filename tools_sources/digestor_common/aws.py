@@ -0,0 +1,99 @@
+"""
+Shared boto3 clients for the tool handlers.
+
+    from digestor_common.aws import client
+
+    s3 = client("s3")
+
+One client per (service, region) per process, created with:
+
+- max_pool_connections  AWS_MAX_POOL_CONNECTIONS (default 50; boto3: 10)
+- TCP keep-alive        AWS_TCP_KEEPALIVE (default true)
+- timeouts              AWS_CONNECT_TIMEOUT / AWS_READ_TIMEOUT seconds;
+                        Lambda invokes wait for the whole tool run, so their
+                        read timeout is AWS_LAMBDA_READ_TIMEOUT (default 900);
+                        Bedrock streams a whole model turn:
+                        AWS_BEDROCK_READ_TIMEOUT (default 300)
+- retries               AWS_RETRY_MODE (default "adaptive": standard retries
+                        plus client-side rate limiting on throttling),
+                        AWS_MAX_ATTEMPTS (default 5)
+- endpoint              AWS_ENDPOINT_URL_<SERVICE> or AWS_ENDPOINT_URL
+                        (LocalStack, MinIO, ...)
+
+set_client(service, obj) replaces the client returned for a service (the
+local backend registers its S3 stand-in).
+
+The agent runtime uses the same module (tools.backend), so the Lambdas and
+the agent share one configuration.
+"""
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+
+MAX_POOL_CONNECTIONS = int(os.environ.get("AWS_MAX_POOL_CONNECTIONS", "50"))
+TCP_KEEPALIVE = os.environ.get("AWS_TCP_KEEPALIVE", "true").lower() == "true"
+CONNECT_TIMEOUT = float(os.environ.get("AWS_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("AWS_READ_TIMEOUT", "60"))
+LAMBDA_READ_TIMEOUT = float(os.environ.get("AWS_LAMBDA_READ_TIMEOUT", "900"))
+RETRY_MODE = os.environ.get("AWS_RETRY_MODE", "adaptive")
+MAX_ATTEMPTS = int(os.environ.get("AWS_MAX_ATTEMPTS", "5"))
+
+BEDROCK_READ_TIMEOUT = float(os.environ.get("AWS_BEDROCK_READ_TIMEOUT", "300"))
+
+# Read timeout per servizio (le invoke sincrone durano quanto il tool, lo
+# streaming del modello quanto il turno)
+SERVICE_READ_TIMEOUTS = {"lambda": LAMBDA_READ_TIMEOUT, "bedrock-runtime": BEDROCK_READ_TIMEOUT}
+
+_clients = {}
+_overrides = {}
+_lock = threading.Lock()
+
+
+def client_config(service):
+    """
+    Pool size, keep-alive, timeouts and retry mode of the shared clients.
+    """
+    return Config(
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        tcp_keepalive=TCP_KEEPALIVE,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=SERVICE_READ_TIMEOUTS.get(service, READ_TIMEOUT),
+        retries={"mode": RETRY_MODE, "max_attempts": MAX_ATTEMPTS}
+    )
+
+
+def endpoint_url(service):
+    env_name = "AWS_ENDPOINT_URL_" + service.upper().replace("-", "_")
+    return os.environ.get(env_name) or os.environ.get("AWS_ENDPOINT_URL")
+
+
+def client(service, region_name=None):
+    """
+    Cached, pooled client for `service`.
+    """
+    if service in _overrides:
+        return _overrides[service]
+
+    key = (service, region_name)
+    with _lock:
+        if key not in _clients:
+            _clients[key] = boto3.session.Session().client(
+                service,
+                region_name=region_name,
+                endpoint_url=endpoint_url(service),
+                config=client_config(service)
+            )
+        return _clients[key]
+
+
+def set_client(service, obj):
+    """
+    Client returned by client(service) from now on (None restores boto3).
+    """
+    with _lock:
+        if obj is None:
+            _overrides.pop(service, None)
+        else:
+            _overrides[service] = obj
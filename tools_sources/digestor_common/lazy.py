@@ -0,0 +1,53 @@
+"""
+Deferred imports for heavy dependencies.
+
+    from digestor_common.lazy import lazy_import
+
+    pd = lazy_import("pandas")     # imported on the first pd.<attribute>
+
+Handlers whose code paths do not all need pandas / numpy / awswrangler
+(a JSON detection, a CSV passthrough, a load already in the ledger) skip
+their import time on those paths. Handlers that always parse with pandas
+should keep the plain import: the Lambda init phase is the cheaper place
+to pay for it.
+"""
+import importlib.util
+import sys
+import types
+
+
+class MissingModule(types.ModuleType):
+    """
+    Stand-in for a module that is not installed: raises ModuleNotFoundError
+    on first attribute access, i.e. only on the code paths that use it.
+    """
+
+    def __getattr__(self, attr):
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        raise ModuleNotFoundError(f"No module named '{self.__name__}'", name=self.__name__)
+
+
+def lazy_import(name):
+    """
+    Module object for `name` whose body runs on first attribute access
+    (importlib.util.LazyLoader). Already imported modules are returned
+    as they are; a module that is not installed only fails when used
+    (MissingModule), like the import it replaces would on that path.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    try:
+        spec = importlib.util.find_spec(name)
+    except ModuleNotFoundError:   # pacchetto padre mancante ("a.b")
+        spec = None
+    if spec is None:
+        return MissingModule(name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,558 @@
+"""
+Local execution backend: runs the tool handlers with no AWS access.
+
+- LocalS3            filesystem stand-in for the S3 client
+                     (<root>/<bucket>/<key>, MD5 ETags, conditional writes)
+- LocalCatalog       SQLite catalog + SQL engine replacing Glue/Athena
+- LocalLambdaClient  stand-in for boto3.client("lambda"): invoke() runs the
+                     tools_sources/*/main.py handler in-process (or in a
+                     process pool), with its AWS clients swapped for the
+                     local ones
+
+Not covered locally: iceberg_ctas runs as local_iceberg_ctas, a
+re-implementation of its commit semantics on the SQLite catalog (the
+Athena SQL of the real handler - CTAS / MERGE statements, staging
+tables, Glue statistics - is not executed); iceberg_maintenance and any
+other handler outside FUNCTION_SOURCES answer "not available on the
+local backend". Their SQL is only exercised against AWS.
+
+Usage:
+
+    client = LocalLambdaClient("./.digestor-local")
+    client.s3.upload_file("documents/sample.csv", "agentcore-digestor-upload-raw-dev", "sample.csv")
+    client.call("core", {"body": {"file_s3_path": "s3://agentcore-digestor-upload-raw-dev/sample.csv",
+                                  "domain": "sales", "dataset": "orders"}})
+    client.catalog.query("SELECT count(*) FROM icg_sales_orders_dev")
+
+or from the command line:
+
+    python -m digestor_common.local <file> --domain sales --dataset orders
+"""
+import datetime
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import types
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from botocore.exceptions import ClientError
+
+from digestor_common.aws import set_client
+from digestor_common.metrics import FileSink, set_sink
+
+TOOLS_SOURCES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FUNCTION_PREFIX = "agentcore-digestor-lambda-"
+
+# <component> del nome funzione → cartella in tools_sources
+FUNCTION_SOURCES = {
+    "core": "lambda_core_src",
+    "detect-file-type": "detect_file_type",
+    "convert-semi-tabular": "convert_semi_tabular",
+    "analyze-schema": "analyze_schema",
+    "validate-data": "validate_data",
+    "schema-normalizer": "schema_normalizer",
+    "load-into-iceberg": "load_data_into_iceberg_src",
+    "fused-ingest": "fused_ingest_src",
+    "event-ingest": "event_ingest_src",
+}
+
+
+def client_error(code, message, operation):
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+
+# ------------------------------------------------------------
+# S3 stand-in
+# ------------------------------------------------------------
+class LocalS3:
+    """
+    The subset of the S3 client API used by the handlers, on the local
+    filesystem. Objects live at <root>/<bucket>/<key>; ETags are the quoted
+    MD5 of the content (as for single-part uploads).
+    """
+
+    class exceptions:
+        class NoSuchKey(ClientError):
+            pass
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._lock = threading.Lock()
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, *key.split("/"))
+
+    def _read(self, bucket, key, operation):
+        try:
+            with open(self._path(bucket, key), "rb") as f:
+                return f.read()
+        except (FileNotFoundError, IsADirectoryError):
+            raise self.exceptions.NoSuchKey(
+                {"Error": {"Code": "NoSuchKey", "Message": f"s3://{bucket}/{key}"}}, operation
+            )
+
+    @staticmethod
+    def _etag(data):
+        return f'"{hashlib.md5(data).hexdigest()}"'
+
+    def head_object(self, Bucket, Key, **kwargs):
+        path = self._path(Bucket, Key)
+        if not os.path.isfile(path):
+            raise client_error("404", "Not Found", "HeadObject")
+        data = self._read(Bucket, Key, "HeadObject")
+        return {
+            "ContentLength": len(data),
+            "ETag": self._etag(data),
+            "LastModified": datetime.datetime.fromtimestamp(os.path.getmtime(path), datetime.timezone.utc)
+        }
+
+    def get_object(self, Bucket, Key, IfMatch=None, Range=None, **kwargs):
+        data = self._read(Bucket, Key, "GetObject")
+        etag = self._etag(data)
+        if IfMatch and IfMatch.strip('"') != etag.strip('"'):
+            raise client_error("PreconditionFailed", "At least one of the pre-conditions failed", "GetObject")
+        if Range:
+            start, _, end = Range.replace("bytes=", "").partition("-")
+            data = data[int(start):int(end) + 1 if end else None]
+        return {"Body": io.BytesIO(data), "ETag": etag, "ContentLength": len(data)}
+
+    def put_object(self, Bucket, Key, Body=b"", IfNoneMatch=None, IfMatch=None, **kwargs):
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        elif hasattr(Body, "read"):
+            Body = Body.read()
+
+        path = self._path(Bucket, Key)
+        with self._lock:
+            exists = os.path.isfile(path)
+            if IfNoneMatch == "*" and exists:
+                raise client_error("PreconditionFailed", "Object already exists", "PutObject")
+            if IfMatch:
+                if not exists or self._etag(self._read(Bucket, Key, "PutObject")).strip('"') != IfMatch.strip('"'):
+                    raise client_error("PreconditionFailed", "ETag mismatch", "PutObject")
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(Body)
+            os.replace(tmp, path)
+
+        return {"ETag": self._etag(Body)}
+
+    def upload_file(self, Filename, Bucket, Key, **kwargs):
+        with open(Filename, "rb") as f:
+            self.put_object(Bucket=Bucket, Key=Key, Body=f.read())
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        data = self._read(CopySource["Bucket"], CopySource["Key"], "CopyObject")
+        return {"CopyObjectResult": self.put_object(Bucket=Bucket, Key=Key, Body=data)}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        try:
+            os.remove(self._path(Bucket, Key))
+        except FileNotFoundError:
+            pass
+        return {}
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        for obj in Delete["Objects"]:
+            self.delete_object(Bucket=Bucket, Key=obj["Key"])
+        return {}
+
+    def list_objects(self, Bucket, Prefix=""):
+        base = os.path.join(self.root, Bucket)
+        contents = []
+        for dirpath, _, filenames in os.walk(base):
+            for name in filenames:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, name)
+                key = os.path.relpath(path, base).replace(os.sep, "/")
+                if key.startswith(Prefix):
+                    contents.append({
+                        "Key": key,
+                        "Size": os.path.getsize(path),
+                        "LastModified": datetime.datetime.fromtimestamp(
+                            os.path.getmtime(path), datetime.timezone.utc
+                        )
+                    })
+        return sorted(contents, key=lambda o: o["Key"])
+
+    def list_objects_v2(self, Bucket, Prefix="", **kwargs):
+        contents = self.list_objects(Bucket, Prefix)
+        return {"Contents": contents, "KeyCount": len(contents), "IsTruncated": False}
+
+    def get_paginator(self, name):
+        """
+        Paginator over any list method of this client: a single page with
+        the whole listing (PaginationConfig is ignored).
+        """
+        method = getattr(self, name, None)
+        if method is None or not name.startswith("list_"):
+            raise NotImplementedError(f"LocalS3 has no paginator for {name}")
+
+        class Paginator:
+            def paginate(self, PaginationConfig=None, **kwargs):
+                yield method(**kwargs)
+
+        return Paginator()
+
+    def local_path(self, s3_path):
+        path = s3_path.replace("s3://", "")
+        return self._path(path.split("/")[0], "/".join(path.split("/")[1:]))
+
+
+class LocalWrangler:
+    """
+    awswrangler stand-in: only wr.s3.to_parquet(dataset=True), as used by
+    load_into_iceberg.
+    """
+
+    def __init__(self, s3):
+        self.s3 = types.SimpleNamespace(to_parquet=self._to_parquet)
+        self._s3 = s3
+
+    def _to_parquet(self, df, path, dataset=True, mode="append", filename_prefix="", **kwargs):
+        target = f"{path.rstrip('/')}/{filename_prefix}{uuid.uuid4().hex}.snappy.parquet"
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False, compression="snappy")
+        bucket, _, key = target.replace("s3://", "").partition("/")
+        self._s3.put_object(Bucket=bucket, Key=key, Body=buffer.getvalue())
+        return {"paths": [target], "partitions_values": {}}
+
+
+# ------------------------------------------------------------
+# Catalog + SQL engine (Glue / Athena / Iceberg stand-in)
+# ------------------------------------------------------------
+class LocalCatalog:
+    """
+    One SQLite database per root. Each Iceberg table is a SQLite table;
+    `_digestor_tables` keeps schema and partitioning, `_digestor_loads`
+    the applied loads (same role as the applied markers of iceberg_ctas).
+    Every commit runs in a single transaction.
+    """
+
+    def __init__(self, root, s3):
+        os.makedirs(root, exist_ok=True)
+        self.path = os.path.join(root, "_catalog.sqlite")
+        self.s3 = s3
+        self._lock = threading.Lock()
+        with self._connect() as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS _digestor_tables (
+                    name TEXT PRIMARY KEY, schema TEXT, partition_columns TEXT, created_at TEXT
+                )""")
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS _digestor_loads (
+                    table_name TEXT, load_id TEXT, result TEXT, committed_at TEXT,
+                    PRIMARY KEY (table_name, load_id)
+                )""")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=60)
+
+    def query(self, sql, params=()):
+        with self._connect() as con:
+            return pd.read_sql_query(sql, con, params=params)
+
+    def table_exists(self, con, table_name):
+        row = con.execute("SELECT 1 FROM _digestor_tables WHERE name = ?", (table_name,)).fetchone()
+        return row is not None
+
+    def read_files(self, files):
+        frames = [pd.read_parquet(self.s3.local_path(f)) for f in files]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def applied(self, table_name, load_id):
+        """
+        Result of the commit that applied the load to the table, or None.
+        """
+        with self._connect() as con:
+            row = con.execute(
+                "SELECT result FROM _digestor_loads WHERE table_name = ? AND load_id = ?",
+                (table_name, load_id)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def commit(self, table_name, schema, mode, files, key_columns=(), partition_columns=()):
+        """
+        Applies the given Parquet files to the table with the same semantics
+        as iceberg_ctas (create / append / overwrite / overwrite_partitions /
+        merge). Returns (applied_mode, statements).
+        """
+        df = self.read_files(files)
+        columns = [c["name"] for c in schema]
+        df = df[[c for c in columns if c in df.columns]]
+        cols = ", ".join(f'"{c}"' for c in df.columns)
+
+        with self._lock, self._connect() as con:
+            statements = []
+            staging = f"_staging_{uuid.uuid4().hex[:6]}"
+            df.to_sql(staging, con, index=False)
+
+            if not self.table_exists(con, table_name):
+                applied_mode = "create"
+                statements.append(f'CREATE TABLE "{table_name}" AS SELECT {cols} FROM {staging}')
+                con.execute(
+                    "INSERT INTO _digestor_tables VALUES (?, ?, ?, ?)",
+                    (table_name, json.dumps(schema), json.dumps(list(partition_columns)),
+                     datetime.datetime.utcnow().isoformat())
+                )
+            else:
+                applied_mode = mode
+                if mode == "overwrite":
+                    statements.append(f'DELETE FROM "{table_name}"')
+                elif mode == "overwrite_partitions":
+                    keys = ", ".join(f'"{c}"' for c in partition_columns)
+                    statements.append(
+                        f'DELETE FROM "{table_name}" WHERE ({keys}) IN (SELECT DISTINCT {keys} FROM {staging})'
+                    )
+                elif mode == "merge":
+                    # ultima riga per chiave, poi delete + insert (= MERGE update/insert)
+                    keys = ", ".join(f'"{c}"' for c in key_columns)
+                    statements.append(
+                        f"DELETE FROM {staging} WHERE rowid NOT IN "
+                        f"(SELECT max(rowid) FROM {staging} GROUP BY {keys})"
+                    )
+                    statements.append(
+                        f'DELETE FROM "{table_name}" WHERE ({keys}) IN (SELECT {keys} FROM {staging})'
+                    )
+                statements.append(f'INSERT INTO "{table_name}" ({cols}) SELECT {cols} FROM {staging}')
+
+            for statement in statements:
+                con.execute(statement)
+            con.execute(f"DROP TABLE {staging}")
+
+            return applied_mode, statements
+
+    def record_commit(self, table_name, load_id, result):
+        with self._lock, self._connect() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO _digestor_loads VALUES (?, ?, ?, ?)",
+                (table_name, load_id, json.dumps(result), datetime.datetime.utcnow().isoformat())
+            )
+
+
+def local_iceberg_ctas(catalog):
+    """
+    Stand-in for the iceberg_ctas handler on the local catalog: same event,
+    result and per-load dedup, but the commit is LocalCatalog.commit, not
+    the Athena statements of iceberg_ctas_src.
+    """
+    def handler(event, context):
+        try:
+            table_name = event["table_name"]
+            load_ids = event.get("load_ids") or ([event["load_id"]] if event.get("load_id") else [])
+            files = event.get("files") or []
+
+            # Un marker per load: i load già applicati escono dal commit
+            # insieme ai loro file (<load_id>_<uuid>.snappy.parquet)
+            applied = {}
+            for load_id in load_ids:
+                result = catalog.applied(table_name, load_id)
+                if result:
+                    applied[load_id] = result
+
+            if load_ids and len(applied) == len(load_ids):
+                if len(load_ids) == 1:
+                    return {**applied[load_ids[0]], "deduplicated": True}
+                return {
+                    "status": "success",
+                    "message": "All loads already applied",
+                    "table_name": table_name,
+                    "loads_skipped": sorted(applied),
+                    "deduplicated": True
+                }
+
+            files = [f for f in files if f.rsplit("/", 1)[-1].split("_", 1)[0] not in applied]
+
+            applied_mode, statements = catalog.commit(
+                table_name,
+                event["schema"],
+                event.get("mode", "append"),
+                files,
+                event.get("key_columns") or [],
+                event.get("partition_columns") or []
+            )
+
+            result = {
+                "status": "success",
+                "message": f"Local table updated ({applied_mode})",
+                "table_name": table_name,
+                "mode": applied_mode,
+                "files_applied": len(files),
+                "queries": [{"query": s, "state": "SUCCEEDED"} for s in statements]
+            }
+            for load_id in load_ids:
+                if load_id not in applied:
+                    catalog.record_commit(table_name, load_id, result)
+            if applied:
+                result["loads_skipped"] = sorted(applied)
+            return {**result, "deduplicated": False}
+
+        except Exception as e:
+            return {"status": "failed", "error": str(e), "stack_trace": repr(e)}
+
+    return handler
+
+
+def local_unsupported(component):
+    def handler(event, context):
+        return {"status": "failed", "error": f"{component} is not available on the local backend"}
+    return handler
+
+
+# ------------------------------------------------------------
+# Lambda stand-in
+# ------------------------------------------------------------
+class LocalLambdaClient:
+    """
+    Stand-in for boto3.client("lambda"). invoke() resolves the function name
+    (agentcore-digestor-lambda-<component>-<env>) to its handler in
+    tools_sources and runs it in-process, or in a process pool when
+    workers > 0.
+    """
+
+    def __init__(self, root, workers=0):
+        self.root = os.path.abspath(root)
+        self.workers = workers
+        self.s3 = LocalS3(os.path.join(self.root, "s3"))
+        self.catalog = LocalCatalog(self.root, self.s3)
+        self._modules = {}
+        self._lock = threading.Lock()
+        self._pool = ProcessPoolExecutor(max_workers=workers) if workers else None
+
+        # I client boto3 creati all'import dei moduli richiedono una region;
+        # lo stato delle run di lambda_core va sul filesystem
+        os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+        os.environ.setdefault("RUN_STATE_BACKEND", "local")
+        os.environ.setdefault("RUN_STATE_DIR", os.path.join(self.root, "runs"))
+
+        # Record EMF degli handler accanto ai dati invece che su stdout
+        set_sink(FileSink(os.path.join(self.root, "metrics.jsonl")))
+        # client("s3") / client("lambda") dei moduli importati da qui in poi
+        set_client("s3", self.s3)
+        set_client("lambda", self)
+        # Span degli handler (se il payload porta un trace context)
+        os.environ.setdefault("DIGESTOR_TRACES_FILE", os.path.join(self.root, "traces.jsonl"))
+
+    # --------------------------------------------------------
+    def _patch(self, module):
+        if hasattr(module, "s3"):
+            module.s3 = self.s3
+        if hasattr(module, "lambda_client"):
+            module.lambda_client = self
+        if hasattr(module, "wr"):
+            module.wr = LocalWrangler(self.s3)
+        # step importati da fused_ingest
+        for value in list(vars(module).values()):
+            if (
+                isinstance(value, types.ModuleType)
+                and getattr(value, "__file__", "")
+                and value.__file__.startswith(TOOLS_SOURCES_DIR)
+                and value is not module
+                and hasattr(value, "handler")
+            ):
+                self._patch(value)
+
+    def handler_for(self, component):
+        with self._lock:
+            if component in self._modules:
+                return self._modules[component]
+
+            if component == "iceberg-ctas":
+                handler = local_iceberg_ctas(self.catalog)
+            elif component not in FUNCTION_SOURCES:
+                handler = local_unsupported(component)
+            else:
+                source_dir = os.path.join(TOOLS_SOURCES_DIR, FUNCTION_SOURCES[component])
+                for path in (TOOLS_SOURCES_DIR, source_dir):
+                    if path not in sys.path:
+                        sys.path.insert(0, path)
+                spec = importlib.util.spec_from_file_location(
+                    f"local_{FUNCTION_SOURCES[component]}", os.path.join(source_dir, "main.py")
+                )
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                self._patch(module)
+                handler = module.handler
+
+            self._modules[component] = handler
+            return handler
+
+    @staticmethod
+    def component_of(function_name):
+        name = function_name.split(":")[-1]
+        if name.startswith(FUNCTION_PREFIX):
+            name = name[len(FUNCTION_PREFIX):]
+        return name.rsplit("-", 1)[0]
+
+    def call(self, component, payload):
+        return self.handler_for(component)(payload, None)
+
+    def invoke(self, FunctionName, Payload=b"{}", InvocationType="RequestResponse", **kwargs):
+        payload = json.loads(Payload)
+        component = self.component_of(FunctionName)
+
+        if self._pool:
+            result = self._pool.submit(_invoke_in_worker, self.root, component, payload).result()
+        else:
+            result = self.call(component, payload)
+
+        return {
+            "StatusCode": 200,
+            "Payload": io.BytesIO(json.dumps(result, default=str).encode("utf-8"))
+        }
+
+
+_worker_client = None
+
+
+def _invoke_in_worker(root, component, payload):
+    global _worker_client
+    if _worker_client is None:
+        _worker_client = LocalLambdaClient(root)
+    return _worker_client.call(component, payload)
+
+
+# ------------------------------------------------------------
+# CLI: full local ingestion of one file
+# ------------------------------------------------------------
+def ingest_local_file(path, root, env="dev", **body):
+    client = LocalLambdaClient(root)
+    bucket = f"agentcore-digestor-upload-raw-{env}"
+    key = os.path.basename(path)
+    client.s3.upload_file(path, bucket, key)
+
+    start = time.monotonic()
+    response = client.call("core", {"body": {"file_s3_path": f"s3://{bucket}/{key}", **body}})
+    result = json.loads(response["body"])
+    result["local_elapsed_ms"] = round((time.monotonic() - start) * 1000)
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a full ingestion on the local backend")
+    parser.add_argument("file")
+    parser.add_argument("--root", default="./.digestor-local")
+    parser.add_argument("--domain")
+    parser.add_argument("--dataset")
+    parser.add_argument("--table-name")
+    parser.add_argument("--mode", default="append")
+    args = parser.parse_args()
+
+    body = {"domain": args.domain, "dataset": args.dataset, "mode": args.mode}
+    if args.table_name:
+        body["table_name"] = args.table_name
+    print(json.dumps(ingest_local_file(args.file, args.root, **body), indent=2, default=str))
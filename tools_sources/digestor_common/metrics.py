@@ -0,0 +1,221 @@
+"""
+Per-invocation instrumentation for the tool handlers.
+
+    from digestor_common.metrics import instrumented, current_metrics
+
+    @instrumented("analyze_schema")
+    def handler(event, context):
+        metrics = current_metrics()
+        with metrics.phase("download"):
+            raw = s3.get_object(...)["Body"].read()
+        metrics.bytes_in += len(raw)
+        ...
+
+The decorator attaches a "metrics" block to the (dict) response:
+
+    {"wall_ms", "cpu_ms", "phases": {name: {"wall_ms", "cpu_ms"}},
+     "bytes_in", "bytes_out", "rows", "peak_rss_mb", "rss_growth_mb"}
+
+peak_rss_mb is the high-water mark of the whole process (ru_maxrss), so on
+a warm Lambda it includes earlier invocations; rss_growth_mb is how much
+this invocation raised it (0 when it stayed below an earlier peak).
+
+and emits the same figures as one CloudWatch Embedded Metric Format line
+(stdout → CloudWatch Logs in Lambda; MemorySink / FileSink locally).
+
+When the event carries a trace context (digestor_common.tracing) the
+handler and each phase are also recorded as spans.
+"""
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from digestor_common.tracing import server_span, child_span
+
+EMF_NAMESPACE = os.environ.get("EMF_NAMESPACE", "AgentcoreDigestor")
+
+
+# ------------------------------------------------------------
+# Sinks
+# ------------------------------------------------------------
+class StdoutSink:
+    def __call__(self, line):
+        print(line, flush=True)
+
+
+class MemorySink:
+    """
+    Keeps the EMF records in memory (tests).
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def __call__(self, line):
+        self.records.append(json.loads(line))
+
+
+class FileSink:
+    """
+    Appends EMF lines to a file (local backend runs).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, line):
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+_sink = StdoutSink()
+
+
+def set_sink(sink):
+    """
+    Replaces the EMF sink; returns the previous one.
+    """
+    global _sink
+    previous, _sink = _sink, sink
+    return previous
+
+
+# ------------------------------------------------------------
+# Metrics of one handler invocation
+# ------------------------------------------------------------
+def peak_rss_mb():
+    """
+    Peak RSS of the process so far (high-water mark, not per invocation).
+    """
+    # ru_maxrss: KB su Linux, byte su macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+class StepMetrics:
+
+    def __init__(self, step):
+        self.step = step
+        self.phases = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.rows = 0
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._peak_rss_start = peak_rss_mb()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Times a phase (download, parse, infer, write, ...). A phase entered
+        more than once accumulates.
+        """
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            with child_span(name) as span:
+                try:
+                    yield
+                except Exception as e:
+                    if span:
+                        span.set_status(False, e)
+                    raise
+        finally:
+            entry = self.phases.setdefault(name, {"wall_ms": 0.0, "cpu_ms": 0.0})
+            entry["wall_ms"] = round(entry["wall_ms"] + (time.perf_counter() - wall_start) * 1000, 2)
+            entry["cpu_ms"] = round(entry["cpu_ms"] + (time.process_time() - cpu_start) * 1000, 2)
+
+    def as_dict(self):
+        peak = peak_rss_mb()
+        return {
+            "wall_ms": round((time.perf_counter() - self._wall_start) * 1000, 2),
+            "cpu_ms": round((time.process_time() - self._cpu_start) * 1000, 2),
+            "phases": self.phases,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "rows": self.rows,
+            "peak_rss_mb": peak,
+            "rss_growth_mb": round(peak - self._peak_rss_start, 1)
+        }
+
+
+def emf_record(step, status, metrics):
+    values = {
+        "DurationMs": (metrics["wall_ms"], "Milliseconds"),
+        "CpuMs": (metrics["cpu_ms"], "Milliseconds"),
+        "BytesIn": (metrics["bytes_in"], "Bytes"),
+        "BytesOut": (metrics["bytes_out"], "Bytes"),
+        "Rows": (metrics["rows"], "Count"),
+        "PeakRssMb": (metrics["peak_rss_mb"], "Megabytes"),
+        "RssGrowthMb": (metrics["rss_growth_mb"], "Megabytes")
+    }
+    for name, phase in metrics["phases"].items():
+        values[f"Phase_{name}_Ms"] = (phase["wall_ms"], "Milliseconds")
+
+    return {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": EMF_NAMESPACE,
+                "Dimensions": [["Step"], ["Step", "Status"]],
+                "Metrics": [{"Name": name, "Unit": unit} for name, (_, unit) in values.items()]
+            }]
+        },
+        "Step": step,
+        "Status": status,
+        **{name: value for name, (value, _) in values.items()}
+    }
+
+
+def emit(step, status, metrics):
+    try:
+        _sink(json.dumps(emf_record(step, status, metrics)))
+    except Exception:
+        pass   # le metriche non devono mai far fallire il tool
+
+
+# ------------------------------------------------------------
+# Handler decorator
+# ------------------------------------------------------------
+_local = threading.local()
+
+
+def current_metrics():
+    """
+    Metrics of the handler running on this thread (a detached instance when
+    called outside an instrumented handler, so helpers can always record).
+    """
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else StepMetrics("detached")
+
+
+def instrumented(step):
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            metrics = StepMetrics(step)
+            stack = _local.__dict__.setdefault("stack", [])
+            stack.append(metrics)
+            with server_span(step, event, {"faas.name": step}) as span:
+                try:
+                    result = handler(event, context)
+                finally:
+                    stack.pop()
+
+                if isinstance(result, dict):
+                    result["metrics"] = metrics.as_dict()
+                    emit(step, result.get("status", "unknown"), result["metrics"])
+                    if span:
+                        span.set_status(result.get("status") != "failed", result.get("error"))
+                        for key in ("bytes_in", "bytes_out", "rows"):
+                            span.set_attribute(f"digestor.{key}", result["metrics"][key])
+            return result
+
+        return wrapper
+    return decorator
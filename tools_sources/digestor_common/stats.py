@@ -0,0 +1,51 @@
+"""
+Column statistics of a DataFrame, in the shape carried from
+schema_normalizer / load_into_iceberg to iceberg_ctas (Glue statistics).
+
+    from digestor_common.stats import compute_column_stats
+
+    stats = compute_column_stats(df, {"amount": "float", ...})
+
+Per column: type, row_count, null_count, distinct_count, plus min/max
+(int / float / datetime) or max_length/avg_length (strings, over the
+non-null values).
+"""
+from digestor_common.lazy import lazy_import
+
+# Importati solo dagli handler che calcolano le statistiche
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+def json_safe_value(v):
+    if isinstance(v, pd.Timestamp):
+        return v.isoformat()
+    if isinstance(v, np.generic):
+        return v.item()
+    return v
+
+
+def compute_column_stats(df: "pd.DataFrame", types: dict) -> dict:
+    stats = {}
+    for col in df.columns:
+        series = df[col]
+        non_null = series.dropna()
+        dtype = types.get(col, "string")
+
+        col_stats = {
+            "type": dtype,
+            "row_count": len(series),
+            "null_count": int(series.isna().sum()),
+            "distinct_count": int(non_null.nunique())
+        }
+
+        if len(non_null) and dtype in ("int", "float", "datetime"):
+            col_stats["min"] = json_safe_value(non_null.min())
+            col_stats["max"] = json_safe_value(non_null.max())
+        elif len(non_null):
+            lengths = non_null.astype(str).str.len()
+            col_stats["max_length"] = int(lengths.max())
+            col_stats["avg_length"] = float(lengths.mean())
+
+        stats[col] = col_stats
+    return stats
@@ -0,0 +1,187 @@
+"""
+Trace context for the tool handlers.
+
+The agent (and any other caller) propagates its W3C trace context in the
+Lambda payload:
+
+    {"file_s3_path": "...", "_trace": {"traceparent": "00-<trace>-<span>-01"}}
+
+When the event carries a sampled traceparent, the handler becomes a child
+span of the caller and every metrics phase (download, parse, infer, ...) a
+child span of the handler. Without one nothing is recorded.
+
+Spans are written as JSON lines in the OpenTelemetry SDK ConsoleSpanExporter
+shape (name, context, parent_id, start/end time, status, attributes), to
+DIGESTOR_TRACES_FILE when set - the file the agent's exporter writes to -
+or to stdout (CloudWatch Logs in Lambda). No OpenTelemetry dependency is
+needed in the Lambda images.
+"""
+import datetime
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_KEY = "_trace"
+
+SERVICE_NAME = os.environ.get("OTEL_SERVICE_NAME", "agentcore-digestor-tools")
+
+
+# ------------------------------------------------------------
+# W3C traceparent
+# ------------------------------------------------------------
+def parse_traceparent(carrier):
+    """
+    (trace_id, parent_span_id) of a sampled traceparent, else None.
+    """
+    if not isinstance(carrier, dict):
+        return None
+    parts = str(carrier.get("traceparent", "")).split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = int(parts[3], 16) & 0x01
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if not sampled or parts[1] == "0" * 32:
+        return None
+    return parts[1], parts[2]
+
+
+def _iso(ns):
+    return datetime.datetime.fromtimestamp(ns / 1e9, tz=datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+# ------------------------------------------------------------
+# Span
+# ------------------------------------------------------------
+class Span:
+
+    def __init__(self, name, trace_id, parent_id, kind="SpanKind.INTERNAL", attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.status = "UNSET"
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_status(self, ok, description=None):
+        self.status = "OK" if ok else "ERROR"
+        if description:
+            self.attributes["status.description"] = str(description)[:500]
+
+    def traceparent(self):
+        return {"traceparent": f"00-{self.trace_id}-{self.span_id}-01"}
+
+    def as_record(self):
+        return {
+            "name": self.name,
+            "context": {
+                "trace_id": f"0x{self.trace_id}",
+                "span_id": f"0x{self.span_id}",
+                "trace_state": "[]"
+            },
+            "kind": self.kind,
+            "parent_id": f"0x{self.parent_id}" if self.parent_id else None,
+            "start_time": _iso(self.start_ns),
+            "end_time": _iso(self.end_ns or time.time_ns()),
+            "status": {"status_code": self.status},
+            "attributes": self.attributes,
+            "events": [],
+            "links": [],
+            "resource": {"attributes": {"service.name": SERVICE_NAME}, "schema_url": ""}
+        }
+
+
+# ------------------------------------------------------------
+# Export
+# ------------------------------------------------------------
+_export_lock = threading.Lock()
+
+
+def export(span):
+    try:
+        line = json.dumps(span.as_record(), default=str)
+        path = os.environ.get("DIGESTOR_TRACES_FILE")
+        if path:
+            with _export_lock, open(path, "a") as f:
+                f.write(line + "\n")
+        else:
+            print(line, flush=True)
+    except Exception:
+        pass   # il tracing non deve mai far fallire il tool
+
+
+# ------------------------------------------------------------
+# Current span (per thread)
+# ------------------------------------------------------------
+_local = threading.local()
+
+
+def current_span():
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def _activate(span):
+    stack = _local.__dict__.setdefault("stack", [])
+    stack.append(span)
+    try:
+        yield span
+    finally:
+        stack.pop()
+        span.end_ns = time.time_ns()
+        export(span)
+
+
+@contextmanager
+def server_span(name, event, attributes=None):
+    """
+    Span of a handler invocation, child of the caller's span when `event`
+    carries a sampled trace context; yields None otherwise.
+    """
+    parent = parse_traceparent(event.get(TRACE_KEY) if isinstance(event, dict) else None)
+    if parent is None:
+        yield None
+        return
+
+    trace_id, parent_id = parent
+    with _activate(Span(name, trace_id, parent_id, "SpanKind.SERVER", attributes)) as span:
+        yield span
+
+
+@contextmanager
+def child_span(name, attributes=None):
+    """
+    Child of the current span of this thread; no-op (yields None) outside
+    a traced invocation.
+    """
+    parent = current_span()
+    if parent is None:
+        yield None
+        return
+
+    with _activate(Span(name, parent.trace_id, parent.span_id, attributes=attributes)) as span:
+        yield span
+
+
+def inject(payload, span=None):
+    """
+    Copy of `payload` carrying the trace context of `span` (default: the
+    current span) for a downstream invoke; `payload` unchanged when there
+    is no active trace.
+    """
+    span = span or current_span()
+    if span is None:
+        return payload
+    return {**payload, TRACE_KEY: span.traceparent()}
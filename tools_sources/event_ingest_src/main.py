@@ -0,0 +1,205 @@
+import json
+import os
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from digestor_common.aws import client
+
+lambda_client = client("lambda")
+
+# Limiti di una micro-batch (il numero di eventi e la finestra temporale
+# sono quelli dell'event source mapping SQS: batch_size / batching window)
+MICRO_BATCH_MAX_FILES = int(os.environ.get("MICRO_BATCH_MAX_FILES", "100"))
+MICRO_BATCH_MAX_BYTES = int(os.environ.get("MICRO_BATCH_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Tabelle diverse servite in parallelo; le micro-batch della stessa
+# tabella vanno in sequenza (commit Iceberg concorrenti sulla stessa
+# tabella andrebbero in conflitto)
+MAX_PARALLEL_BATCHES = int(os.environ.get("MAX_PARALLEL_BATCHES", "4"))
+
+# Concorrenza per file dentro ogni micro-batch (batch API di lambda_core)
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", "8"))
+
+
+# -------------------------------------------------------
+# Utility: Extract domain, dataset, optional
+# (same naming convention as detect_file_type)
+# -------------------------------------------------------
+def extract_name_parts(filename: str):
+    base = filename.rsplit(".", 1)[0]
+    parts = base.split("_")
+
+    if len(parts) < 2:
+        return None, None, None
+
+    domain = parts[0]
+    dataset = parts[1]
+    optional = "_".join(parts[2:]) if len(parts) > 2 else None
+    return domain, dataset, optional
+
+
+# -------------------------------------------------------
+# SQS records → S3 object-created events
+# -------------------------------------------------------
+def s3_objects(sqs_record):
+    """
+    S3 objects carried by one SQS message (an S3 notification can hold
+    several records; the s3:TestEvent sent on setup has none).
+    """
+    message = json.loads(sqs_record["body"])
+    objects = []
+    for record in message.get("Records", []):
+        if not record.get("eventName", "").startswith("ObjectCreated"):
+            continue
+        objects.append({
+            "bucket": record["s3"]["bucket"]["name"],
+            "key": urllib.parse.unquote_plus(record["s3"]["object"]["key"]),
+            "size": record["s3"]["object"].get("size", 0),
+            "event_time": record.get("eventTime")
+        })
+    return objects
+
+
+def micro_batches(files):
+    """
+    Groups files by <domain>_<dataset> (and format, since the schema is
+    checked once per batch), then splits each group so that no batch
+    exceeds MICRO_BATCH_MAX_FILES files or MICRO_BATCH_MAX_BYTES bytes.
+    """
+    groups = {}
+    for f in sorted(files, key=lambda f: f["event_time"] or ""):
+        groups.setdefault((f["domain"], f["dataset"], f["extension"]), []).append(f)
+
+    batches = []
+    for (domain, dataset, extension), members in groups.items():
+        current, size = [], 0
+        for f in members:
+            if current and (len(current) >= MICRO_BATCH_MAX_FILES or size + f["size"] > MICRO_BATCH_MAX_BYTES):
+                batches.append({"domain": domain, "dataset": dataset, "files": current})
+                current, size = [], 0
+            current.append(f)
+            size += f["size"]
+        if current:
+            batches.append({"domain": domain, "dataset": dataset, "files": current})
+    return batches
+
+
+# -------------------------------------------------------
+# One micro-batch → one lambda_core batch request
+# -------------------------------------------------------
+def ingest_batch(batch, env):
+    payload = {
+        "body": {
+            "files": [f"s3://{f['bucket']}/{f['key']}" for f in batch["files"]],
+            "domain": batch["domain"],
+            "dataset": batch["dataset"],
+            "shared_schema": True,
+            "max_concurrency": BATCH_MAX_CONCURRENCY
+        }
+    }
+    try:
+        response = lambda_client.invoke(
+            FunctionName=f"agentcore-digestor-lambda-core-{env}",
+            InvocationType="RequestResponse",
+            Payload=json.dumps(payload).encode("utf-8")
+        )
+        raw = json.loads(response["Payload"].read().decode("utf-8"))
+        if response.get("FunctionError"):
+            return {"status": "failed", "error": f"{response['FunctionError']}: {raw}"}
+        return json.loads(raw["body"])
+    except Exception as e:
+        return {"status": "failed", "error": str(e), "stack_trace": repr(e)}
+
+
+def ingest_table(batches, env):
+    """
+    Micro-batches of one table, one after the other: one Iceberg commit at
+    a time per table.
+    """
+    return [ingest_batch(batch, env) for batch in batches]
+
+
+# -------------------------------------------------------
+# Lambda handler (SQS event source, ReportBatchItemFailures)
+# -------------------------------------------------------
+def handler(event, context):
+    """
+    Event-driven ingestion: S3 object-created notifications on the upload
+    bucket, delivered through SQS.
+
+    The event source mapping buffers messages by count (batch_size) and
+    time (maximum_batching_window_in_seconds); here they are grouped per
+    <domain>_<dataset>, split by MICRO_BATCH_MAX_FILES/BYTES and each
+    micro-batch is ingested by lambda_core with one schema analysis and
+    one Iceberg commit per table. Tables are processed in parallel
+    (MAX_PARALLEL_BATCHES), the micro-batches of one table sequentially.
+
+    Messages whose files failed are returned as batchItemFailures, so SQS
+    redelivers only those (the load ledger makes the retry safe); files
+    that do not follow the naming convention are reported and dropped.
+    """
+    env = os.environ.get("ENV", "dev")
+
+    files = []
+    ignored = []
+    failures = set()
+
+    for sqs_record in event.get("Records", []):
+        message_id = sqs_record["messageId"]
+        try:
+            objects = s3_objects(sqs_record)
+        except Exception as e:
+            print(json.dumps({"message_id": message_id, "error": f"Invalid S3 event: {e}"}))
+            failures.add(message_id)
+            continue
+
+        for obj in objects:
+            filename = obj["key"].split("/")[-1]
+            domain, dataset, _ = extract_name_parts(filename)
+            if not domain or not dataset:
+                ignored.append(f"s3://{obj['bucket']}/{obj['key']}")
+                continue
+            files.append({
+                **obj,
+                "message_id": message_id,
+                "domain": domain,
+                "dataset": dataset,
+                "extension": filename.lower().split(".")[-1]
+            })
+
+    batches = micro_batches(files)
+
+    # stessa tabella (<domain>_<dataset>, qualunque formato) → stesso worker
+    per_table = {}
+    for batch in batches:
+        per_table.setdefault((batch["domain"], batch["dataset"]), []).append(batch)
+
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_BATCHES) as pool:
+        table_results = list(pool.map(lambda b: ingest_table(b, env), per_table.values()))
+
+    by_batch = {
+        id(batch): result
+        for table_batches, table_result in zip(per_table.values(), table_results)
+        for batch, result in zip(table_batches, table_result)
+    }
+    results = [by_batch[id(batch)] for batch in batches]
+
+    summary = []
+    for batch, result in zip(batches, results):
+        by_path = {f["file_s3_path"]: f for f in result.get("files", [])}
+        for f in batch["files"]:
+            status = by_path.get(f"s3://{f['bucket']}/{f['key']}", {}).get("status", "failed")
+            if status != "success":
+                failures.add(f["message_id"])
+
+        summary.append({
+            "table": f"{batch['domain']}_{batch['dataset']}",
+            "files": len(batch["files"]),
+            "status": result.get("status"),
+            "error": result.get("error"),
+            "summary": result.get("summary")
+        })
+
+    print(json.dumps({"micro_batches": summary, "ignored": ignored, "failed_messages": len(failures)}))
+
+    return {"batchItemFailures": [{"itemIdentifier": m} for m in sorted(failures)]}
@@ -0,0 +1,188 @@
+import hashlib
+import importlib
+import importlib.util
+import io
+import os
+import time
+import pandas as pd
+
+from digestor_common.aws import client
+from digestor_common.metrics import instrumented, current_metrics
+
+s3 = client("s3")
+
+# Sopra questa dimensione si usa la pipeline a step separati (lambda_core)
+FUSED_MAX_BYTES = int(os.environ.get("FUSED_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Moduli degli step: nell'immagine sono copiati in steps/<nome>.py,
+# nel repository sono tools_sources/<cartella>/main.py
+STEP_SOURCES = {
+    "detect_file_type": "detect_file_type",
+    "analyze_schema": "analyze_schema",
+    "validate_data": "validate_data",
+    "schema_normalizer": "schema_normalizer",
+    "load_into_iceberg": "load_data_into_iceberg_src",
+}
+
+
+def load_step(name):
+    try:
+        return importlib.import_module(f"steps.{name}")
+    except ModuleNotFoundError:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", STEP_SOURCES[name], "main.py")
+        spec = importlib.util.spec_from_file_location(f"steps.{name}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+
+detect_file_type = load_step("detect_file_type")
+analyze_schema = load_step("analyze_schema")
+validate_data = load_step("validate_data")
+schema_normalizer = load_step("schema_normalizer")
+load_into_iceberg = load_step("load_into_iceberg")
+
+
+def parse_s3_path(path: str):
+    path = path.replace("s3://", "")
+    bucket = path.split("/")[0]
+    key = "/".join(path.split("/")[1:])
+    return bucket, key
+
+
+@instrumented("fused_ingest")
+def handler(event, context):
+    """
+    Fused ingestion: detect → analyze → validate → normalize → load in one
+    process, with one S3 read of the source and one Parquet write.
+
+    The file is downloaded once and parsed once into a DataFrame shared by
+    validation and normalization (analyze re-reads only its first
+    `max_rows` rows from the in-memory bytes). The result has the same
+    per-step structure as lambda_core's result["steps"].
+
+    The normalized CSV is not written unless options.write_normalized is
+    set; its MD5 is still used as the load ledger key, so the ledger entry
+    is the same one the step-by-step pipeline would use for this input.
+    """
+    metrics = current_metrics()
+    steps = {}
+    timings = {}
+
+    def finish(status, error=None):
+        out = {"status": status, "steps": steps, "timings": timings}
+        if error:
+            out["error"] = error
+        return out
+
+    def timed(name, fn):
+        start = time.monotonic()
+        steps[name] = fn()
+        timings[name] = round((time.monotonic() - start) * 1000)
+        return steps[name]
+
+    try:
+        file_s3_path = event["file_s3_path"]
+        table_name = event["table_name"]
+        max_rows = event.get("max_rows", 50)
+        options = event.get("options", {})
+
+        bucket, key = parse_s3_path(file_s3_path)
+        filename = key.split("/")[-1]
+
+        # --------------------------------------------------
+        # Single read
+        # --------------------------------------------------
+        start = time.monotonic()
+        head = s3.head_object(Bucket=bucket, Key=key)
+        if head["ContentLength"] > FUSED_MAX_BYTES:
+            return finish("failed", f"File larger than FUSED_MAX_BYTES ({FUSED_MAX_BYTES})")
+
+        raw_bytes = s3.get_object(Bucket=bucket, Key=key, IfMatch=head["ETag"])["Body"].read()
+        timings["download"] = round((time.monotonic() - start) * 1000)
+        metrics.bytes_in += len(raw_bytes)
+
+        # --------------------------------------------------
+        # detect
+        # --------------------------------------------------
+        detected = timed("detect", lambda: detect_file_type.detect_from_bytes(filename, raw_bytes))
+        if detected.get("status") != "success" or detected.get("file_type") != "csv":
+            return finish("failed", "Fused ingestion supports comma-separated CSV only")
+
+        # --------------------------------------------------
+        # analyze (header rows only, from memory)
+        # --------------------------------------------------
+        schema_result = timed("schema", lambda: analyze_schema.analyze_bytes(raw_bytes, "csv", max_rows))
+        if schema_result.get("status") != "success":
+            return finish("failed")
+
+        # --------------------------------------------------
+        # Single full parse shared by validate + normalize
+        # --------------------------------------------------
+        start = time.monotonic()
+        df = pd.read_csv(io.BytesIO(raw_bytes))
+        timings["parse"] = round((time.monotonic() - start) * 1000)
+        metrics.rows = len(df)
+
+        validation = timed(
+            "validation",
+            lambda: validate_data.validate_df(df, schema_result["schema"], file_s3_path)
+        )
+        if validation.get("status") != "success":
+            return finish("failed")
+
+        # --------------------------------------------------
+        # normalize
+        # --------------------------------------------------
+        def normalize():
+            inferred_schema, normalized_df, removed_rows = schema_normalizer.normalize_df(df)
+            csv_bytes = schema_normalizer.normalized_csv_bytes(normalized_df)
+
+            normalized_path = None
+            if options.get("write_normalized"):
+                normalized_key = schema_normalizer.normalized_key_for(key)
+                s3.put_object(
+                    Bucket=schema_normalizer.NORMALIZED_BUCKET,
+                    Key=normalized_key,
+                    Body=csv_bytes
+                )
+                normalized_path = f"s3://{schema_normalizer.NORMALIZED_BUCKET}/{normalized_key}"
+
+            result = schema_normalizer.normalization_result(
+                inferred_schema, normalized_df, len(df), removed_rows, normalized_path
+            )
+            # ETag S3 di un put single-part = MD5 del contenuto
+            result["normalized_md5"] = hashlib.md5(csv_bytes).hexdigest()
+            return result, normalized_df
+
+        start = time.monotonic()
+        normalization, normalized_df = normalize()
+        steps["schema_normalizer"] = normalization
+        timings["schema_normalizer"] = round((time.monotonic() - start) * 1000)
+
+        # --------------------------------------------------
+        # load (ledger + single Parquet write)
+        # --------------------------------------------------
+        load_schema = [
+            {"name": name, "type": dtype}
+            for name, dtype in normalization["schema_normalized"].items()
+        ]
+
+        load_result = timed("load", lambda: load_into_iceberg.load_with_ledger(
+            table_name,
+            normalization["normalized_path"] or file_s3_path,
+            normalization["normalized_md5"],
+            load_schema,
+            normalization["column_stats"],
+            lambda: normalized_df.copy(),
+            lease_seconds=load_into_iceberg.ledger_lease_seconds(context)
+        ))
+        if load_result.get("status") != "success":
+            return finish("failed")
+
+        return finish("success")
+
+    except Exception as e:
+        out = finish("failed", str(e))
+        out["stack_trace"] = repr(e)
+        return out
@@ -1,104 +1,790 @@
-import boto3
+import datetime
+import hashlib
 import json
 import os
 import time
 import uuid
+from botocore.exceptions import ClientError
 
-athena = boto3.client("athena")
-glue = boto3.client("glue")
+from digestor_common.aws import client
+from digestor_common.athena import (
+    athena, run_query, start_query, wait_for_query, record_span, deadline_from_context
+)
+from digestor_common.metrics import instrumented
+from digestor_common.tracing import child_span
 
-def wait_for_athena(query_id):
-    while True:
-        resp = athena.get_query_execution(QueryExecutionId=query_id)
-        state = resp["QueryExecution"]["Status"]["State"]
+glue = client("glue")
+s3 = client("s3")
 
-        if state in ("SUCCEEDED", "FAILED", "CANCELLED"):
-            return resp
+SUPPORTED_MODES = {"append", "overwrite", "overwrite_partitions", "merge"}
 
-        time.sleep(1)
+# Tempo riservato a fine esecuzione per il drop della staging table
+CLEANUP_MARGIN_SECONDS = 15
 
-def handler(event, context):
+# Stesso prefisso del ledger di load_into_iceberg
+LEDGER_PREFIX = "_ledger"
+
+# Lease di un claim di commit senza query Athena registrata (tempo residuo
+# della Lambda + margine; valore fisso senza contesto Lambda)
+COMMIT_LEASE_SECONDS = int(os.environ.get("COMMIT_LEASE_SECONDS", "960"))
+COMMIT_LEASE_MARGIN_SECONDS = int(os.environ.get("COMMIT_LEASE_MARGIN_SECONDS", "30"))
+
+ATHENA_ACTIVE_STATES = {"QUEUED", "RUNNING"}
+
+PARQUET_SERDE = "org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe"
+
+# Posizione della riga nel file sorgente (scritta da load_into_iceberg):
+# dichiarata solo nella staging table, mai copiata nella tabella Iceberg
+SOURCE_ROW_COLUMN = "_source_row"
+
+
+def table_exists(db_name, table_name):
     try:
-        env = os.environ.get("ENV", "dev")
+        glue.get_table(DatabaseName=db_name, Name=table_name)
+        return True
+    except glue.exceptions.EntityNotFoundException:
+        return False
 
-        table_name = event["table_name"]      # final Iceberg table
-        schema     = event["schema"]          # list of {"name":..., "type":...}
 
-        db_name = f"agentcore_digestor_db_{env}"
+def applied_marker_key(table_name, load_id):
+    return f"{LEDGER_PREFIX}/{table_name}/{load_id}.applied.json"
 
-        # S3 dove sono già i Parquet scritti dalla lambda load_into_iceberg
-        bucket = f"agentcore-digestor-iceberg-bronze-{env}"
-        prefix = f"warehouse/{table_name}/data/"
 
-        # Nome tabella di staging
-        staging = f"{table_name}_staging_{uuid.uuid4().hex[:6]}"
+def load_id_of(path):
+    """
+    load_id of a Parquet file written by load_into_iceberg
+    (<load_id>_<uuid>.snappy.parquet).
+    """
+    return path.rsplit("/", 1)[-1].split("_", 1)[0]
 
-        # 1) STAGING TABLE esterna Parquet minima in Glue
-        glue_columns = [
-            {"Name": col["name"], "Type": col["type"]}
-            for col in schema
-        ]
 
-        glue.create_table(
-            DatabaseName=db_name,
-            TableInput={
-                "Name": staging,
-                "TableType": "EXTERNAL_TABLE",
-                "StorageDescriptor": {
-                    "Columns": glue_columns,
-                    "Location": f"s3://{bucket}/{prefix}",
-                    "InputFormat": "org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat",
-                    "OutputFormat": "org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat",
-                    "SerdeInfo": {
-                        "SerializationLibrary": "org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe"
-                    }
-                },
-                # NESSUN parametro “EXTERNAL=TRUE”, NESSUN “classification”
-                "Parameters": {}
+def commit_id(load_ids):
+    """
+    Id of a commit grouping several loads (batch ingestion): stable for the
+    same set of loads, whatever their order.
+    """
+    if len(load_ids) == 1:
+        return load_ids[0]
+    return hashlib.sha256("|".join(sorted(load_ids)).encode("utf-8")).hexdigest()[:32]
+
+
+def read_json_object(bucket, key):
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            return None
+        raise
+    return json.loads(obj["Body"].read().decode("utf-8"))
+
+
+# ------------------------------------------------------------
+# Applied markers: one per load, claimed before the DML
+#   pending  {"state": "pending", "commit_id", "lease_until", "query_id"?}
+#   applied  {"state": "applied", "result"}
+#   released {"state": "released"}   (DML failed: the load can be retried)
+# Markers written before the states existed hold the result directly.
+# ------------------------------------------------------------
+def read_marker(bucket, key):
+    """
+    (marker, etag) or (None, None).
+    """
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            return None, None
+        raise
+    return json.loads(obj["Body"].read().decode("utf-8")), obj["ETag"]
+
+
+def write_marker(bucket, key, marker, if_match=None):
+    """
+    Conditional write (create-only without if_match). Returns the new ETag,
+    or None if the condition failed.
+    """
+    conditions = {"IfMatch": if_match} if if_match else {"IfNoneMatch": "*"}
+    try:
+        resp = s3.put_object(
+            Bucket=bucket,
+            Key=key,
+            Body=json.dumps(marker).encode("utf-8"),
+            ContentType="application/json",
+            **conditions
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("PreconditionFailed", "ConditionalRequestConflict"):
+            return None
+        raise
+    return resp["ETag"]
+
+
+def commit_lease_seconds(context):
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return COMMIT_LEASE_SECONDS
+    return context.get_remaining_time_in_millis() / 1000 + COMMIT_LEASE_MARGIN_SECONDS
+
+
+def query_state(query_id):
+    return athena.get_query_execution(QueryExecutionId=query_id)["QueryExecution"]["Status"]["State"]
+
+
+def claim_loads(bucket, table_name, load_ids, lease_seconds):
+    """
+    Claims the applied marker of every load before the DML.
+
+    Returns (claims, applied, busy):
+    - claims  {load_id: (key, marker, etag)} taken by this invocation;
+    - applied {load_id: result} of loads already in the table;
+    - busy    load_ids being committed by another invocation.
+
+    A pending marker whose DML query SUCCEEDED is completed as applied; one
+    whose query failed, or whose lease expired before a query was
+    recorded, is taken over.
+    """
+    cid = commit_id(load_ids)
+    claims, applied, busy = {}, {}, []
+
+    for load_id in load_ids:
+        key = applied_marker_key(table_name, load_id)
+        marker, etag = read_marker(bucket, key)
+
+        if marker is not None and marker.get("state", "applied") == "applied":
+            applied[load_id] = marker.get("result", marker)
+            continue
+
+        if marker is not None and marker["state"] == "pending":
+            if marker.get("query_id"):
+                state = query_state(marker["query_id"])
+                if state in ATHENA_ACTIVE_STATES:
+                    busy.append(load_id)
+                    continue
+                if state == "SUCCEEDED":
+                    result = marker.get("result") or {"status": "success", "table_name": table_name}
+                    write_marker(bucket, key, {"state": "applied", "result": result}, if_match=etag)
+                    applied[load_id] = result
+                    continue
+            elif time.time() < marker["lease_until"]:
+                busy.append(load_id)
+                continue
+
+        claim = {
+            "state": "pending",
+            "load_id": load_id,
+            "commit_id": cid,
+            "claimed_at": time.time(),
+            "lease_until": time.time() + lease_seconds
+        }
+        new_etag = write_marker(bucket, key, claim, if_match=etag)
+        if new_etag is None:
+            busy.append(load_id)
+        else:
+            claims[load_id] = (key, claim, new_etag)
+
+    return claims, applied, busy
+
+
+def update_claims(bucket, claims, **fields):
+    """
+    Rewrites our claims with `fields` (IfMatch on their ETag); claims lost
+    in the meantime are dropped from `claims`.
+    """
+    for load_id, (key, marker, etag) in list(claims.items()):
+        marker = {**marker, **fields}
+        new_etag = write_marker(bucket, key, marker, if_match=etag)
+        if new_etag is None:
+            claims.pop(load_id)
+        else:
+            claims[load_id] = (key, marker, new_etag)
+
+
+def release_claims(bucket, claims):
+    for key, _, etag in claims.values():
+        try:
+            write_marker(bucket, key, {"state": "released"}, if_match=etag)
+        except Exception:
+            pass   # resta il lease
+
+
+def staging_storage(bucket, prefix, table_name, staging, files):
+    """
+    StorageDescriptor location/formats for the staging table.
+
+    With the list of files written by the current load the staging table is
+    a Symlink table over a manifest listing exactly those files, so Athena
+    reads only the new data. Without it the staging table covers the whole
+    warehouse/<table>/data/ prefix: only allowed when the table is created
+    (handler), never to add data to an existing table.
+
+    Returns (storage descriptor fields, manifest key or None).
+    """
+    if not files:
+        return {
+            "Location": f"s3://{bucket}/{prefix}",
+            "InputFormat": "org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat",
+            "OutputFormat": "org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat",
+            "SerdeInfo": {"SerializationLibrary": PARQUET_SERDE}
+        }, None
+
+    manifest_dir = f"warehouse/{table_name}/_staging/{staging}/"
+    manifest_key = f"{manifest_dir}symlink.txt"
+    s3.put_object(
+        Bucket=bucket,
+        Key=manifest_key,
+        Body="\n".join(files).encode("utf-8")
+    )
+
+    return {
+        "Location": f"s3://{bucket}/{manifest_dir}",
+        "InputFormat": "org.apache.hadoop.hive.ql.io.SymlinkTextInputFormat",
+        "OutputFormat": "org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat",
+        "SerdeInfo": {"SerializationLibrary": PARQUET_SERDE}
+    }, manifest_key
+
+
+# ------------------------------------------------------------
+# Glue column statistics (used by the Athena cost-based optimizer).
+# Min/max/null counts per data file are already written by Athena in the
+# Iceberg manifests; Glue holds the table-level view, NDV included.
+# ------------------------------------------------------------
+GLUE_STATS_BATCH = 25   # limite di update_column_statistics_for_table
+
+
+def read_load_column_stats(bucket, table_name, load_id):
+    """
+    column_stats stored in the load ledger entry written by load_into_iceberg.
+    """
+    entry = read_json_object(bucket, f"{LEDGER_PREFIX}/{table_name}/{load_id}.json")
+    if not entry or entry.get("state") != "committed":
+        return {}
+    return entry["result"].get("column_stats") or {}
+
+
+def read_load_files(bucket, table_name, load_ids):
+    """
+    files_written of the given loads, from their committed ledger entries
+    (None if any of them is missing or not committed).
+    """
+    files = []
+    for load_id in load_ids:
+        entry = read_json_object(bucket, f"{LEDGER_PREFIX}/{table_name}/{load_id}.json")
+        if not entry or entry.get("state") != "committed":
+            return None
+        files += entry["result"].get("files_written") or []
+    return files
+
+
+def to_glue_statistics(stats):
+    """
+    Our column_stats entry → Glue StatisticsData (None if not representable:
+    Glue has no timestamp statistics type).
+    """
+    dtype = stats.get("type")
+    nulls = stats.get("null_count", 0)
+    ndv = stats.get("distinct_count", 0)
+
+    if dtype == "int":
+        data = {"NumberOfNulls": nulls, "NumberOfDistinctValues": ndv}
+        if "min" in stats:
+            data["MinimumValue"] = int(stats["min"])
+            data["MaximumValue"] = int(stats["max"])
+        return {"Type": "LONG", "LongColumnStatisticsData": data}
+
+    if dtype == "float":
+        data = {"NumberOfNulls": nulls, "NumberOfDistinctValues": ndv}
+        if "min" in stats:
+            data["MinimumValue"] = float(stats["min"])
+            data["MaximumValue"] = float(stats["max"])
+        return {"Type": "DOUBLE", "DoubleColumnStatisticsData": data}
+
+    if dtype == "string":
+        return {
+            "Type": "STRING",
+            "StringColumnStatisticsData": {
+                "MaximumLength": stats.get("max_length", 0),
+                "AverageLength": stats.get("avg_length", 0.0),
+                "NumberOfNulls": nulls,
+                "NumberOfDistinctValues": ndv
             }
+        }
+
+    return None
+
+
+def merge_glue_statistics(old, new, additive, old_rows=None, new_rows=None):
+    """
+    Combines existing table statistics with those of the new data.
+
+    - additive (append: rows only added): null counts are summed and the
+      string AverageLength is the mean weighted by the non-null values of
+      the two sides (old_rows / new_rows; the old average is kept when
+      either is unknown);
+    - not additive (merge / overwrite_partitions: rows replaced): null
+      counts and AverageLength cannot be derived without rescanning the
+      table, so the stored values are kept.
+
+    NDV is not additive: the max of the two is kept (lower bound). Bounds
+    and MaximumLength are widened in both cases (replaced rows may leave
+    them wider than the data, never narrower).
+    """
+    if old["Type"] != new["Type"]:
+        return new
+
+    key = {
+        "LONG": "LongColumnStatisticsData",
+        "DOUBLE": "DoubleColumnStatisticsData",
+        "STRING": "StringColumnStatisticsData"
+    }[new["Type"]]
+    a, b = old[key], new[key]
+
+    merged = {
+        "NumberOfNulls": a["NumberOfNulls"] + b["NumberOfNulls"] if additive else a["NumberOfNulls"],
+        "NumberOfDistinctValues": max(a["NumberOfDistinctValues"], b["NumberOfDistinctValues"])
+    }
+    if new["Type"] == "STRING":
+        merged["MaximumLength"] = max(a["MaximumLength"], b["MaximumLength"])
+        merged["AverageLength"] = a["AverageLength"]
+        if additive and old_rows is not None and new_rows is not None:
+            old_values = max(old_rows - a["NumberOfNulls"], 0)
+            new_values = max(new_rows - b["NumberOfNulls"], 0)
+            if old_values + new_values:
+                merged["AverageLength"] = (
+                    a["AverageLength"] * old_values + b["AverageLength"] * new_values
+                ) / (old_values + new_values)
+    else:
+        for bound, pick in (("MinimumValue", min), ("MaximumValue", max)):
+            values = [x[bound] for x in (a, b) if bound in x]
+            if values:
+                merged[bound] = pick(values)
+
+    return {"Type": new["Type"], key: merged}
+
+
+def stats_row_count(column_stats):
+    """
+    Rows of the data described by column_stats (None for stats written
+    before row_count existed).
+    """
+    for stats in column_stats.values():
+        return stats.get("row_count")
+    return None
+
+
+def table_row_count(db_name, table_name, output_location, deadline=None):
+    """
+    Live rows of the Iceberg table from its latest snapshot summary
+    (metadata only, no data scan); None if not available.
+    """
+    query = f"""
+        SELECT CAST(element_at(summary, 'total-records') AS bigint)
+             - COALESCE(CAST(element_at(summary, 'total-position-deletes') AS bigint), 0) AS row_count
+        FROM {db_name}."{table_name}$snapshots"
+        ORDER BY committed_at DESC
+        LIMIT 1
+        """
+    q = run_query(query, output_location, deadline=deadline, fetch=True)
+    if q["state"] != "SUCCEEDED" or not q["rows"] or q["rows"][0].get("row_count") in (None, ""):
+        return None
+    return int(q["rows"][0]["row_count"])
+
+
+def update_glue_column_stats(db_name, table_name, schema, column_stats, replace,
+                             additive=True, old_rows=None):
+    """
+    Writes column statistics to Glue. With replace=False the new values are
+    combined with the ones already stored (see merge_glue_statistics;
+    old_rows = table rows before this data, for the weighted averages).
+    Returns the list of columns updated.
+    """
+    glue_types = {col["name"]: col["type"] for col in schema}
+
+    new_stats = {}
+    for col, stats in column_stats.items():
+        data = to_glue_statistics(stats)
+        if data and col in glue_types:
+            new_stats[col] = data
+
+    if not replace and new_stats:
+        new_rows = stats_row_count(column_stats)
+        cols = list(new_stats)
+        for i in range(0, len(cols), 100):
+            existing = glue.get_column_statistics_for_table(
+                DatabaseName=db_name, TableName=table_name, ColumnNames=cols[i:i + 100]
+            )
+            for item in existing.get("ColumnStatisticsList", []):
+                name = item["ColumnName"]
+                new_stats[name] = merge_glue_statistics(
+                    item["StatisticsData"], new_stats[name], additive, old_rows, new_rows
+                )
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    entries = [
+        {
+            "ColumnName": col,
+            "ColumnType": glue_types[col],
+            "AnalyzedTime": now,
+            "StatisticsData": data
+        }
+        for col, data in new_stats.items()
+    ]
+
+    for i in range(0, len(entries), GLUE_STATS_BATCH):
+        glue.update_column_statistics_for_table(
+            DatabaseName=db_name,
+            TableName=table_name,
+            ColumnStatisticsList=entries[i:i + GLUE_STATS_BATCH]
         )
 
-        # 2) CTAS per creare la Iceberg MANAGED (qui aggiungiamo is_external=false)
-        warehouse = f"s3://agentcore-digestor-iceberg-bronze-{env}/iceberg/{table_name}/"
+    return list(new_stats)
+
+
+def quote(col):
+    return '"' + col.replace('"', '""') + '"'
 
-        query = f"""
-        CREATE TABLE {db_name}.{table_name}
+
+# ------------------------------------------------------------
+# SQL builders (one list of statements per write mode)
+# ------------------------------------------------------------
+def build_ctas(target, staging, warehouse, partition_columns, columns):
+    cols = ", ".join(quote(c) for c in columns)
+    partitioning = ""
+    if partition_columns:
+        partition_list = ", ".join(f"'{c}'" for c in partition_columns)
+        partitioning = f",\n            partitioning=ARRAY[{partition_list}]"
+
+    return f"""
+        CREATE TABLE {target}
         WITH (
             table_type='ICEBERG',
             format='PARQUET',
             is_external=false,
-            location='{warehouse}'
+            location='{warehouse}'{partitioning}
         ) AS
-        SELECT * FROM {db_name}.{staging};
+        SELECT {cols} FROM {staging};
         """
 
-        output_bucket = f"s3://agentcore-digestor-athena-results-{env}/results/"
 
-        q = athena.start_query_execution(
-            QueryString=query,
-            WorkGroup="primary",
-            ResultConfiguration={"OutputLocation": output_bucket}
+def build_insert(target, staging, columns):
+    cols = ", ".join(quote(c) for c in columns)
+    return f"INSERT INTO {target} ({cols}) SELECT {cols} FROM {staging}"
+
+
+def build_replace(target, staging, columns, partition_columns=()):
+    """
+    Overwrite (whole table, or only the partitions present in the new data
+    with partition_columns) as ONE MERGE, so a single Iceberg snapshot
+    replaces the old rows with the new ones: readers never see the table
+    empty and a failure leaves it untouched.
+
+    The source is the new rows (_op = 1, never matching → INSERT) plus
+    delete rows (_op = 0): one row matching every target row, or one per
+    distinct partition of the new data (→ DELETE). Delete rows that match
+    nothing (empty table, new partition) are not inserted.
+    """
+    cols = ", ".join(quote(c) for c in columns)
+    values = ", ".join(f"s.{quote(c)}" for c in columns)
+
+    if partition_columns:
+        delete_cols = ", ".join(
+            quote(c) if c in partition_columns else f"NULL AS {quote(c)}" for c in columns
         )
+        delete_rows = f"SELECT DISTINCT {delete_cols}, 0 AS _op FROM {staging}"
+        on = " AND ".join(
+            f"t.{quote(c)} IS NOT DISTINCT FROM s.{quote(c)}" for c in partition_columns
+        )
+        on = f"s._op = 0 AND {on}"
+    else:
+        delete_cols = ", ".join(f"NULL AS {quote(c)}" for c in columns)
+        delete_rows = f"SELECT {delete_cols}, 0 AS _op"
+        on = "s._op = 0"
+
+    return f"""
+        MERGE INTO {target} t
+        USING (
+            SELECT {cols}, 1 AS _op FROM {staging}
+            UNION ALL
+            {delete_rows}
+        ) s
+        ON ({on})
+        WHEN MATCHED THEN DELETE
+        WHEN NOT MATCHED AND s._op = 1 THEN INSERT ({cols}) VALUES ({values})
+        """
+
+
+def build_merge(target, staging, columns, key_columns, files):
+    """
+    Upsert on key_columns. The staging rows are deduplicated on the key so
+    that MERGE never sees two source rows for the same target row.
+
+    The LAST row of the input wins, as in the local engine: the latest file
+    in `files` order, then the highest SOURCE_ROW_COLUMN (row position in
+    its file). Files without the column (written before it existed) rank
+    their rows as NULL, i.e. first.
+    """
+    keys = ", ".join(quote(c) for c in key_columns)
+    file_rank = " ".join(
+        "WHEN '{}' THEN {}".format(f.replace("'", "''"), i) for i, f in enumerate(files)
+    )
+    order = f'CASE "$path" {file_rank} END DESC NULLS LAST, {quote(SOURCE_ROW_COLUMN)} DESC NULLS LAST'
+    on = " AND ".join(f"t.{quote(c)} = s.{quote(c)}" for c in key_columns)
+    updates = ", ".join(f"{quote(c)} = s.{quote(c)}" for c in columns if c not in key_columns)
+    cols = ", ".join(quote(c) for c in columns)
+    values = ", ".join(f"s.{quote(c)}" for c in columns)
+
+    when_matched = f"WHEN MATCHED THEN UPDATE SET {updates}" if updates else ""
+
+    return f"""
+        MERGE INTO {target} t
+        USING (
+            SELECT * FROM (
+                SELECT *, row_number() OVER (PARTITION BY {keys} ORDER BY {order}) AS _rn
+                FROM {staging}
+            ) WHERE _rn = 1
+        ) s
+        ON ({on})
+        {when_matched}
+        WHEN NOT MATCHED THEN INSERT ({cols}) VALUES ({values})
+        """
+
+
+def apply_commit(db_name, table_name, schema, mode, key_columns, partition_columns,
+                 files, exists, env, context, bucket, claims):
+    """
+    Stages `files` in a temporary Glue table and applies them to the
+    Iceberg table with the statement of `mode` (CTAS when the table does
+    not exist yet). The query id is recorded in the claims before waiting.
+    """
+    prefix = f"warehouse/{table_name}/data/"
+    target = f"{db_name}.{table_name}"
+    columns = [col["name"] for col in schema]
+
+    # Nome tabella di staging
+    staging = f"{table_name}_staging_{uuid.uuid4().hex[:6]}"
+    staging_ref = f"{db_name}.{staging}"
+
+    # 1) STAGING TABLE esterna Parquet minima in Glue
+    #    (limitata ai file di questo load quando disponibili)
+    glue_columns = [
+        {"Name": col["name"], "Type": col["type"]}
+        for col in schema
+    ] + [{"Name": SOURCE_ROW_COLUMN, "Type": "bigint"}]
+
+    storage, manifest_key = staging_storage(bucket, prefix, table_name, staging, files)
+
+    glue.create_table(
+        DatabaseName=db_name,
+        TableInput={
+            "Name": staging,
+            "TableType": "EXTERNAL_TABLE",
+            "StorageDescriptor": {"Columns": glue_columns, **storage},
+            # NESSUN parametro “EXTERNAL=TRUE”, NESSUN “classification”
+            "Parameters": {}
+        }
+    )
+
+    output_bucket = f"s3://agentcore-digestor-athena-results-{env}/results/"
+
+    deadline = deadline_from_context(context, CLEANUP_MARGIN_SECONDS)
+    executed = []
+
+    try:
+        # 2) Statement per il mode richiesto.
+        #    Tabella non ancora esistente → CTAS (Iceberg MANAGED, is_external=false)
+        #    qualunque sia il mode; poi solo INSERT/DELETE/MERGE sui nuovi file.
+        warehouse = f"s3://agentcore-digestor-iceberg-bronze-{env}/iceberg/{table_name}/"
 
-        result = wait_for_athena(q["QueryExecutionId"])
-        state = result["QueryExecution"]["Status"]["State"]
+        if not exists:
+            applied_mode = "create"
+            queries = [build_ctas(target, staging_ref, warehouse, partition_columns, columns)]
+        elif mode == "append":
+            applied_mode = mode
+            queries = [build_insert(target, staging_ref, columns)]
+        elif mode == "overwrite":
+            applied_mode = mode
+            queries = [build_replace(target, staging_ref, columns)]
+        elif mode == "overwrite_partitions":
+            applied_mode = mode
+            queries = [build_replace(target, staging_ref, columns, partition_columns)]
+        else:
+            applied_mode = mode
+            queries = [build_merge(target, staging_ref, columns, key_columns, files)]
 
-        # 3) Drop della staging table comunque
+        for query in queries:
+            with child_span("athena.query", {"db.statement": query[:1000]}) as span:
+                query_id = start_query(query, output_bucket)
+                # Un retry che trova il claim "pending" guarda lo stato
+                # di questa query invece di rieseguire il DML
+                update_claims(bucket, claims, query_id=query_id)
+                q = wait_for_query(query_id, deadline=deadline)
+                record_span(span, q)
+            executed.append({k: q[k] for k in ("query_id", "state", "stats")})
+            if q["state"] != "SUCCEEDED":
+                return {
+                    "status": "failed",
+                    "error": f"Iceberg {applied_mode} operation failed",
+                    "athena_state": q["state"],
+                    "athena_reason": q["state_reason"],
+                    "timed_out": q["timed_out"],
+                    "query": query,
+                    "queries": executed
+                }
+    finally:
+        # 3) Drop della staging table (e del manifest) comunque
         glue.delete_table(DatabaseName=db_name, Name=staging)
+        if manifest_key:
+            s3.delete_object(Bucket=bucket, Key=manifest_key)
+
+    return {
+        "status": "success",
+        "message": f"Managed Iceberg table updated ({applied_mode})",
+        "table_name": table_name,
+        "mode": applied_mode,
+        "files_applied": len(files) if files else None,
+        "queries": executed
+    }
+
+
+@instrumented("iceberg_ctas")
+def handler(event, context):
+    try:
+        env = os.environ.get("ENV", "dev")
+
+        table_name        = event["table_name"]             # final Iceberg table
+        schema            = event["schema"]                 # list of {"name":..., "type":...}
+        mode              = event.get("mode", "append")
+        key_columns       = event.get("key_columns") or []
+        partition_columns = event.get("partition_columns") or []
+        files             = event.get("files") or []        # Parquet scritti da QUESTO load
+        load_id           = event.get("load_id")            # dal ledger di load_into_iceberg
+        load_ids          = event.get("load_ids") or []     # più load in un solo commit (batch)
+        column_stats      = event.get("column_stats")       # min/max/null/NDV per colonna
 
-        if state != "SUCCEEDED":
+        if load_id and not load_ids:
+            load_ids = [load_id]
+
+        if mode not in SUPPORTED_MODES:
             return {
                 "status": "failed",
-                "error": "CTAS operation failed",
-                "athena_state": state,
-                "query": query
+                "error": f"Unsupported mode: {mode} (expected one of {sorted(SUPPORTED_MODES)})"
             }
 
-        return {
-            "status": "success",
-            "message": "Managed Iceberg table successfully created via CTAS",
-            "table_name": table_name
-        }
+        if mode == "merge" and not key_columns:
+            return {"status": "failed", "error": "Mode 'merge' requires 'key_columns'"}
+
+        if mode == "overwrite_partitions" and not partition_columns:
+            return {"status": "failed", "error": "Mode 'overwrite_partitions' requires 'partition_columns'"}
+
+        columns = [col["name"] for col in schema]
+        unknown = [c for c in key_columns + partition_columns if c not in columns]
+        if unknown:
+            return {"status": "failed", "error": f"Columns not in schema: {unknown}"}
+
+        db_name = f"agentcore_digestor_db_{env}"
+
+        # S3 dove sono già i Parquet scritti dalla lambda load_into_iceberg
+        bucket = f"agentcore-digestor-iceberg-bronze-{env}"
+
+        # Claim dei load prima del DML: quelli già applicati alla tabella
+        # (retry, o load già committato da solo e ora in un batch) escono
+        # dal commit insieme ai loro file
+        claims, already_applied, busy = claim_loads(
+            bucket, table_name, load_ids, commit_lease_seconds(context)
+        )
+        if busy:
+            release_claims(bucket, claims)
+            return {
+                "status": "failed",
+                "error": f"Loads {busy} are being committed to {table_name} by another invocation",
+                "retryable": True
+            }
+
+        if load_ids and not claims:
+            if len(load_ids) == 1:
+                return {**already_applied[load_ids[0]], "deduplicated": True}
+            return {
+                "status": "success",
+                "message": "All loads already applied",
+                "table_name": table_name,
+                "loads_skipped": sorted(already_applied),
+                "deduplicated": True
+            }
+
+        try:
+            load_ids = [lid for lid in load_ids if lid not in already_applied]
+            files = [f for f in files if load_id_of(f) not in already_applied]
+
+            # Su una tabella esistente la staging sull'intero prefisso data/
+            # rileggerebbe tutti i load precedenti (righe duplicate)
+            exists = table_exists(db_name, table_name)
+            if exists and not files and load_ids:
+                files = read_load_files(bucket, table_name, load_ids) or []
+            if exists and not files:
+                release_claims(bucket, claims)
+                return {
+                    "status": "failed",
+                    "error": (
+                        f"Table {table_name} exists: 'files' (files_written of the load) "
+                        f"or the load_id of a committed load is required for mode '{mode}'"
+                    )
+                }
+
+            result = apply_commit(
+                db_name, table_name, schema, mode, key_columns, partition_columns,
+                files, exists, env, context, bucket, claims
+            )
+        except Exception:
+            release_claims(bucket, claims)
+            raise
+
+        if result["status"] != "success":
+            release_claims(bucket, claims)
+            return result
+
+        # Marker "applied" subito dopo il commit Iceberg, prima delle statistiche
+        update_claims(bucket, claims, state="applied", result=result)
+
+        if already_applied:
+            result["loads_skipped"] = sorted(already_applied)
+        output_bucket = f"s3://agentcore-digestor-athena-results-{env}/results/"
+        deadline = deadline_from_context(context, CLEANUP_MARGIN_SECONDS)
+        applied_mode = result["mode"]
+
+        # 4) Statistiche di colonna in Glue (niente ANALYZE separato).
+        #    Un errore qui non invalida il load già committato.
+        if column_stats is not None and not already_applied:
+            stats_per_load = [column_stats]
+        else:
+            stats_per_load = [read_load_column_stats(bucket, table_name, lid) for lid in load_ids]
+
+        replace = applied_mode in ("create", "overwrite")
+        # merge / overwrite_partitions sostituiscono righe: nulli e medie non
+        # si sommano. I load successivi di un create/overwrite invece sì.
+        additive = applied_mode in ("create", "overwrite", "append")
+        updated = []
+        try:
+            # righe della tabella prima di questo commit (medie pesate)
+            old_rows = 0 if replace else None
+            if applied_mode == "append":
+                committed_rows = [stats_row_count(stats or {}) for stats in stats_per_load]
+                if None not in committed_rows:
+                    total_rows = table_row_count(db_name, table_name, output_bucket, deadline)
+                    if total_rows is not None:
+                        old_rows = total_rows - sum(committed_rows)
+
+            for stats in stats_per_load:
+                if stats:
+                    updated += update_glue_column_stats(
+                        db_name, table_name, schema, stats, replace, additive, old_rows
+                    )
+                    replace = False   # i load successivi si sommano al primo
+                    new_rows = stats_row_count(stats)
+                    old_rows = old_rows + new_rows if old_rows is not None and new_rows is not None else None
+            if updated:
+                result["column_stats_updated"] = sorted(set(updated))
+        except Exception as e:
+            result["column_stats_error"] = str(e)
+
+        return {**result, "deduplicated": False}
 
     except Exception as e:
         return {
@@ -0,0 +1,341 @@
+import math
+import os
+import re
+import datetime
+
+from digestor_common.aws import client
+from digestor_common.athena import run_query, run_queries, deadline_from_context
+from digestor_common.metrics import instrumented
+
+s3 = client("s3")
+
+ALL_ACTIONS = ["compact", "rewrite_manifests", "expire_snapshots", "remove_orphans"]
+
+SMALL_FILE_THRESHOLD_MB = int(os.environ.get("SMALL_FILE_THRESHOLD_MB", "64"))
+SNAPSHOT_RETENTION_HOURS = int(os.environ.get("SNAPSHOT_RETENTION_HOURS", "168"))
+MIN_SNAPSHOTS_TO_KEEP = int(os.environ.get("MIN_SNAPSHOTS_TO_KEEP", "1"))
+
+# Margine per restituire il report prima del timeout della Lambda
+CLEANUP_MARGIN_SECONDS = 15
+
+# Operatori ammessi nei predicati strutturati di "where"
+WHERE_OPERATORS = {"eq": "=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+# ------------------------------------------------------------
+# OPTIMIZE predicate (built from structured partition predicates,
+# never from raw SQL)
+# ------------------------------------------------------------
+def sql_literal(value):
+    if isinstance(value, bool) or value is None:
+        raise ValueError(f"Unsupported value in 'where': {value!r}")
+    if isinstance(value, int) or (isinstance(value, float) and math.isfinite(value)):
+        return repr(value)
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    raise ValueError(f"Unsupported value in 'where': {value!r}")
+
+
+def build_where(where, qualifier=""):
+    """
+    SQL predicate from {column: value | [values] | {"gte": v, "lt": v, ...}}:
+
+        {"region": "EU", "order_date": {"gte": "2024-01-01", "lt": "2024-02-01"}}
+        → "region" = 'EU' AND "order_date" >= '2024-01-01' AND "order_date" < '2024-02-01'
+
+    `qualifier` is prepended to every column (e.g. "partition." for the
+    partition row of the $files metadata table).
+
+    Columns must be plain identifiers, values strings or numbers; anything
+    else raises ValueError.
+    """
+    if not isinstance(where, dict) or not where:
+        raise ValueError("'where' must be a non-empty object {column: value | [values] | {op: value}}")
+
+    terms = []
+    for column, condition in where.items():
+        if not IDENTIFIER.match(column):
+            raise ValueError(f"Invalid column in 'where': {column!r}")
+        col = f'{qualifier}"{column}"'
+
+        if isinstance(condition, list):
+            if not condition:
+                raise ValueError(f"Empty value list for {column!r} in 'where'")
+            terms.append(f"{col} IN ({', '.join(sql_literal(v) for v in condition)})")
+        elif isinstance(condition, dict):
+            unknown = [op for op in condition if op not in WHERE_OPERATORS]
+            if unknown or not condition:
+                raise ValueError(f"Unsupported operators for {column!r} in 'where': {unknown}")
+            terms += [f"{col} {WHERE_OPERATORS[op]} {sql_literal(v)}" for op, v in condition.items()]
+        else:
+            terms.append(f"{col} = {sql_literal(condition)}")
+
+    return " AND ".join(terms)
+
+
+# ------------------------------------------------------------
+# Dry-run report (always computed, also before a real run).
+# Each report is one metadata-table query; they run concurrently.
+# ------------------------------------------------------------
+def small_files_query(db_name, table_name, threshold_bytes, where_sql=None):
+    """
+    Small data files per partition: candidates for bin-packing, restricted
+    to the partitions selected by `where_sql` (see build_where, qualified
+    with "partition.") as OPTIMIZE is.
+    """
+    partition_filter = f" AND {where_sql}" if where_sql else ""
+    return f"""
+        SELECT CAST(partition AS varchar) AS partition,
+               count(*) AS files,
+               sum(file_size_in_bytes) AS bytes
+        FROM "{db_name}"."{table_name}$files"
+        WHERE content = 0 AND file_size_in_bytes < {threshold_bytes}{partition_filter}
+        GROUP BY CAST(partition AS varchar)
+        HAVING count(*) > 1
+        """
+
+
+def manifests_query(db_name, table_name):
+    return f"""
+        SELECT count(*) AS manifests, coalesce(sum(length), 0) AS bytes
+        FROM "{db_name}"."{table_name}$manifests"
+        """
+
+
+def snapshots_query(db_name, table_name, retention_hours, min_to_keep):
+    """
+    Snapshots older than the retention window, excluding the newest
+    `min_to_keep` ones (which VACUUM never expires), and all snapshots.
+    """
+    return f"""
+        SELECT count_if(rn > {min_to_keep}
+                        AND committed_at < current_timestamp - INTERVAL '{retention_hours}' HOUR) AS snapshots,
+               count(*) AS total
+        FROM (
+            SELECT committed_at,
+                   row_number() OVER (ORDER BY committed_at DESC) AS rn
+            FROM "{db_name}"."{table_name}$snapshots"
+        )
+        """
+
+
+def referenced_files_query(db_name, table_name):
+    return f"""
+        SELECT file_path FROM "{db_name}"."{table_name}$files"
+        """
+
+
+def report_small_files(q):
+    partitions = [
+        {"partition": r["partition"], "files": int(r["files"]), "bytes": int(r["bytes"])}
+        for r in q["rows"]
+    ]
+    return {
+        "query_state": q["state"],
+        "partitions": partitions,
+        "files": sum(p["files"] for p in partitions),
+        "bytes": sum(p["bytes"] for p in partitions)
+    }
+
+
+def report_manifests(q):
+    row = q["rows"][0] if q["rows"] else {"manifests": 0, "bytes": 0}
+    return {"query_state": q["state"], "files": int(row["manifests"]), "bytes": int(row["bytes"])}
+
+
+def report_snapshots(q):
+    row = q["rows"][0] if q["rows"] else {"snapshots": 0, "total": 0}
+    return {"query_state": q["state"], "snapshots": int(row["snapshots"])}
+
+
+def retained_snapshots(q):
+    """
+    Snapshots left after expiry, or None if unknown.
+    """
+    if q["state"] != "SUCCEEDED" or not q["rows"]:
+        return None
+    return int(q["rows"][0]["total"]) - int(q["rows"][0]["snapshots"])
+
+
+def report_orphans(q, bucket, prefix, retention_hours, retained=None):
+    """
+    Data files under the table location that the CURRENT snapshot does not
+    reference and that are older than the retention window.
+
+    Athena exposes the files of the current snapshot only ($files): files
+    still referenced by older, retained snapshots are counted too, so the
+    figure is an upper bound of what VACUUM reclaims ("exact" only when a
+    single snapshot is retained after expiry).
+    """
+    scope = "not_in_current_snapshot"
+    if q["state"] != "SUCCEEDED":
+        # senza la lista dei file referenziati ogni file sembrerebbe orfano
+        return {"query_state": q["state"], "scope": scope, "files": 0, "bytes": 0, "exact": False}
+    referenced = {r["file_path"] for r in q["rows"]}
+
+    cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=retention_hours)
+
+    files = 0
+    total_bytes = 0
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=f"{prefix}data/"):
+        for obj in page.get("Contents", []):
+            path = f"s3://{bucket}/{obj['Key']}"
+            if path not in referenced and obj["LastModified"] < cutoff:
+                files += 1
+                total_bytes += obj["Size"]
+
+    return {
+        "query_state": q["state"],
+        "scope": scope,
+        "files": files,
+        "bytes": total_bytes,
+        "exact": retained == 1
+    }
+
+
+# ------------------------------------------------------------
+# Lambda handler
+# ------------------------------------------------------------
+@instrumented("iceberg_maintenance")
+def handler(event, context):
+    """
+    Iceberg table maintenance, on demand or from a schedule.
+
+    Event:
+        table_name                (str, required)
+        dry_run                   (bool, default True)
+        actions                   (list, default all of ALL_ACTIONS)
+        where                     (dict, optional partition predicates restricting
+                                   OPTIMIZE, see build_where)
+        small_file_threshold_mb   (int)
+        snapshot_retention_hours  (int)
+        min_snapshots_to_keep     (int)
+    """
+    try:
+        env = os.environ.get("ENV", "dev")
+
+        table_name = event["table_name"]
+        dry_run = event.get("dry_run", True)
+        actions = event.get("actions") or ALL_ACTIONS
+        where = event.get("where")
+        threshold_mb = int(event.get("small_file_threshold_mb", SMALL_FILE_THRESHOLD_MB))
+        retention_hours = int(event.get("snapshot_retention_hours", SNAPSHOT_RETENTION_HOURS))
+        min_to_keep = int(event.get("min_snapshots_to_keep", MIN_SNAPSHOTS_TO_KEEP))
+
+        unknown = [a for a in actions if a not in ALL_ACTIONS]
+        if unknown:
+            return {"status": "failed", "error": f"Unsupported actions: {unknown}"}
+
+        try:
+            where_sql = build_where(where) if where is not None else None
+        except ValueError as e:
+            return {"status": "failed", "error": str(e)}
+
+        db_name = f"agentcore_digestor_db_{env}"
+        target = f"{db_name}.{table_name}"
+        bucket = f"agentcore-digestor-iceberg-bronze-{env}"
+        prefix = f"iceberg/{table_name}/"
+        output_bucket = f"s3://agentcore-digestor-athena-results-{env}/results/"
+
+        deadline = deadline_from_context(context, CLEANUP_MARGIN_SECONDS)
+
+        # --------------------------------------------------
+        # 1) Report
+        # --------------------------------------------------
+        report_queries = {}
+        if "compact" in actions:
+            report_queries["compact"] = small_files_query(
+                db_name, table_name, threshold_mb * 1024 * 1024,
+                build_where(where, "partition.") if where is not None else None
+            )
+        if "rewrite_manifests" in actions:
+            report_queries["rewrite_manifests"] = manifests_query(db_name, table_name)
+        if "expire_snapshots" in actions or "remove_orphans" in actions:
+            report_queries["expire_snapshots"] = snapshots_query(db_name, table_name, retention_hours, min_to_keep)
+        if "remove_orphans" in actions:
+            report_queries["remove_orphans"] = referenced_files_query(db_name, table_name)
+
+        results = dict(zip(
+            report_queries,
+            run_queries(list(report_queries.values()), output_bucket, deadline=deadline, fetch=True)
+        ))
+
+        report = {}
+        if "compact" in results:
+            report["compact"] = report_small_files(results["compact"])
+        if "rewrite_manifests" in results:
+            report["rewrite_manifests"] = report_manifests(results["rewrite_manifests"])
+        if "expire_snapshots" in actions:
+            report["expire_snapshots"] = report_snapshots(results["expire_snapshots"])
+        if "remove_orphans" in results:
+            report["remove_orphans"] = report_orphans(
+                results["remove_orphans"], bucket, prefix, retention_hours,
+                retained_snapshots(results["expire_snapshots"])
+            )
+
+        if dry_run:
+            return {
+                "status": "success",
+                "table_name": table_name,
+                "dry_run": True,
+                "report": report
+            }
+
+        # --------------------------------------------------
+        # 2) Execute
+        #    - OPTIMIZE bin-packs small files inside each partition and
+        #      writes new, consolidated manifests for the rewritten files
+        #      (Athena has no standalone manifest rewrite).
+        #    - VACUUM expires snapshots and removes orphan files, both
+        #      governed by the vacuum_* table properties set just before.
+        # --------------------------------------------------
+        statements = []
+        if "compact" in actions or "rewrite_manifests" in actions:
+            optimize = f"OPTIMIZE {target} REWRITE DATA USING BIN_PACK"
+            if where_sql:
+                optimize += f" WHERE {where_sql}"
+            statements.append(optimize)
+
+        if "expire_snapshots" in actions or "remove_orphans" in actions:
+            statements.append(f"""
+                ALTER TABLE {target} SET TBLPROPERTIES (
+                    'vacuum_max_snapshot_age_seconds'='{retention_hours * 3600}',
+                    'vacuum_min_snapshots_to_keep'='{min_to_keep}'
+                )
+                """)
+            statements.append(f"VACUUM {target}")
+
+        executed = []
+        for statement in statements:
+            q = run_query(statement, output_bucket, deadline=deadline)
+            executed.append({
+                "query": " ".join(statement.split()),
+                "athena_state": q["state"],
+                "timed_out": q["timed_out"],
+                "stats": q["stats"]
+            })
+            if q["state"] != "SUCCEEDED":
+                return {
+                    "status": "failed",
+                    "error": "Iceberg maintenance statement failed",
+                    "table_name": table_name,
+                    "report": report,
+                    "executed": executed
+                }
+
+        return {
+            "status": "success",
+            "table_name": table_name,
+            "dry_run": False,
+            "report": report,
+            "executed": executed
+        }
+
+    except Exception as e:
+        return {
+            "status": "failed",
+            "error": str(e),
+            "stack_trace": repr(e)
+        }
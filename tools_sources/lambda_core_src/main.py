@@ -1,186 +1,648 @@
 import json
-import boto3
 import datetime
+import fnmatch
 import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
-lambda_client = boto3.client("lambda")
+from digestor_common.aws import client
+from run_state import run_store_from_env, new_run_record, completed_steps
+
+lambda_client = client("lambda")
+s3 = client("s3")
 
 AGENT_VERSION = "1.0"
 
+# Il load è idempotente (ledger), quindi può essere ritentato senza duplicati
+LOAD_MAX_RETRIES = int(os.environ.get("LOAD_MAX_RETRIES", "4"))
+RETRY_BASE_DELAY = float(os.environ.get("RETRY_BASE_DELAY", "0.5"))
+
+# Step indipendenti eseguiti in parallelo (thread: il lavoro è I/O sulle Lambda)
+MAX_PARALLEL_STEPS = int(os.environ.get("MAX_PARALLEL_STEPS", "4"))
+
+# File elaborati in parallelo da una richiesta batch
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", "8"))
+
+# File CSV fino a questa dimensione → fused_ingest (un solo processo,
+# una lettura e una scrittura) invece dei cinque Lambda separati
+FUSED_MAX_BYTES = int(os.environ.get("FUSED_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Ordine di presentazione degli step nel risultato
+STEP_ORDER = ["raw_archive", "schema", "validation", "schema_normalizer", "load", "iceberg_ctas"]
+
+# Tipi del normalizer → tipi Glue (come il tool create_iceberg_table)
+GLUE_TYPE_MAP = {
+    "int": "int",
+    "float": "double",
+    "string": "string",
+    "datetime": "timestamp"
+}
+
 
 # ------------------------------------------------------------
 # Helper: invoke a lambda tool synchronously
 # ------------------------------------------------------------
-def invoke_tool(function_name, payload):
-    try:
-        response = lambda_client.invoke(
-            FunctionName=function_name,
-            InvocationType="RequestResponse",
-            Payload=json.dumps(payload).encode("utf-8")
-        )
+def invoke_tool(function_name, payload, retries=0):
+    """
+    Invokes a tool Lambda and returns its JSON result.
+    With retries > 0 the call is repeated (exponential backoff) on transport
+    errors, Lambda function errors and results flagged as "retryable": only
+    use it for idempotent tools.
+    """
+    attempt = 0
+    while True:
+        try:
+            response = lambda_client.invoke(
+                FunctionName=function_name,
+                InvocationType="RequestResponse",
+                Payload=json.dumps(payload).encode("utf-8")
+            )
+
+            raw = response["Payload"].read().decode("utf-8")
+            result = json.loads(raw)
+
+            if response.get("FunctionError"):
+                result = {
+                    "status": "failed",
+                    "error": f"{response['FunctionError']}: {result}",
+                    "retryable": True
+                }
+
+        except Exception as e:
+            result = {
+                "status": "failed",
+                "error": str(e),
+                "stack_trace": repr(e),
+                "retryable": True
+            }
+
+        if result.get("status") == "success" or not result.get("retryable") or attempt >= retries:
+            if attempt:
+                result["attempts"] = attempt + 1
+            return result
+
+        time.sleep(RETRY_BASE_DELAY * (2 ** attempt))
+        attempt += 1
 
-        raw = response["Payload"].read().decode("utf-8")
-        return json.loads(raw)
 
-    except Exception as e:
-        return {
-            "status": "failed",
-            "error": str(e),
-            "stack_trace": repr(e)
-        }
+# ------------------------------------------------------------
+# DAG executor: runs every step whose dependencies succeeded,
+# independent steps concurrently. Stops scheduling new steps at the
+# first failure (steps already running are awaited).
+# ------------------------------------------------------------
+def run_dag(steps, max_workers=MAX_PARALLEL_STEPS, completed=None, on_step=None):
+    """
+    steps: {name: {"deps": [names], "run": callable(outputs) -> dict}}
+    `run` receives the outputs of the completed steps (all its deps are there).
+
+    completed: outputs of steps already done (resumed run); they are not
+    re-run and count as satisfied dependencies.
+    on_step: callable(name, output), called as each step completes (from
+    the scheduling thread, never concurrently).
+
+    Returns (outputs, timings, skipped).
+    """
+    outputs = dict(completed or {})
+    timings = {}
+    pending = {name: step for name, step in steps.items() if name not in outputs}
+    running = {}
+    failed = False
+    t0 = time.monotonic()
+
+    def timed(name, run):
+        start = time.monotonic()
+        try:
+            output = run(outputs)
+        except Exception as e:
+            output = {"status": "failed", "error": str(e), "stack_trace": repr(e)}
+        return name, output, start, time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            if not failed:
+                for name, step in list(pending.items()):
+                    if all(d in outputs for d in step["deps"]):
+                        running[pool.submit(timed, name, step["run"])] = name
+                        del pending[name]
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                del running[future]
+                name, output, start, end = future.result()
+                outputs[name] = output
+                timings[name] = {
+                    "started_ms": round((start - t0) * 1000),
+                    "duration_ms": round((end - start) * 1000)
+                }
+                if on_step:
+                    on_step(name, output)
+                if output.get("status") != "success":
+                    failed = True
+
+    return outputs, timings, list(pending)
+
+
+def source_size(file_s3_path):
+    path = file_s3_path.replace("s3://", "")
+    head = s3.head_object(Bucket=path.split("/")[0], Key="/".join(path.split("/")[1:]))
+    return head["ContentLength"]
 
 
 # ------------------------------------------------------------
-# Main Lambda Handler
+# Local step: raw archive (same layout as the raw_ingest tool)
 # ------------------------------------------------------------
-def handler(event, context):
+def archive_raw(file_s3_path, env):
+    filename = file_s3_path.split("/")[-1]
+    extension = filename.split(".")[-1].lower() if "." in filename else "unknown"
 
-    # Extract input body (if API Gateway)
-    body = event.get("body")
-    if isinstance(body, str):
-        body = json.loads(body)
+    path = file_s3_path.replace("s3://", "")
+    bucket = path.split("/")[0]
+    key = "/".join(path.split("/")[1:])
 
-    file_s3_path = body.get("file_s3_path")
-    domain       = body.get("domain")
-    dataset      = body.get("dataset")
-    table_name   = body.get("table_name")
-    mode         = body.get("mode", "append")
-    options      = body.get("options", {})
+    archive_bucket = f"agentcore-digestor-archive-{env}"
+    archive_key = f"{extension}/{datetime.datetime.utcnow().strftime('%Y-%m-%d')}/{filename}"
 
-    env = os.environ.get("ENV", "dev")
+    s3.copy_object(
+        Bucket=archive_bucket,
+        CopySource={"Bucket": bucket, "Key": key},
+        Key=archive_key
+    )
+
+    return {
+        "status": "success",
+        "archive_path": f"s3://{archive_bucket}/{archive_key}",
+        "file_extension": extension
+    }
+
+
+# ------------------------------------------------------------
+# Commit payload for iceberg_ctas (one load or a batch group)
+# ------------------------------------------------------------
+def ctas_payload(table_name, schema_normalized, mode, key_columns, partition_columns, loads):
+    payload = {
+        "table_name": table_name,
+        "schema": [
+            {"name": name, "type": GLUE_TYPE_MAP.get(dtype, "string")}
+            for name, dtype in schema_normalized.items()
+        ],
+        "mode": mode,
+        "key_columns": key_columns,
+        "partition_columns": partition_columns,
+        # solo i file scritti da questi load (non tutto il warehouse)
+        "files": [f for load in loads for f in load.get("files_written", [])]
+    }
+    if len(loads) == 1:
+        payload["load_id"] = loads[0].get("load_id")
+        payload["column_stats"] = loads[0].get("column_stats")
+    else:
+        # statistiche lette da iceberg_ctas dalle entry del ledger
+        payload["load_ids"] = [load.get("load_id") for load in loads]
+    return payload
+
+
+# ------------------------------------------------------------
+# Single file pipeline
+# ------------------------------------------------------------
+def run_pipeline(body, env, store, record=None, commit=True):
+    """
+    Runs the ingestion DAG for one file and returns the (not yet
+    HTTP-wrapped) orchestration result.
+
+    record: stored run to resume (see run_state).
+    commit=False stops after the load: iceberg_ctas is left to the caller
+    (batch ingestion commits several files of the same table at once).
+    """
+    file_s3_path      = body.get("file_s3_path")
+    file_format       = body.get("file_format")
+    domain            = body.get("domain")
+    dataset           = body.get("dataset")
+    table_name        = body.get("table_name")
+    mode              = body.get("mode", "append")
+    key_columns       = body.get("key_columns", [])
+    partition_columns = body.get("partition_columns", [])
+    options           = body.get("options", {})
 
     # Auto-generate table_name if not provided
     if not table_name:
         table_name = f"icg_{domain}_{dataset}_{env}"
 
+    if not file_format:
+        file_format = file_s3_path.split(".")[-1].lower()
+
     # Final orchestration response structure
     result = {
         "status": "success",
-        "steps": {
-            "schema": {},
-            "validation": {},
-            "load": {},
-            "schema_normalizer": {},
-            "iceberg_ctas": {}
-        },
+        "steps": {name: {} for name in STEP_ORDER},
         "warnings": [],
         "errors": [],
         "records_loaded": 0,
+        "timings": {},
         "metadata": {
+            "run_id": record["run_id"] if record else body.get("run_id") or uuid.uuid4().hex,
+            "table_name": table_name,
             "agent_version": AGENT_VERSION,
             "timestamp_utc": datetime.datetime.utcnow().isoformat()
         }
     }
 
     # ------------------------------------------------------------
-    # STEP 1 – analyze_file_schema
+    # Pipeline as a dependency graph
+    #
+    #   raw_archive ─────────────────────────────────────┐ (indipendente)
+    #   schema → validation ──────────┐
+    #   schema_normalizer ────────────┴→ load → iceberg_ctas
+    #
+    # schema_normalizer infers its own schema from the file, so it runs
+    # alongside analyze/validate; validation gates the load.
+    #
+    # CSV files up to FUSED_MAX_BYTES (options.fused, default True) run
+    # schema → load in a single fused_ingest invocation instead:
+    #
+    #   raw_archive ─────────────────────────────────────┐ (indipendente)
+    #   fused (detect, schema, validation, normalizer, load) → iceberg_ctas
     # ------------------------------------------------------------
-    analyze_payload = {
-        "file_s3_path": file_s3_path,
-        "options": options
-    }
+    def run_schema(outputs):
+        # batch con shared_schema: schema già analizzato sul primo file
+        if body.get("schema_result"):
+            return body["schema_result"]
+        return invoke_tool(
+            f"agentcore-digestor-lambda-analyze-schema-{env}",
+            {
+                "file_s3_path": file_s3_path,
+                "file_format": file_format,
+                "options": options
+            }
+        )
 
-    schema_result = invoke_tool(
-        f"agentcore-digestor-lambda-analyze-schema-{env}",
-        analyze_payload
-    )
-    result["steps"]["schema"] = schema_result
+    def run_validation(outputs):
+        return invoke_tool(
+            f"agentcore-digestor-lambda-validate-data-{env}",
+            {
+                "file_s3_path": file_s3_path,
+                "schema": outputs["schema"].get("schema")
+            }
+        )
 
-    if schema_result.get("status") != "success":
-        result["status"] = "failed"
-        result["errors"].append({"schema": schema_result})
-        return finalize(result)
+    def run_normalizer(outputs):
+        return invoke_tool(
+            f"agentcore-digestor-lambda-schema-normalizer-{env}",
+            {"file_s3_path": file_s3_path}
+        )
 
+    def step_output(outputs, name):
+        # Con fused_ingest gli step interni sono in outputs["fused"]["steps"]
+        if name in outputs:
+            return outputs[name]
+        return outputs.get("fused", {}).get("steps", {}).get(name, {})
+
+    def normalized_schema(outputs):
+        return [
+            {"name": name, "type": dtype}
+            for name, dtype in step_output(outputs, "schema_normalizer").get("schema_normalized", {}).items()
+        ]
+
+    def run_load(outputs):
+        # Load idempotente (ledger) → retry sicuri
+        return invoke_tool(
+            f"agentcore-digestor-lambda-load-into-iceberg-{env}",
+            {
+                "file_s3_path": outputs["schema_normalizer"].get("normalized_path"),
+                "table_name": table_name,
+                "schema": normalized_schema(outputs),
+                "column_stats": outputs["schema_normalizer"].get("column_stats")
+            },
+            retries=LOAD_MAX_RETRIES
+        )
 
-    # ------------------------------------------------------------
-    # STEP 2 – validate_data
-    # ------------------------------------------------------------
-    validate_payload = {
-        "file_s3_path": file_s3_path,
-        "schema": schema_result.get("schema")
+    def run_fused(outputs):
+        return invoke_tool(
+            f"agentcore-digestor-lambda-fused-ingest-{env}",
+            {
+                "file_s3_path": file_s3_path,
+                "table_name": table_name,
+                "options": options
+            }
+        )
+
+    def run_ctas(outputs):
+        return invoke_tool(
+            f"agentcore-digestor-lambda-iceberg-ctas-{env}",
+            ctas_payload(
+                table_name,
+                step_output(outputs, "schema_normalizer").get("schema_normalized", {}),
+                mode, key_columns, partition_columns,
+                [step_output(outputs, "load")]
+            )
+        )
+
+    if record:
+        # stesso motore della run originale: gli output salvati hanno quel formato
+        use_fused = record["engine"] == "fused"
+    else:
+        use_fused = (
+            options.get("fused", True)
+            and file_format == "csv"
+            and source_size(file_s3_path) <= FUSED_MAX_BYTES
+        )
+        record = new_run_record(result["metadata"]["run_id"], body, "fused" if use_fused else "steps")
+        store.save(record)
+
+    if use_fused:
+        steps = {
+            "fused":             {"deps": [], "run": run_fused},
+            "iceberg_ctas":      {"deps": ["fused"], "run": run_ctas}
+        }
+    else:
+        steps = {
+            "schema":            {"deps": [], "run": run_schema},
+            "validation":        {"deps": ["schema"], "run": run_validation},
+            "schema_normalizer": {"deps": [], "run": run_normalizer},
+            "load":              {"deps": ["validation", "schema_normalizer"], "run": run_load},
+            "iceberg_ctas":      {"deps": ["load"], "run": run_ctas}
+        }
+
+    if not commit:
+        del steps["iceberg_ctas"]
+
+    if options.get("archive_raw", True):
+        steps["raw_archive"] = {"deps": [], "run": lambda outputs: archive_raw(file_s3_path, env)}
+
+    completed = completed_steps(record)
+    result["metadata"]["resumed_steps"] = sorted(completed)
+
+    def checkpoint(name, output):
+        record["steps"][name] = output
+        store.save(record)
+
+    started = time.monotonic()
+    outputs, timings, skipped = run_dag(steps, completed=completed, on_step=checkpoint)
+
+    # Espande il risultato di fused_ingest negli step standard
+    if "fused" in outputs:
+        fused = outputs.pop("fused")
+        outputs.update(fused.get("steps", {}))
+        if "fused" in timings:
+            timings["fused"] = {**timings["fused"], "phases_ms": fused.get("timings", {})}
+        result["metadata"]["engine"] = "fused"
+        if fused.get("status") != "success":
+            result["status"] = "failed"
+            result["errors"].append({"fused": {k: v for k, v in fused.items() if k != "steps"}})
+    else:
+        result["metadata"]["engine"] = "steps"
+
+    for name in STEP_ORDER:
+        if name in outputs:
+            result["steps"][name] = outputs[name]
+            if outputs[name].get("status") != "success":
+                result["status"] = "failed"
+                result["errors"].append({name: outputs[name]})
+        elif name in skipped:
+            result["steps"][name] = {"status": "skipped"}
+
+    if not commit:
+        del result["steps"]["iceberg_ctas"]
+
+    result["records_loaded"] = outputs.get("load", {}).get("records_loaded", 0)
+    result["timings"] = {
+        "steps": timings,
+        "total_ms": round((time.monotonic() - started) * 1000)
     }
 
-    val_result = invoke_tool(
-        f"agentcore-digestor-lambda-validate-data-{env}",
-        validate_payload
-    )
-    result["steps"]["validation"] = val_result
+    record["status"] = result["status"]
+    store.save(record)
 
-    if val_result.get("status") != "success":
-        result["status"] = "failed"
-        result["errors"].append({"validation": val_result})
-        return finalize(result)
+    return result
 
 
-    # ------------------------------------------------------------
-    # STEP 3 – load_into_iceberg (writes the Parquet files)
-    # ------------------------------------------------------------
-    load_payload = {
-        "file_s3_path": file_s3_path,
-        "table_name": table_name
+# ------------------------------------------------------------
+# Batch ingestion
+# ------------------------------------------------------------
+def list_batch_files(body):
+    """
+    Files of a batch request: explicit "files" (paths or per-file bodies)
+    or every object under "prefix" whose key, relative to the prefix,
+    matches "glob" (default "*").
+    """
+    if body.get("files"):
+        return [f if isinstance(f, dict) else {"file_s3_path": f} for f in body["files"]]
+
+    path = body["prefix"].replace("s3://", "")
+    bucket = path.split("/")[0]
+    prefix = "/".join(path.split("/")[1:])
+    pattern = body.get("glob", "*")
+
+    files = []
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            if obj["Key"].endswith("/"):
+                continue
+            if fnmatch.fnmatch(obj["Key"][len(prefix):].lstrip("/"), pattern):
+                files.append({"file_s3_path": f"s3://{bucket}/{obj['Key']}"})
+    return files
+
+
+def run_batch(body, env, store):
+    """
+    Ingests many files in one request.
+
+    Each file goes through the pipeline up to the load, at most
+    `max_concurrency` files at a time. Loaded files are then grouped by
+    target table (and normalized schema: files with a different schema
+    cannot share a staging table) and each group is committed with a single
+    iceberg_ctas call, i.e. one Iceberg snapshot per table. Tables are
+    committed in parallel, the groups of one table one after the other.
+
+    With shared_schema=True the schema is analyzed once per file format
+    (on the first file) and every other file is only validated against it.
+
+    Body fields other than files/prefix/glob/max_concurrency/shared_schema
+    are the defaults of every file (domain, dataset, table_name, mode,
+    options, ...); an entry of "files" can be a dict overriding them.
+    """
+    defaults = {
+        k: v for k, v in body.items()
+        if k not in ("files", "prefix", "glob", "max_concurrency", "shared_schema", "run_id")
     }
+    files = [{**defaults, **f} for f in list_batch_files(body)]
+    max_concurrency = int(body.get("max_concurrency", BATCH_MAX_CONCURRENCY))
+
+    started = time.monotonic()
+
+    # 0) Un solo analyze per formato (micro-batch dello stesso dataset)
+    if body.get("shared_schema"):
+        shared = {}
+        for f in files:
+            file_format = f.get("file_format") or f["file_s3_path"].split(".")[-1].lower()
+            if file_format not in shared:
+                shared[file_format] = invoke_tool(
+                    f"agentcore-digestor-lambda-analyze-schema-{env}",
+                    {
+                        "file_s3_path": f["file_s3_path"],
+                        "file_format": file_format,
+                        "options": f.get("options", {})
+                    }
+                )
+            if shared[file_format].get("status") == "success":
+                f["schema_result"] = shared[file_format]
+
+    # 1) Pipeline per file (senza commit)
+    def ingest(file_body):
+        try:
+            return run_pipeline(file_body, env, store, commit=False)
+        except Exception as e:
+            # es. file sparito tra il listing e la head_object
+            return {
+                "status": "failed",
+                "steps": {},
+                "errors": [{"error": str(e), "stack_trace": repr(e)}],
+                "records_loaded": 0,
+                "timings": {"total_ms": 0},
+                "metadata": {"run_id": None, "table_name": file_body.get("table_name")}
+            }
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        results = list(pool.map(ingest, files))
+
+    per_file = []
+    groups = {}
+    for file_body, res in zip(files, results):
+        entry = {
+            "file_s3_path": file_body["file_s3_path"],
+            "table_name": res["metadata"]["table_name"],
+            "run_id": res["metadata"]["run_id"],
+            "status": res["status"],
+            "records_loaded": res["records_loaded"],
+            "duration_ms": res["timings"]["total_ms"],
+            "errors": res["errors"]
+        }
+        per_file.append(entry)
+
+        if res["status"] == "success":
+            schema_normalized = res["steps"]["schema_normalizer"].get("schema_normalized", {})
+            key = (
+                entry["table_name"],
+                json.dumps(schema_normalized),
+                file_body.get("mode", "append"),
+                json.dumps(file_body.get("key_columns", [])),
+                json.dumps(file_body.get("partition_columns", []))
+            )
+            groups.setdefault(key, []).append((entry, res))
+
+    # 2) Un commit per tabella
+    def commit(key, members):
+        table_name, schema_json, mode, key_columns, partition_columns = key
+        return invoke_tool(
+            f"agentcore-digestor-lambda-iceberg-ctas-{env}",
+            ctas_payload(
+                table_name, json.loads(schema_json), mode,
+                json.loads(key_columns), json.loads(partition_columns),
+                [res["steps"]["load"] for _, res in members]
+            )
+        )
 
-    load_result = invoke_tool(
-        f"agentcore-digestor-lambda-load-into-iceberg-{env}",
-        load_payload
-    )
-    result["steps"]["load"] = load_result
+    # Gruppi della stessa tabella (schema o mode diversi) in sequenza: due
+    # DML concorrenti sulla stessa tabella Iceberg vanno in conflitto
+    per_table = {}
+    for item in groups.items():
+        per_table.setdefault(item[0][0], []).append(item)
 
-    if load_result.get("status") != "success":
-        result["status"] = "failed"
-        result["errors"].append({"load": load_result})
-        return finalize(result)
+    def commit_table(items):
+        return [commit(*item) for item in items]
 
-    result["records_loaded"] = load_result.get("records_loaded", 0)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(per_table) or 1))) as pool:
+        table_outcomes = list(pool.map(commit_table, per_table.values()))
 
+    by_key = {
+        item[0]: outcome
+        for items, outcomes in zip(per_table.values(), table_outcomes)
+        for item, outcome in zip(items, outcomes)
+    }
 
-    # ------------------------------------------------------------
-    # STEP 3.5 – schema_normalizer
-    #   Determines REAL schema from Parquet files just written
-    # ------------------------------------------------------------
-    norm_payload = {
-        "table_name": table_name
+    commits = []
+    for key, members in groups.items():
+        outcome = by_key[key]
+        commits.append({
+            "table_name": key[0],
+            "mode": key[2],
+            "files": len(members),
+            "status": outcome.get("status"),
+            "result": outcome
+        })
+        for entry, _ in members:
+            entry["commit"] = len(commits) - 1
+            if outcome.get("status") != "success":
+                entry["status"] = "failed"
+                entry["errors"] = entry["errors"] + [{"iceberg_ctas": outcome}]
+
+    elapsed = time.monotonic() - started
+    succeeded = [e for e in per_file if e["status"] == "success"]
+    records = sum(e["records_loaded"] for e in succeeded)
+
+    return {
+        "status": "success" if len(succeeded) == len(per_file) else (
+            "partial" if succeeded else "failed"
+        ),
+        "files": per_file,
+        "commits": commits,
+        "summary": {
+            "files_total": len(per_file),
+            "files_succeeded": len(succeeded),
+            "files_failed": len(per_file) - len(succeeded),
+            "records_loaded": records,
+            "total_ms": round(elapsed * 1000),
+            "files_per_second": round(len(per_file) / elapsed, 3) if elapsed else None,
+            "records_per_second": round(records / elapsed, 1) if elapsed else None,
+            "max_concurrency": max_concurrency
+        },
+        "metadata": {
+            "agent_version": AGENT_VERSION,
+            "timestamp_utc": datetime.datetime.utcnow().isoformat()
+        }
     }
 
-    norm_result = invoke_tool(
-        f"agentcore-digestor-lambda-schema-normalizer-{env}",
-        norm_payload
-    )
-    result["steps"]["schema_normalizer"] = norm_result
 
-    if norm_result.get("status") != "success":
-        result["status"] = "failed"
-        result["errors"].append({"schema_normalizer": norm_result})
-        return finalize(result)
+# ------------------------------------------------------------
+# Main Lambda Handler
+# ------------------------------------------------------------
+def handler(event, context):
 
-    normalized_schema = norm_result.get("normalized_schema")
+    # Extract input body (if API Gateway)
+    body = event.get("body")
+    if isinstance(body, str):
+        body = json.loads(body)
 
+    env = os.environ.get("ENV", "dev")
+    store = run_store_from_env(env)
 
     # ------------------------------------------------------------
-    # STEP 4 – iceberg_ctas (CTAS → Managed Iceberg table)
+    # Batch: {"files": [...]} or {"prefix": "s3://...", "glob": "*.csv"}
     # ------------------------------------------------------------
-    ctas_payload = {
-        "table_name": table_name,
-        "schema": normalized_schema
-    }
-
-    ctas_result = invoke_tool(
-        f"agentcore-digestor-lambda-iceberg-ctas-{env}",
-        ctas_payload
-    )
-    result["steps"]["iceberg_ctas"] = ctas_result
-
-    if ctas_result.get("status") != "success":
-        result["status"] = "failed"
-        result["errors"].append({"iceberg_ctas": ctas_result})
-        return finalize(result)
+    if body.get("files") or body.get("prefix"):
+        return finalize(run_batch(body, env, store))
 
+    # ------------------------------------------------------------
+    # Resume: {"resume_run_id": "..."} restarts a stored run from its
+    # first incomplete step, with the original request
+    # ------------------------------------------------------------
+    record = None
+    if body.get("resume_run_id"):
+        record = store.load(body["resume_run_id"])
+        if record is None:
+            return finalize({
+                "status": "failed",
+                "errors": [f"Unknown run_id: {body['resume_run_id']}"]
+            })
+        body = record["request"]
 
     # ------------------------------------------------------------
     # FINAL OUTPUT
     # ------------------------------------------------------------
-    return finalize(result)
-
+    return finalize(run_pipeline(body, env, store, record))
 
 
 # ------------------------------------------------------------
@@ -0,0 +1,114 @@
+import json
+import os
+import datetime
+
+from digestor_common.aws import client
+
+# Backend dello store: "s3" (default, Lambda) oppure "local" (filesystem, dev)
+RUN_STATE_BACKEND = os.environ.get("RUN_STATE_BACKEND", "s3")
+RUN_STATE_DIR = os.environ.get("RUN_STATE_DIR", "./.runs")
+RUN_STATE_PREFIX = "_runs"
+
+
+# ------------------------------------------------------------
+# Run-state stores
+#
+# One JSON document per run:
+#   {
+#     "run_id": ...,
+#     "request": {...},          # body of the original request
+#     "engine": "steps" | "fused",
+#     "status": "running" | "success" | "failed",
+#     "steps": {name: output},   # every completed step, success or not
+#     "created_at": ..., "updated_at": ...
+#   }
+#
+# Step outputs are written as soon as each step completes, so a run that
+# dies half way (Lambda timeout included) still has its finished steps.
+# ------------------------------------------------------------
+class LocalRunStore:
+    """
+    Filesystem store for dev: RUN_STATE_DIR/<run_id>.json
+    """
+
+    def __init__(self, root=RUN_STATE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, run_id):
+        return os.path.join(self.root, f"{run_id}.json")
+
+    def load(self, run_id):
+        try:
+            with open(self._path(run_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, record):
+        record["updated_at"] = datetime.datetime.utcnow().isoformat()
+        tmp = self._path(record["run_id"]) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(record, f, default=str)
+        os.replace(tmp, self._path(record["run_id"]))
+
+
+class S3RunStore:
+    """
+    S3 store: s3://<bucket>/_runs/<run_id>.json
+    """
+
+    def __init__(self, bucket, prefix=RUN_STATE_PREFIX):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.s3 = client("s3")
+
+    def _key(self, run_id):
+        return f"{self.prefix}/{run_id}.json"
+
+    def load(self, run_id):
+        try:
+            obj = self.s3.get_object(Bucket=self.bucket, Key=self._key(run_id))
+        except self.s3.exceptions.NoSuchKey:
+            return None
+        return json.loads(obj["Body"].read())
+
+    def save(self, record):
+        record["updated_at"] = datetime.datetime.utcnow().isoformat()
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=self._key(record["run_id"]),
+            Body=json.dumps(record, default=str).encode("utf-8"),
+            ContentType="application/json"
+        )
+
+
+def run_store_from_env(env):
+    if RUN_STATE_BACKEND == "local":
+        return LocalRunStore()
+    return S3RunStore(os.environ.get("RUN_STATE_BUCKET", f"agentcore-digestor-archive-{env}"))
+
+
+def new_run_record(run_id, request, engine):
+    now = datetime.datetime.utcnow().isoformat()
+    return {
+        "run_id": run_id,
+        "request": request,
+        "engine": engine,
+        "status": "running",
+        "steps": {},
+        "created_at": now,
+        "updated_at": now
+    }
+
+
+def completed_steps(record):
+    """
+    Outputs of the steps that succeeded: a resumed run starts from these
+    and re-runs only the failed / never started ones.
+    """
+    return {
+        name: output
+        for name, output in record.get("steps", {}).items()
+        if output.get("status") == "success"
+    }
@@ -1,18 +1,336 @@
-import boto3
 import csv
 import io
-import pandas as pd
-import awswrangler as wr
+import json
+import hashlib
+import time
 import os
+from botocore.exceptions import BotoCoreError, ClientError
 
-s3 = boto3.client("s3")
+from digestor_common.aws import client
+from digestor_common.lazy import lazy_import
+from digestor_common.metrics import instrumented, current_metrics
+from digestor_common.stats import compute_column_stats
 
+s3 = client("s3")
 
+# Non servono per un load già presente nel ledger
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+wr = lazy_import("awswrangler")
+
+# Ledger dei load: un oggetto JSON per (tabella, contenuto sorgente)
+LEDGER_PREFIX = "_ledger"
+# Dopo la scadenza del lease un claim "pending" è considerato abbandonato
+# (Lambda morta). Il lease è il tempo che resta all'esecuzione più un
+# margine, così un'esecuzione ancora viva non può perdere il claim mentre
+# scrive; LEDGER_LEASE_SECONDS vale solo senza contesto Lambda (locale).
+LEDGER_LEASE_SECONDS = int(os.environ.get("LEDGER_LEASE_SECONDS", "960"))
+LEDGER_LEASE_MARGIN_SECONDS = int(os.environ.get("LEDGER_LEASE_MARGIN_SECONDS", "30"))
+
+
+# Posizione della riga nel file sorgente, scritta in ogni Parquet: ordine
+# deterministico del dedup di iceberg_ctas (merge). Non fa parte dello schema
+# della tabella.
+SOURCE_ROW_COLUMN = "_source_row"
+
+
+def parse_s3_path(path: str):
+    path = path.replace("s3://", "")
+    bucket = path.split("/")[0]
+    key = "/".join(path.split("/")[1:])
+    return bucket, key
+
+
+# ------------------------------------------------------------
+# Load ledger (exactly-once per source content + target table)
+# ------------------------------------------------------------
+def ledger_entry_key(table_name: str, source_etag: str):
+    """
+    Returns (load_id, ledger key). The load_id is a stable digest of the
+    target table and the source ETag, so the same input always maps to the
+    same ledger entry and to the same Parquet filename prefix.
+    """
+    load_id = hashlib.sha256(f"{table_name}|{source_etag}".encode("utf-8")).hexdigest()[:32]
+    return load_id, f"{LEDGER_PREFIX}/{table_name}/{load_id}.json"
+
+
+def read_ledger_entry(bucket: str, key: str):
+    """
+    Returns (entry, etag) or (None, None) when the entry does not exist.
+    """
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            return None, None
+        raise
+    return json.loads(obj["Body"].read().decode("utf-8")), obj["ETag"]
+
+
+def write_ledger_entry(bucket: str, key: str, entry: dict, if_match: str = None):
+    """
+    Conditional write of a ledger entry.
+    - if_match=None → create only if the entry does not exist yet
+    - if_match=<etag> → overwrite only if nobody changed it in the meantime
+    Returns the new ETag, or None if the condition failed (lost the race).
+    """
+    conditions = {"IfMatch": if_match} if if_match else {"IfNoneMatch": "*"}
+    try:
+        resp = s3.put_object(
+            Bucket=bucket,
+            Key=key,
+            Body=json.dumps(entry).encode("utf-8"),
+            ContentType="application/json",
+            **conditions
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("PreconditionFailed", "ConditionalRequestConflict"):
+            return None
+        raise
+    return resp["ETag"]
+
+
+def ledger_lease_seconds(context):
+    """
+    Lease of a claim taken by this execution: its remaining time (from the
+    Lambda context) plus a margin.
+    """
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return LEDGER_LEASE_SECONDS
+    return context.get_remaining_time_in_millis() / 1000 + LEDGER_LEASE_MARGIN_SECONDS
+
+
+def claim_expired(entry):
+    """
+    True when a pending claim can be taken over: released after a failure,
+    or past its lease. Entries written before lease_until existed use
+    LEDGER_LEASE_SECONDS from claimed_at.
+    """
+    if entry["state"] == "failed":
+        return True
+    lease_until = entry.get("lease_until", entry["claimed_at"] + LEDGER_LEASE_SECONDS)
+    return time.time() >= lease_until
+
+
+def delete_partial_files(bucket: str, prefix: str):
+    """
+    Removes Parquet files left behind by a previous attempt of the same load
+    that died before committing its ledger entry.
+    """
+    removed = 0
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        objects = [{"Key": o["Key"]} for o in page.get("Contents", [])]
+        if objects:
+            s3.delete_objects(Bucket=bucket, Delete={"Objects": objects, "Quiet": True})
+            removed += len(objects)
+    return removed
+
+
+def written_bytes(bucket: str, prefix: str):
+    """
+    Total size of the files under `prefix` (the Parquet files of one load),
+    from the listing: one request per 1000 files instead of a HEAD each.
+    """
+    total = 0
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        total += sum(o["Size"] for o in page.get("Contents", []))
+    return total
+
+
+# ------------------------------------------------------------
+# Schema casting (defensive)
+# ------------------------------------------------------------
+def cast_to_schema(df: "pd.DataFrame", schema: list) -> "pd.DataFrame":
+    for colinfo in schema:
+        col = colinfo["name"]
+        coltype = colinfo["type"]
+
+        if col not in df.columns:
+            continue
+
+        if coltype == "int":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+        elif coltype == "float":
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+        elif coltype == "datetime":
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+        else:
+            df[col] = df[col].astype(str)
+    return df
+
+
+# ------------------------------------------------------------
+# Ledger-protected load (also used by fused_ingest)
+# ------------------------------------------------------------
+def load_with_ledger(table_name, source_path, source_etag, schema, column_stats, build_df,
+                     lease_seconds=LEDGER_LEASE_SECONDS):
+    """
+    Writes the Parquet files of one input exactly once.
+
+    `source_etag` identifies the input content; `build_df()` produces the
+    DataFrame to write and is only called when the load is not already
+    committed (so a deduplicated load never reads the source).
+
+    The claim is held for `lease_seconds` (see ledger_lease_seconds). If
+    the load fails after claiming, the claim is released ("failed") so a
+    retry can take it over immediately.
+    """
+    env = os.environ.get("ENV", "dev")
+    warehouse_bucket = f"agentcore-digestor-iceberg-bronze-{env}"
+    data_prefix = f"warehouse/{table_name}/data/"
+
+    # ----------------------------------------------------
+    # Ledger lookup: same input already loaded → no-op
+    # ----------------------------------------------------
+    load_id, ledger_key = ledger_entry_key(table_name, source_etag)
+
+    entry, entry_etag = read_ledger_entry(warehouse_bucket, ledger_key)
+
+    if entry and entry["state"] == "committed":
+        return {**entry["result"], "deduplicated": True}
+
+    if entry and not claim_expired(entry):
+        return {
+            "status": "failed",
+            "error": f"Load {load_id} already in progress for {table_name}",
+            "load_id": load_id,
+            "retryable": True
+        }
+
+    # ----------------------------------------------------
+    # Claim the load (create, or take over a stale claim)
+    # ----------------------------------------------------
+    claim = {
+        "state": "pending",
+        "load_id": load_id,
+        "table_name": table_name,
+        "source_path": source_path,
+        "source_etag": source_etag,
+        "claimed_at": time.time(),
+        "lease_until": time.time() + lease_seconds
+    }
+    claim_etag = write_ledger_entry(warehouse_bucket, ledger_key, claim, if_match=entry_etag)
+
+    if claim_etag is None:
+        return {
+            "status": "failed",
+            "error": f"Load {load_id} claimed concurrently for {table_name}",
+            "load_id": load_id,
+            "retryable": True
+        }
+
+    try:
+        return write_claimed_load(
+            warehouse_bucket, data_prefix, ledger_key, claim, claim_etag,
+            retry=entry is not None, schema=schema, column_stats=column_stats, build_df=build_df
+        )
+    except Exception as e:
+        # Rilascia il claim (solo se è ancora nostro): il retry lo riprende
+        # subito. Se anche il rilascio fallisce resta il lease.
+        try:
+            write_ledger_entry(
+                warehouse_bucket,
+                ledger_key,
+                {**claim, "state": "failed", "failed_at": time.time(), "error": str(e)},
+                if_match=claim_etag
+            )
+        except Exception:
+            pass
+        raise
+
+
+def write_claimed_load(warehouse_bucket, data_prefix, ledger_key, claim, claim_etag,
+                       retry, schema, column_stats, build_df):
+    """
+    Writes the Parquet files of a claimed load and commits its ledger entry.
+    """
+    table_name = claim["table_name"]
+    load_id = claim["load_id"]
+    write_path = f"s3://{warehouse_bucket}/{data_prefix}"
+
+    # Files of a previous, uncommitted attempt share our prefix
+    if retry:
+        delete_partial_files(warehouse_bucket, f"{data_prefix}{load_id}_")
+
+    metrics = current_metrics()
+
+    df = build_df()
+    if df is None or df.empty:
+        # Rilascio condizionale: se il claim è stato ripreso da un altro
+        # tentativo (lease scaduto) la sua entry non va toccata
+        write_ledger_entry(
+            warehouse_bucket,
+            ledger_key,
+            {**claim, "state": "failed", "failed_at": time.time(), "error": "No rows to load"},
+            if_match=claim_etag
+        )
+        return {"status": "failed", "error": "No rows to load"}
+
+    with metrics.phase("cast"):
+        df = cast_to_schema(df, schema)
+    metrics.rows = len(df)
+
+    # ----------------------------------------------------
+    # Write Parquet (filenames prefixed with the load_id)
+    # ----------------------------------------------------
+    with metrics.phase("write"):
+        written = wr.s3.to_parquet(
+            df=df.assign(**{SOURCE_ROW_COLUMN: np.arange(len(df), dtype="int64")}),
+            path=write_path,
+            dataset=True,
+            mode="append",
+            filename_prefix=f"{load_id}_"
+        )
+        metrics.bytes_out += written_bytes(warehouse_bucket, f"{data_prefix}{load_id}_")
+
+    # Solo le colonne non coperte dal normalizer vengono ricalcolate
+    column_stats = column_stats or {}
+    missing_stats = [c for c in df.columns if c not in column_stats]
+    if missing_stats:
+        types = {c["name"]: c["type"] for c in schema}
+        column_stats = {**column_stats, **compute_column_stats(df[missing_stats], types)}
+
+    result = {
+        "status": "success",
+        "records_loaded": len(df),
+        "warehouse_path": write_path,
+        "load_id": load_id,
+        "files_written": written["paths"],
+        "column_stats": column_stats
+    }
+
+    # ----------------------------------------------------
+    # Commit the ledger entry (only if we still own the claim)
+    # ----------------------------------------------------
+    committed = write_ledger_entry(
+        warehouse_bucket,
+        ledger_key,
+        {**claim, "state": "committed", "committed_at": time.time(), "result": result},
+        if_match=claim_etag
+    )
+
+    if committed is None:
+        return {
+            "status": "failed",
+            "error": f"Lost ledger claim for load {load_id} before commit",
+            "load_id": load_id,
+            "retryable": True
+        }
+
+    return {**result, "deduplicated": False}
+
+
+@instrumented("load_into_iceberg")
 def handler(event, context):
+    metrics = current_metrics()
     try:
         file_s3_path = event["file_s3_path"]   # MUST be normalized_path
         table_name = event["table_name"]
         schema = event.get("schema")
+        # Statistiche già calcolate da schema_normalizer (se disponibili)
+        column_stats = event.get("column_stats")
 
         if not schema:
             return {
@@ -20,63 +338,34 @@ def handler(event, context):
                 "error": "Missing 'schema' in event payload"
             }
 
-        env = os.environ.get("ENV", "dev")
-        warehouse_bucket = f"agentcore-digestor-iceberg-bronze-{env}"
-        write_path = f"s3://{warehouse_bucket}/warehouse/{table_name}/data/"
+        bucket, key = parse_s3_path(file_s3_path)
+        source_etag = s3.head_object(Bucket=bucket, Key=key)["ETag"].strip('"')
 
         # ----------------------------------------------------
-        # Read NORMALIZED CSV
+        # Read NORMALIZED CSV (only if the load is not a duplicate)
         # ----------------------------------------------------
-        bucket = file_s3_path.replace("s3://", "").split("/")[0]
-        key = "/".join(file_s3_path.replace("s3://", "").split("/")[1:])
-
-        obj = s3.get_object(Bucket=bucket, Key=key)
-        raw_data = obj["Body"].read().decode("utf-8")
-
-        rows = list(csv.DictReader(io.StringIO(raw_data)))
-        if not rows:
-            return {"status": "failed", "error": "No rows to load"}
+        def read_normalized_csv():
+            with metrics.phase("download"):
+                obj = s3.get_object(Bucket=bucket, Key=key, IfMatch=f'"{source_etag}"')
+                raw_bytes = obj["Body"].read()
+            metrics.bytes_in += len(raw_bytes)
+            raw_data = raw_bytes.decode("utf-8")
 
-        df = pd.DataFrame(rows)
+            with metrics.phase("parse"):
+                rows = list(csv.DictReader(io.StringIO(raw_data)))
+                return pd.DataFrame(rows) if rows else None
 
-        # ----------------------------------------------------
-        # Apply schema casting (defensive)
-        # ----------------------------------------------------
-        for colinfo in schema:
-            col = colinfo["name"]
-            coltype = colinfo["type"]
-
-            if col not in df.columns:
-                continue
-
-            if coltype == "int":
-                df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
-            elif coltype == "float":
-                df[col] = pd.to_numeric(df[col], errors="coerce")
-            elif coltype == "datetime":
-                df[col] = pd.to_datetime(df[col], errors="coerce")
-            else:
-                df[col] = df[col].astype(str)
-
-        # ----------------------------------------------------
-        # Write Parquet
-        # ----------------------------------------------------
-        wr.s3.to_parquet(
-            df=df,
-            path=write_path,
-            dataset=True,
-            mode="append"
+        return load_with_ledger(
+            table_name, file_s3_path, source_etag, schema, column_stats, read_normalized_csv,
+            lease_seconds=ledger_lease_seconds(context)
         )
 
-        return {
-            "status": "success",
-            "records_loaded": len(df),
-            "warehouse_path": write_path
-        }
-
     except Exception as e:
         return {
             "status": "failed",
             "error": str(e),
-            "stack_trace": repr(e)
+            "stack_trace": repr(e),
+            # errori AWS (throttling, rete): il claim è stato rilasciato, un
+            # retry immediato riparte da capo
+            "retryable": isinstance(e, (BotoCoreError, ClientError))
         }
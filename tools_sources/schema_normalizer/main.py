@@ -1,10 +1,13 @@
 import pandas as pd
 import numpy as np
-import boto3
 import io
 import os
 
-s3 = boto3.client("s3")
+from digestor_common.aws import client
+from digestor_common.metrics import instrumented, current_metrics
+from digestor_common.stats import compute_column_stats
+
+s3 = client("s3")
 
 NORMALIZED_BUCKET = os.environ.get(
     "NORMALIZED_BUCKET",
@@ -94,88 +97,127 @@ def json_safe_df(df: pd.DataFrame) -> pd.DataFrame:
     return safe
 
 
+# --------------------------------------------------
+# Normalization on an already-parsed DataFrame
+# (also used by fused_ingest)
+# --------------------------------------------------
+def normalize_df(df: pd.DataFrame):
+    """
+    Returns (inferred_schema, normalized_df, removed_rows).
+    """
+    # --------------------------------------------------
+    # Infer schema
+    # --------------------------------------------------
+    inferred_schema = {}
+    for col in df.columns:
+        series = df[col].replace({np.nan: None}).replace("nan", None)
+        inferred_schema[col] = infer_column_type(series)
+
+    # --------------------------------------------------
+    # Row-level normalization
+    # --------------------------------------------------
+    cleaned_rows = []
+    removed_rows = 0
+
+    for _, row in df.iterrows():
+        new_row = {}
+        valid = True
+
+        for col, dtype in inferred_schema.items():
+            value = row[col]
+
+            # missing value = invalid row
+            if value is None or pd.isna(value) or value == "" or value == "nan":
+                valid = False
+                break
+
+            try:
+                new_row[col] = convert_value(value, dtype)
+            except:
+                valid = False
+                break
+
+        if valid:
+            cleaned_rows.append(new_row)
+        else:
+            removed_rows += 1
+
+    return inferred_schema, pd.DataFrame(cleaned_rows), removed_rows
+
+
+def normalized_csv_bytes(normalized_df: pd.DataFrame) -> bytes:
+    return normalized_df.to_csv(index=False).encode("utf-8")
+
+
+def normalized_key_for(key: str) -> str:
+    filename = key.split("/")[-1].rsplit(".", 1)[0]
+    return f"{NORMALIZED_PREFIX}/{filename}_normalized.csv"
+
+
+def normalization_result(inferred_schema, normalized_df, original_rows, removed_rows, normalized_path):
+    # --------------------------------------------------
+    # Prepare JSON-safe preview
+    # --------------------------------------------------
+    preview_df = json_safe_df(normalized_df)
+
+    return {
+        "status": "success",
+        "schema_normalized": inferred_schema,
+        "rows_original": original_rows,
+        "rows_cleaned": len(normalized_df),
+        "rows_removed": removed_rows,
+        "normalized_path": normalized_path,
+        "ready_for_load": True,
+        "sample_preview": preview_df.head(5).to_dict(orient="records"),
+        "column_stats": compute_column_stats(normalized_df, inferred_schema),
+    }
+
+
 # --------------------------------------------------
 # Lambda handler
 # --------------------------------------------------
+@instrumented("schema_normalizer")
 def handler(event, context):
+    metrics = current_metrics()
     try:
         file_s3_path = event["file_s3_path"]
 
         bucket = file_s3_path.replace("s3://", "").split("/")[0]
         key = "/".join(file_s3_path.replace("s3://", "").split("/")[1:])
 
-        obj = s3.get_object(Bucket=bucket, Key=key)
-        df = pd.read_csv(io.BytesIO(obj["Body"].read()))
+        with metrics.phase("download"):
+            raw_bytes = s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+        metrics.bytes_in += len(raw_bytes)
 
-        original_rows = len(df)
+        with metrics.phase("parse"):
+            df = pd.read_csv(io.BytesIO(raw_bytes))
+        metrics.rows = len(df)
 
-        # --------------------------------------------------
-        # Infer schema
-        # --------------------------------------------------
-        inferred_schema = {}
-        for col in df.columns:
-            series = df[col].replace({np.nan: None}).replace("nan", None)
-            inferred_schema[col] = infer_column_type(series)
-
-        # --------------------------------------------------
-        # Row-level normalization
-        # --------------------------------------------------
-        cleaned_rows = []
-        removed_rows = 0
-
-        for _, row in df.iterrows():
-            new_row = {}
-            valid = True
-
-            for col, dtype in inferred_schema.items():
-                value = row[col]
-
-                # missing value = invalid row
-                if value is None or pd.isna(value) or value == "" or value == "nan":
-                    valid = False
-                    break
-
-                try:
-                    new_row[col] = convert_value(value, dtype)
-                except:
-                    valid = False
-                    break
-
-            if valid:
-                cleaned_rows.append(new_row)
-            else:
-                removed_rows += 1
-
-        normalized_df = pd.DataFrame(cleaned_rows)
+        with metrics.phase("normalize"):
+            inferred_schema, normalized_df, removed_rows = normalize_df(df)
 
         # --------------------------------------------------
         # Write normalized CSV (SOURCE OF TRUTH)
         # --------------------------------------------------
-        filename = key.split("/")[-1].rsplit(".", 1)[0]
-        normalized_key = f"{NORMALIZED_PREFIX}/{filename}_normalized.csv"
-
-        s3.put_object(
-            Bucket=NORMALIZED_BUCKET,
-            Key=normalized_key,
-            Body=normalized_df.to_csv(index=False).encode("utf-8")
+        normalized_key = normalized_key_for(key)
+
+        with metrics.phase("write"):
+            csv_bytes = normalized_csv_bytes(normalized_df)
+            s3.put_object(
+                Bucket=NORMALIZED_BUCKET,
+                Key=normalized_key,
+                Body=csv_bytes
+            )
+        metrics.bytes_out += len(csv_bytes)
+
+        return normalization_result(
+            inferred_schema,
+            normalized_df,
+            len(df),
+            removed_rows,
+            f"s3://{NORMALIZED_BUCKET}/{normalized_key}"
         )
 
-        # --------------------------------------------------
-        # Prepare JSON-safe preview
-        # --------------------------------------------------
-        preview_df = json_safe_df(normalized_df)
-
-        return {
-            "status": "success",
-            "schema_normalized": inferred_schema,
-            "rows_original": original_rows,
-            "rows_cleaned": len(normalized_df),
-            "rows_removed": removed_rows,
-            "normalized_path": f"s3://{NORMALIZED_BUCKET}/{normalized_key}",
-            "ready_for_load": True,
-            "sample_preview": preview_df.head(5).to_dict(orient="records"),
-        }
-
     except Exception as e:
         return {
             "status": "failed",
@@ -75,6 +75,7 @@ variable "lambdas" {
   type = map(object({
     function_name = string
     timeout       = number
+    memory_size   = optional(number, 128)
     env_vars      = map(string)
     tags          = map(string)
     package_type  = string                # Zip or Image
@@ -86,3 +87,28 @@ variable "lambdas" {
   }))
 }
 
+
+variable "scheduled_jobs" {
+  description = "Scheduled lambda invocations (e.g. Iceberg maintenance)"
+  type = map(object({
+    lambda_key          = string
+    schedule_expression = string
+    input               = string
+  }))
+  default = {}
+}
+
+variable "event_ingestion" {
+  description = "Event-driven micro-batch ingestion (S3 notifications → SQS → lambda). One entry per bucket."
+  type = map(object({
+    bucket                     = string
+    lambda_key                 = string
+    filter_prefix              = optional(string)
+    filter_suffix              = optional(string)
+    batch_size                 = optional(number, 100)
+    batching_window_seconds    = optional(number, 60)
+    visibility_timeout_seconds = optional(number, 960)
+    max_receive_count          = optional(number, 5)
+  }))
+  default = {}
+}